@@ -1,10 +1,14 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.routes import storm_routes, rainmap_routes
+from app.services import metrics, profiler, ratelimit, scheduler, shared_cache
+from app.services.codec import JSONResponse
+from app.services.utils import env_bool
 import os
 
 
-app = FastAPI(title="Meteorological Backend")
+app = FastAPI(title="Meteorological Backend", default_response_class=JSONResponse)
 
 # Allow CORS so frontend (localhost:3000) can access backend (localhost:8000)
 
@@ -17,6 +21,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency histograms (see /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+# Sampled / on-demand request profiles (see /admin/profiles)
+app.add_middleware(profiler.ProfilingMiddleware)
+# Last scheduler run (stage durations, next run), read from its state file at scrape time
+metrics.register_collector(scheduler.recolectar_metricas)
+# Remaining upstream budget, shared by all workers
+metrics.register_collector(ratelimit.collect_metrics)
+
 # Include routers
 app.include_router(storm_routes.router, prefix="/api", tags=["Storm"])
 app.include_router(rainmap_routes.router, prefix="/rainmap", tags=["Rainmap"])
@@ -27,6 +40,75 @@ async def root():
     return {"message": "Backend running successfully"}
 
 
+# Liveness: the process is up. Does not touch DATA_DIR or upstream services.
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+# Readiness: the snapshot index (built in the background at startup) is available
+@app.get("/readyz")
+def readyz():
+    checks = {"snapshot_index": storm_routes.INDEX_READY.is_set()}
+    ready = all(checks.values())
+    content = {"status": "ready" if ready else "starting", "checks": checks}
+    if not ready and storm_routes.INDEX_STATUS["error"]:
+        # Still retrying in the background (see storm_routes.warm_snapshot_index)
+        content.update(status="failing", errors={"snapshot_index": storm_routes.INDEX_STATUS["error"]},
+                       attempts=storm_routes.INDEX_STATUS["attempts"])
+    return JSONResponse(status_code=200 if ready else 503, content=content)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus text exposition of the app metrics."""
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Profiles captured by app/services/profiler.py. Disabled (404) unless PROFILE_ADMIN_TOKEN is set.
+@app.get("/admin/profiles")
+def list_profiles(x_admin_token: str = Header(None)):
+    if not profiler.authorized(x_admin_token):
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    return {"profiles": profiler.list_profiles()}
+
+
+@app.get("/admin/profiles/{profile_id}")
+def get_profile(profile_id: str, weight: str = "wall", format: str = "collapsed",
+                x_admin_token: str = Header(None)):
+    """Collapsed stacks (flamegraph.pl / speedscope input) weighted by wall or CPU microseconds, or the raw JSON."""
+    if not profiler.authorized(x_admin_token):
+        return JSONResponse(status_code=404, content={"error": "Not found"})
+    if weight not in ("wall", "cpu") or format not in ("collapsed", "json"):
+        return JSONResponse(status_code=400, content={"error": "weight must be wall or cpu, format collapsed or json"})
+    data = profiler.load(profile_id)
+    if data is None:
+        return JSONResponse(status_code=404, content={"error": f"Profile {profile_id} not found"})
+    if format == "json":
+        return JSONResponse(content=data)
+    return PlainTextResponse(profiler.collapsed(data, weight))
+
+
+# Optional in-process scheduler (instead of running monitor.sh as a separate daemon)
+@app.on_event("startup")
+async def start_embedded_scheduler():
+    # With several uvicorn workers only the one holding the lock runs the scheduler
+    if env_bool("SCHEDULER_EMBEDDED"):
+        app.state.scheduler_lock = shared_cache.hold_lock("scheduler")
+        if app.state.scheduler_lock:
+            app.state.scheduler = scheduler.iniciar_tarea()
+
+
+@app.on_event("shutdown")
+async def stop_embedded_scheduler():
+    if getattr(app.state, "scheduler", None):
+        task, detener = app.state.scheduler
+        detener.set()
+        await task
+
+
 # Railway necesita esto
 if __name__ == "__main__":
     import uvicorn
@@ -1,55 +1,69 @@
-from fastapi import APIRouter
-from fastapi.responses import JSONResponse
-import numpy as np, requests, concurrent.futures, time
+from fastapi import APIRouter, Query, Request
+from typing import List
+from fastapi.responses import Response
+import numpy as np, requests, concurrent.futures, time, os
+import threading
 import traceback
+from collections import OrderedDict
+from datetime import datetime
 import logging
-from requests.adapters import HTTPAdapter
-from urllib3.util.retry import Retry
+from app.services import cities, compression, contours, history, metrics, openmeteo, profiler, raster, ratelimit, shared_cache
+from app.services.codec import JSONResponse
+from app.services.utils import haversine
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-router = APIRouter()
+router = APIRouter(route_class=profiler.ProfiledRoute)
 
-# Default Cities Coordinates (same as before)
+# Interpolated grids are shared across workers; one worker refreshes per TTL
+RAINMAP_CACHE_TTL = int(os.environ.get("RAINMAP_CACHE_TTL", 600))
+# Hourly forecasts change once an hour upstream
+RAINMAP_FORECAST_TTL = int(os.environ.get("RAINMAP_FORECAST_TTL", 1800))
+MAX_FORECAST_HOURS = 72
+# Each (grid_size, density) is its own shared-cache entry: bound what a request can ask for
+MAX_GRID_SIZE = int(os.environ.get("RAINMAP_MAX_GRID_SIZE", 30))
+MAX_DENSITY = int(os.environ.get("RAINMAP_MAX_DENSITY", 200))
+# Locations per upstream request in batched fetches (Open-Meteo accepts comma-separated lists)
+BATCH_SIZE = 100
+MAX_BATCH_CITIES = 500
+
+# Grids recorded in the history store ("<grid_size>x<density>", comma-separated). Only these
+# are recorded and queryable: every other (grid_size, density) would start its own series on disk.
+HISTORY_GRIDS = {
+    tuple(int(v) for v in grid.strip().split("x"))
+    for grid in os.environ.get("RAINMAP_HISTORY_GRIDS", "15x50").split(",")
+    if grid.strip()
+}
+
+# Area the rainmap covers: (min_lon, max_lon, min_lat, max_lat)
+DOMAIN = (-118.0, -86.5, 14.5, 32.75)
+
+# Viewport requests (/realtime?bbox=...) are built from fixed TILE_DEG x TILE_DEG tiles anchored
+# at the domain's SW corner. Each tile is interpolated from a station lattice every
+# STATION_SPACING degrees (plus the cities) within TILE_HALO degrees of it, so tiles
+# can be computed independently and reused by any viewport that overlaps them.
+TILE_DEG = float(os.environ.get("RAINMAP_TILE_DEG", 3.0))
+STATION_SPACING = float(os.environ.get("RAINMAP_STATION_SPACING", 1.5))
+TILE_HALO = float(os.environ.get("RAINMAP_TILE_HALO", 3.0))
+TILE_CACHE_SIZE = int(os.environ.get("RAINMAP_TILE_CACHE_SIZE", 256))
+# Tiles built with stale or missing stations are kept only this long, so they get retried
+TILE_DEGRADED_TTL = int(os.environ.get("RAINMAP_TILE_DEGRADED_TTL", 60))
+DEFAULT_RESOLUTION = 0.1  # degrees per cell
+MAX_TILE_CELLS = 300  # per tile side, i.e. finest resolution TILE_DEG / MAX_TILE_CELLS
+MAX_VIEWPORT_CELLS = 250_000
+
+# Cities added as extra stations to the realtime grid (lookups by name use app/services/cities.py)
 MEXICAN_CITIES = [
     {"name": "Ciudad de Mexico", "lat": 19.4326, "lon": -99.1332, "state": "CDMX"},
     # ... rest of your cities
 ]
 cityPoints = [{"lat": city["lat"], "lon": city["lon"]} for city in MEXICAN_CITIES]
 
-# --- Configure requests session with retries ---
-def create_session():
-    # Configure retry strategy
-    retry_strategy = Retry(
-        total=3,  # Total retries
-        backoff_factor=1,  # Wait 1, 2, 4 seconds between retries
-        status_forcelist=[429, 500, 502, 503, 504],  # Retry on these status codes
-        allowed_methods=["GET"]
-    )
-    
-    # Create session
-    session = requests.Session()
-    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=10)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    
-    # Set headers
-    session.headers.update({
-        'User-Agent': 'WeatherApp/1.0',
-        'Accept': 'application/json',
-        'Accept-Encoding': 'gzip, deflate'
-    })
-    
-    return session
-
-# Create a global session
-session = create_session()
-
 # --- 1. Generate grid points ---
 def generate_grid(grid_size=15):
-    min_lon, max_lon, min_lat, max_lat = -118, -86.5, 14.5, 32.75
+    min_lon, max_lon, min_lat, max_lat = DOMAIN
     lon = np.linspace(min_lon, max_lon, grid_size)
     lat = np.linspace(min_lat, max_lat, grid_size)
     points = [{"lat": float(a), "lon": float(b)} for a in lat for b in lon]
@@ -57,91 +71,184 @@ def generate_grid(grid_size=15):
     return points
 
 # --- 2. Fetch single weather point ---
+# Upstream calls go through app/services/openmeteo.py (session, metrics, circuit breaker, rate limit).
+# A failed point is served from its last good value (flagged stale) or marked missing,
+# never recorded as 0: interpolation skips missing stations instead of treating them as dry.
 def fetch_point(p):
     try:
-        # Use the configured session
-        r = session.get(
-            "https://api.open-meteo.com/v1/forecast",
-            params={
-                "latitude": p["lat"],
-                "longitude": p["lon"],
-                "current": "precipitation",
-                "timezone": "auto"
-            },
-            timeout=10  # Reduced timeout from 3000 to 10 seconds
-        )
-        r.raise_for_status()
-        d = r.json().get("current", {})
-        
-        # Log successful fetch
-        logger.info(f"Fetched point: {p['lat']}, {p['lon']} - Precipitation: {d.get('precipitation', 0)}")
-        
+        d = openmeteo.upstream_get({
+            "latitude": p["lat"],
+            "longitude": p["lon"],
+            "current": "precipitation",
+            "timezone": "auto"
+        }).get("current", {})
+        precipitation = d.get("precipitation")
+        if precipitation is None:
+            # No value is not the same as no rain: fall back like a failed fetch
+            logger.warning(f"No precipitation value for point {p['lat']}, {p['lon']}")
+            return openmeteo.last_good(p["lat"], p["lon"])
+        openmeteo.remember(p["lat"], p["lon"], precipitation)
+
+        # Log successful fetch (debug: one line per point is too noisy at INFO)
+        logger.debug(f"Fetched point: {p['lat']}, {p['lon']} - Precipitation: {precipitation}")
+
         return {
             "lat": p["lat"],
             "lon": p["lon"],
-            "precipitation": d.get("precipitation", 0),
+            "precipitation": precipitation,
         }
+    except openmeteo.UpstreamSkipped as e:
+        logger.debug(f"Skipping point {p['lat']}, {p['lon']}: {e}")
     except requests.exceptions.Timeout:
         logger.warning(f"Timeout for point {p['lat']}, {p['lon']}")
-        return {
-            "lat": p["lat"],
-            "lon": p["lon"],
-            "precipitation": 0,  # Default to 0 on timeout
-        }
     except requests.exceptions.RequestException as e:
         logger.error(f"Request failed for point {p['lat']}, {p['lon']}: {str(e)}")
-        return {
-            "lat": p["lat"],
-            "lon": p["lon"],
-            "precipitation": 0,  # Default to 0 on error
-        }
     except Exception as e:
         logger.error(f"Unexpected error for point {p['lat']}, {p['lon']}: {str(e)}")
-        return {
-            "lat": p["lat"],
-            "lon": p["lon"],
-            "precipitation": 0,  # Default to 0 on unexpected error
-        }
+    return openmeteo.last_good(p["lat"], p["lon"])
+
+# --- 2b. Fetch hourly forecast for a single point ---
+def fetch_point_forecast(p, hours=24):
+    """
+    Next `hours` hourly precipitation values (GMT, so every point shares the same time axis).
+    Hours upstream left null or did not return are NaN (unknown, not dry) and are
+    left out of that hour's interpolation. On failure `precipitation` is None and
+    the point is left out entirely.
+    """
+    missing = {"lat": p["lat"], "lon": p["lon"], "times": None, "precipitation": None, "missing": True}
+    try:
+        hourly = openmeteo.upstream_get({
+            "latitude": p["lat"],
+            "longitude": p["lon"],
+            "hourly": "precipitation",
+            "forecast_hours": hours,
+            "timezone": "GMT"
+        }).get("hourly", {})
+        values = [v if v is not None else np.nan for v in hourly.get("precipitation", [])][:hours]
+        values += [np.nan] * (hours - len(values))
+        return {"lat": p["lat"], "lon": p["lon"], "times": hourly.get("time", [])[:hours], "precipitation": values}
+    except openmeteo.UpstreamSkipped as e:
+        logger.debug(f"Skipping forecast point {p['lat']}, {p['lon']}: {e}")
+    except requests.exceptions.Timeout:
+        logger.warning(f"Forecast timeout for point {p['lat']}, {p['lon']}")
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Forecast request failed for point {p['lat']}, {p['lon']}: {str(e)}")
+    except Exception as e:
+        logger.error(f"Unexpected forecast error for point {p['lat']}, {p['lon']}: {str(e)}")
+    return missing
+
+# --- 2c. Fetch many points in one upstream request ---
+def fetch_points_batch(points):
+    """Current precipitation for many points, BATCH_SIZE locations per upstream request."""
+    results = []
+    for i in range(0, len(points), BATCH_SIZE):
+        chunk = points[i:i + BATCH_SIZE]
+        try:
+            body = openmeteo.upstream_get({
+                "latitude": ",".join(str(p["lat"]) for p in chunk),
+                "longitude": ",".join(str(p["lon"]) for p in chunk),
+                "current": "precipitation",
+                "timezone": "auto"
+            }, cost=len(chunk))
+            body = body if isinstance(body, list) else [body]  # single location -> plain object
+            if len(body) != len(chunk):
+                logger.warning(f"Batch of {len(chunk)} points returned {len(body)} results")
+            values = [b.get("current", {}).get("precipitation") for b in body[:len(chunk)]]
+            for p, v in zip(chunk, values):
+                if v is None:
+                    results.append(openmeteo.last_good(p["lat"], p["lon"]))
+                    continue
+                openmeteo.remember(p["lat"], p["lon"], v)
+                results.append({"lat": p["lat"], "lon": p["lon"], "precipitation": v})
+            # Points upstream left out: same fallback as a failed batch
+            results.extend(openmeteo.last_good(p["lat"], p["lon"]) for p in chunk[len(values):])
+            continue
+        except openmeteo.UpstreamSkipped as e:
+            logger.debug(f"Skipping batch of {len(chunk)} points: {e}")
+        except requests.exceptions.Timeout:
+            logger.warning(f"Timeout for batch of {len(chunk)} points")
+        except requests.exceptions.RequestException as e:
+            logger.error(f"Request failed for batch of {len(chunk)} points: {str(e)}")
+        except Exception as e:
+            logger.error(f"Unexpected error for batch of {len(chunk)} points: {str(e)}")
+        # Same fallback as fetch_point(): last good value or missing, never 0
+        results.extend(openmeteo.last_good(p["lat"], p["lon"]) for p in chunk)
+    return results
 
 # --- 3. Parallel fetch all data ---
 def get_weather(grid_size=15):
     pts = generate_grid(grid_size)
     logger.info(f"Fetching weather for {len(pts)} points")
     
-    # Reduce number of workers to avoid overwhelming the API
-    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as ex:
+    # Upper bound only: the rate limiter sets how many calls actually run at once
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ratelimit.MAX_CONCURRENCY) as ex:
         data = list(ex.map(fetch_point, pts))
     
-    logger.info(f"Successfully fetched {len([d for d in data if d['precipitation'] != 0])} points with precipitation")
+    logger.info(f"Successfully fetched {len([d for d in data if d['precipitation']])} points with precipitation")
     return data
 
-# --- Haversine and IDW functions (same as before) ---
-def haversine(lat1, lon1, lats2, lons2):
-    lat1, lon1, lats2, lons2 = map(np.radians, [lat1, lon1, lats2, lons2])
-    a = (
-        np.sin((lats2 - lat1) / 2) ** 2
-        + np.cos(lat1) * np.cos(lats2) * np.sin((lons2 - lon1) / 2) ** 2
-    )
-    return 6371 * 2 * np.arcsin(np.sqrt(a))
+def get_forecast(grid_size=15, hours=24):
+    pts = generate_grid(grid_size)
+    logger.info(f"Fetching {hours}h forecast for {len(pts)} points")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ratelimit.MAX_CONCURRENCY) as ex:
+        return list(ex.map(lambda p: fetch_point_forecast(p, hours), pts))
 
+# --- IDW functions (haversine lives in app/services/utils.py, shared with the storm exposure job) ---
 def idw(lat, lon, known_lats, known_lons, known_vals, power=2):
     d = haversine(lat, lon, known_lats, known_lons)
     d[d == 0] = 1e-6
     w = 1 / d**power
     return np.sum(w * known_vals) / np.sum(w)
 
-# --- 6. Interpolate grid ---
-def interpolate(data, density=100):
+def idw_weights(lats, lons, cell_lats, cell_lons, power=2):
+    """
+    Normalized IDW weight matrix (cells x stations): the interpolated field for
+    any set of station values `v` is `weights @ v`, so one matrix serves every
+    time step of a forecast.
+    """
+    d = haversine(cell_lats[:, None], cell_lons[:, None], lats[None, :], lons[None, :])
+    d[d == 0] = 1e-6
+    w = 1 / d**power
+    return w / w.sum(axis=1, keepdims=True)
+
+def interpolation_grid(data, density):
+    """Grid cells spanning all stations (missing ones too, so the extent is stable), in the order the API has always returned them."""
     lats = np.array([p["lat"] for p in data])
     lons = np.array([p["lon"] for p in data])
-    vals = np.array([p["precipitation"] for p in data])
     latg = np.linspace(lats.min(), lats.max(), density)
     long = np.linspace(lons.min(), lons.max(), density)
     lat_grid, lon_grid = np.meshgrid(latg, long)
-    interp_vals = np.zeros_like(lat_grid)
-    for i in range(lat_grid.shape[0]):
-        for j in range(lat_grid.shape[1]):
-            interp_vals[i, j] = idw(lat_grid[i, j], lon_grid[i, j], lats, lons, vals)
+    return lats, lons, latg, long, lat_grid, lon_grid
+
+def reporting_stations(data):
+    """lats, lons, values of the stations that returned data (missing ones are not dry, just unknown)."""
+    present = [p for p in data if p["precipitation"] is not None]
+    if not present:
+        raise RuntimeError("No upstream data for any station")
+    return (
+        np.array([p["lat"] for p in present]),
+        np.array([p["lon"] for p in present]),
+        np.array([p["precipitation"] for p in present], dtype=np.float64),
+    )
+
+# --- 6. Interpolate grid ---
+def density_label(density):
+    """Metric label for a density: a few fixed buckets, so requests can't add series."""
+    if density <= 50:
+        return "<=50"
+    return "<=100" if density <= 100 else ">100"
+
+def interpolate(data, density=100):
+    start = time.perf_counter()
+    _, _, _, _, lat_grid, lon_grid = interpolation_grid(data, density)
+    lats, lons, vals = reporting_stations(data)
+    interp_vals = (idw_weights(lats, lons, lat_grid.ravel(), lon_grid.ravel()) @ vals).reshape(lat_grid.shape)
+    metrics.observe(
+        "rainmap_interpolation_seconds",
+        time.perf_counter() - start,
+        {"density": density_label(density)},
+        help="IDW interpolation time by grid density",
+    )
     return [
         {
             "lat": float(lat_grid[i, j]),
@@ -152,29 +259,415 @@ def interpolate(data, density=100):
         for j in range(lat_grid.shape[1])
     ]
 
+def grid_error(grid_size, density):
+    """Error message for out-of-range grid parameters, or None."""
+    if not 2 <= grid_size <= MAX_GRID_SIZE:
+        return f"grid_size must be between 2 and {MAX_GRID_SIZE}"
+    if not 2 <= density <= MAX_DENSITY:
+        return f"density must be between 2 and {MAX_DENSITY}"
+    return None
+
 # --- 7. Real-time generator ---
-def generate_real_time_json(grid_size=15, density=100):
+def build_rainmap_grid(grid_size, density):
+    """Fetch + interpolate. Returns (N x 3 array of lat, lon, precipitation, meta) for the shared cache."""
     data = get_weather(grid_size)
     interp = interpolate(data, density)
-    return {
-        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+    # Keep the fetched stations too, for exact lookups in /rainmap/at (NaN = missing)
+    stations = np.array(
+        [[p["lat"], p["lon"], np.nan if p["precipitation"] is None else p["precipitation"]] for p in data],
+        dtype=np.float64,
+    )
+    shared_cache.publish(f"rainmap_stations_{grid_size}", stations.reshape(-1, 3), {"timestamp": timestamp})
+    grid = np.array([[p["lat"], p["lon"], p["precipitation"]] for p in interp], dtype=np.float64)
+    if (grid_size, density) in HISTORY_GRIDS:
+        record_history(f"stations_{grid_size}", stations)
+        record_history(f"rainmap_{grid_size}_{density}", grid)
+    return grid.reshape(-1, 3), {
+        "timestamp": timestamp,
         "original_points": len(data),
+        "stale_points": sum(1 for p in data if p.get("stale")),
+        "missing_points": sum(1 for p in data if p.get("missing")),
+    }
+
+def record_history(series, points):
+    """Append a refresh (N x 3 lat, lon, precipitation) to the history store; never fails the refresh."""
+    try:
+        history.append(series, points[:, 0], points[:, 1], points[:, 2])
+    except Exception as e:
+        logger.warning(f"Could not record {series} in the history store: {str(e)}")
+
+def realtime_entry(grid_size, density):
+    return shared_cache.get_or_build(
+        f"rainmap_{grid_size}_{density}",
+        lambda: build_rainmap_grid(grid_size, density),
+        max_age=RAINMAP_CACHE_TTL,
+    )
+
+def generate_real_time_json(grid_size=15, density=100, entry=None):
+    entry = entry or realtime_entry(grid_size, density)
+    interp = [
+        {"lat": lat, "lon": lon, "precipitation": precipitation}
+        for lat, lon, precipitation in entry["array"].tolist()
+    ]
+    return {
+        "timestamp": entry["meta"]["timestamp"],
+        "original_points": entry["meta"]["original_points"],
+        "stale_points": entry["meta"].get("stale_points", 0),
+        "missing_points": entry["meta"].get("missing_points", 0),
+        # Refresh failed (e.g. circuit open): serving the previous grid past its TTL
+        "stale": entry.get("stale", False),
         "interpolated_points": len(interp),
         "data": interp,
     }
 
+def interpolate_cube(data, density=50):
+    """
+    Interpolate every forecast hour in one pass: (time, lat, lon) float32 cube
+    plus the lat and lon axes. Stations with no value (NaN) for an hour get no
+    weight in that hour; an hour no station reported is NaN.
+    """
+    start = time.perf_counter()
+    _, _, latg, long, lat_grid, lon_grid = interpolation_grid(data, density)
+    lats, lons, vals = reporting_stations(data)  # vals: stations x hours
+    weights = idw_weights(lats, lons, lat_grid.ravel(), lon_grid.ravel())
+    # Renormalize per hour over the stations that reported it
+    known = ~np.isnan(vals)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        field = (weights @ np.where(known, vals, 0.0)) / (weights @ known)
+    # (cells x hours) -> (hours, lon, lat) -> (hours, lat, lon)
+    cube = field.T.reshape(vals.shape[1], *lat_grid.shape).transpose(0, 2, 1)
+    metrics.observe(
+        "rainmap_forecast_interpolation_seconds",
+        time.perf_counter() - start,
+        {"density": density_label(density)},
+        help="IDW interpolation time of a whole forecast cube by grid density",
+    )
+    return cube.astype(np.float32), latg, long
+
+def build_forecast_cube(grid_size, density, hours):
+    """Fetch + interpolate the hourly forecast. Returns (cube, meta) for the shared cache."""
+    data = get_forecast(grid_size, hours)
+    cube, latg, long = interpolate_cube(data, density)
+    times = next((p["times"] for p in data if p["times"]), [])
+    return cube, {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "original_points": len(data),
+        "missing_points": sum(1 for p in data if p.get("missing")),
+        "times": times,
+        "lats": latg.tolist(),
+        "lons": long.tolist(),
+    }
+
+def forecast_entry(grid_size, density, hours):
+    return shared_cache.get_or_build(
+        f"rainmap_forecast_{grid_size}_{density}_{hours}",
+        lambda: build_forecast_cube(grid_size, density, hours),
+        max_age=RAINMAP_FORECAST_TTL,
+    )
+
+def realtime_grid(entry, density):
+    """(grid[lat, lon], lats, lons) views over a realtime entry (rows are lon-major, see interpolate())."""
+    points = entry["array"]
+    lats, lons = points[:density, 0], points[::density, 1]
+    return points[:, 2].reshape(len(lons), len(lats)).T, lats, lons
+
+def raster_source(grid_size, density, hours=24, frame=None):
+    """
+    (grid[lat, lon], lats, lons, version) for the realtime grid, or for one
+    forecast frame. `version` changes whenever the shared entry is refreshed.
+    """
+    if frame is None:
+        entry = realtime_entry(grid_size, density)
+        grid, lats, lons = realtime_grid(entry, density)
+        name = f"rainmap_{grid_size}_{density}"
+    else:
+        entry = forecast_entry(grid_size, density, hours)
+        lats, lons = np.array(entry["meta"]["lats"]), np.array(entry["meta"]["lons"])
+        grid = entry["array"][frame]
+        name = f"rainmap_forecast_{grid_size}_{density}_{hours}_{frame}"
+    return grid, lats, lons, (name, entry["generation"], entry["written_at"])
+
+# --- Point lookup from the cached grid ---
+STATION_INDEX = {}  # grid_size -> {"generation": (generation, written_at), "index": {(lat, lon): row}}
+
+def station_index(grid_size, entry):
+    """{(lat, lon) rounded to 4 decimals: row} for the stations entry, rebuilt once per refresh."""
+    version = (entry["generation"], entry["written_at"])
+    cached = STATION_INDEX.get(grid_size)
+    if cached is None or cached["generation"] != version:
+        index = {(round(lat, 4), round(lon, 4)): row for row, (lat, lon, _) in enumerate(entry["array"].tolist())}
+        cached = STATION_INDEX[grid_size] = {"generation": version, "index": index}
+    return cached["index"]
+
+def lookup_cached(lat, lon, grid_size=15, density=50, max_age=RAINMAP_CACHE_TTL):
+    """
+    Precipitation at (lat, lon) from the last refresh: exact match with a fetched
+    station, else bilinear sample of the interpolated grid. None on a miss or stale data.
+    """
+    now = time.time()
+
+    stations = shared_cache.read(f"rainmap_stations_{grid_size}")
+    if stations is not None and now - stations["written_at"] < max_age:
+        row = station_index(grid_size, stations).get((round(lat, 4), round(lon, 4)))
+        if row is not None and not np.isnan(stations["array"][row, 2]):
+            return {
+                "lat": lat,
+                "lon": lon,
+                "precipitation": float(stations["array"][row, 2]),
+                "source": "station",
+                "timestamp": stations["meta"]["timestamp"],
+                "data_age": round(now - stations["written_at"], 1),
+            }
+
+    entry = shared_cache.read(f"rainmap_{grid_size}_{density}")
+    if entry is not None and now - entry["written_at"] < max_age:
+        grid, lats, lons = realtime_grid(entry, density)
+        value = float(raster.sample(grid, lats, lons, lat, lon))
+        if not np.isnan(value):
+            return {
+                "lat": lat,
+                "lon": lon,
+                "precipitation": value,
+                "source": "grid",
+                "timestamp": entry["meta"]["timestamp"],
+                "data_age": round(now - entry["written_at"], 1),
+            }
+    return None
+
+def lookup_point(lat, lon, grid_size=15, density=50, max_age=RAINMAP_CACHE_TTL):
+    """lookup_cached(), falling back to a live fetch only on a miss or stale data."""
+    cached = lookup_cached(lat, lon, grid_size, density, max_age)
+    if cached is not None:
+        return cached
+    metrics.inc("rainmap_point_live_fetch_total", help="Point lookups that had to go upstream")
+    data = fetch_point({"lat": lat, "lon": lon})
+    # Fallback fields (stale, data_age, missing) from a failed fetch win over the live defaults
+    return {
+        "source": "live",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "data_age": 0.0,
+        **data,
+    }
+
+# --- 7b. Viewport tiles ---
+STATION_VALUES = {}  # (lat, lon) -> (fetched_at, point), lattice stations shared by neighbouring tiles
+_station_lock = threading.Lock()
+TILE_CACHE = OrderedDict()  # (i, j, cells) -> tile, LRU
+_tile_lock = threading.Lock()
+_tile_builds = {}  # (i, j, cells) -> Lock, so concurrent viewports build a tile once
+
+def parse_bbox(bbox):
+    """'min_lon,min_lat,max_lon,max_lat' clipped to DOMAIN. ValueError if malformed or outside it."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise ValueError("bbox must be min_lon,min_lat,max_lon,max_lat")
+    if not (min_lon < max_lon and min_lat < max_lat):
+        raise ValueError("bbox minimums must be below its maximums")
+    clipped = (max(min_lon, DOMAIN[0]), max(min_lat, DOMAIN[2]), min(max_lon, DOMAIN[1]), min(max_lat, DOMAIN[3]))
+    if clipped[0] >= clipped[2] or clipped[1] >= clipped[3]:
+        raise ValueError(f"bbox does not intersect the rainmap domain {DOMAIN[0]},{DOMAIN[2]},{DOMAIN[1]},{DOMAIN[3]}")
+    return clipped
+
+def tile_cells(resolution):
+    """Cells per tile side for a requested resolution (snapped so tiles divide evenly)."""
+    if not resolution > 0:
+        raise ValueError("resolution must be positive")
+    return int(min(max(round(TILE_DEG / resolution), 1), MAX_TILE_CELLS))
+
+def tile_range(lo, hi, origin):
+    """Indices of the tiles along one axis that intersect [lo, hi]."""
+    return range(int(np.floor((lo - origin) / TILE_DEG)), int(np.ceil((hi - origin) / TILE_DEG)))
+
+def tile_stations(min_lon, min_lat):
+    """Lattice points and cities within TILE_HALO of the tile with SW corner (min_lon, min_lat)."""
+    def axis(lo, hi, origin, end):
+        k = np.arange(np.ceil((max(lo, origin) - origin) / STATION_SPACING),
+                      np.floor((min(hi, end) - origin) / STATION_SPACING) + 1)
+        return np.round(origin + k * STATION_SPACING, 4).tolist()
+
+    lons = axis(min_lon - TILE_HALO, min_lon + TILE_DEG + TILE_HALO, DOMAIN[0], DOMAIN[1])
+    lats = axis(min_lat - TILE_HALO, min_lat + TILE_DEG + TILE_HALO, DOMAIN[2], DOMAIN[3])
+    points = [{"lat": lat, "lon": lon} for lat in lats for lon in lons]
+    points.extend(
+        p for p in cityPoints
+        if min_lon - TILE_HALO <= p["lon"] <= min_lon + TILE_DEG + TILE_HALO
+        and min_lat - TILE_HALO <= p["lat"] <= min_lat + TILE_DEG + TILE_HALO
+    )
+    return points
+
+def station_values(points):
+    """
+    Current precipitation for `points`, fetched at most once per RAINMAP_CACHE_TTL:
+    the misses go upstream in one batched request. Failed (stale/missing) points
+    are not kept, so the next tile that needs them retries.
+    """
+    now = time.time()
+    keys = [(p["lat"], p["lon"]) for p in points]
+    with _station_lock:
+        known = {k: STATION_VALUES[k][1] for k in keys
+                 if k in STATION_VALUES and now - STATION_VALUES[k][0] < RAINMAP_CACHE_TTL}
+    misses = [p for p, k in zip(points, keys) if k not in known]
+    if misses:
+        fetched = fetch_points_batch(misses)
+        with _station_lock:
+            for p in fetched:
+                key = (p["lat"], p["lon"])
+                known[key] = p
+                if not p.get("stale") and not p.get("missing"):
+                    STATION_VALUES[key] = (now, p)
+    return [known[k] for k in keys]
+
+def build_tile(i, j, cells):
+    """IDW of tile (i, j) at cells x cells cell centers: grid[lat, lon] plus its axes and stations."""
+    min_lon, min_lat = DOMAIN[0] + i * TILE_DEG, DOMAIN[2] + j * TILE_DEG
+    centers = (np.arange(cells) + 0.5) * (TILE_DEG / cells)
+    lons, lats = min_lon + centers, min_lat + centers
+    data = station_values(tile_stations(min_lon, min_lat))
+    slats, slons, vals = reporting_stations(data)
+    lat_grid, lon_grid = np.meshgrid(lats, lons, indexing="ij")
+    grid = (idw_weights(slats, slons, lat_grid.ravel(), lon_grid.ravel()) @ vals).reshape(cells, cells)
+    degraded = any(p.get("stale") or p.get("missing") for p in data)
+    return {"computed_at": time.time(), "lats": lats, "lons": lons, "grid": grid, "stations": data,
+            "degraded": degraded}
+
+def cached_tile(i, j, cells):
+    """
+    Tile from the LRU while younger than RAINMAP_CACHE_TTL (TILE_DEGRADED_TTL if
+    built with stale or missing stations), else rebuilt. Returns (tile, hit).
+    """
+    key = (i, j, cells)
+
+    def fresh():
+        tile = TILE_CACHE.get(key)
+        ttl = TILE_DEGRADED_TTL if tile is not None and tile["degraded"] else RAINMAP_CACHE_TTL
+        if tile is not None and time.time() - tile["computed_at"] < ttl:
+            TILE_CACHE.move_to_end(key)
+            return tile
+        return None
+
+    with _tile_lock:
+        tile = fresh()
+        build_lock = None if tile else _tile_builds.setdefault(key, threading.Lock())
+    if tile is None:
+        with build_lock:
+            with _tile_lock:
+                tile = fresh()
+            if tile is None:
+                try:
+                    tile = build_tile(i, j, cells)
+                    with _tile_lock:
+                        TILE_CACHE[key] = tile
+                        while len(TILE_CACHE) > TILE_CACHE_SIZE:
+                            TILE_CACHE.popitem(last=False)
+                finally:
+                    with _tile_lock:
+                        _tile_builds.pop(key, None)
+                metrics.inc("rainmap_tile_cache_total", {"result": "miss"}, help="Viewport tile lookups")
+                return tile, False
+    metrics.inc("rainmap_tile_cache_total", {"result": "hit"}, help="Viewport tile lookups")
+    return tile, True
+
+def generate_viewport_json(bbox, resolution=DEFAULT_RESOLUTION):
+    """
+    Interpolated precipitation over `bbox` only, stitched from the tiles it
+    intersects. Same body as /realtime (points in the same lon-major order)
+    plus the clipped bbox, the effective resolution and tile counts.
+    """
+    min_lon, min_lat, max_lon, max_lat = parse_bbox(bbox)
+    cells = tile_cells(resolution)
+    tiles_x, tiles_y = tile_range(min_lon, max_lon, DOMAIN[0]), tile_range(min_lat, max_lat, DOMAIN[2])
+    if len(tiles_x) * len(tiles_y) * cells * cells > MAX_VIEWPORT_CELLS:
+        raise ValueError("viewport too large for this resolution: use a coarser resolution or a smaller bbox")
+
+    start = time.perf_counter()
+    tiles, hits = {}, 0
+    for j in tiles_y:
+        for i in tiles_x:
+            tiles[i, j], hit = cached_tile(i, j, cells)
+            hits += hit
+    # Tiles are [lat, lon]: a row of tiles per j, west to east, stacked south to north
+    grid = np.vstack([np.hstack([tiles[i, j]["grid"] for i in tiles_x]) for j in tiles_y])
+    lons = np.concatenate([tiles[i, tiles_y[0]]["lons"] for i in tiles_x])
+    lats = np.concatenate([tiles[tiles_x[0], j]["lats"] for j in tiles_y])
+    in_lat = (lats >= min_lat) & (lats <= max_lat)
+    in_lon = (lons >= min_lon) & (lons <= max_lon)
+    grid, lats, lons = grid[np.ix_(in_lat, in_lon)], lats[in_lat], lons[in_lon]
+    metrics.observe(
+        "rainmap_viewport_seconds",
+        time.perf_counter() - start,
+        {"tiles": "cached" if hits == len(tiles) else "computed"},
+        help="Time to assemble a viewport rainmap from tiles",
+    )
+
+    stations = {(p["lat"], p["lon"]): p for tile in tiles.values() for p in tile["stations"]}.values()
+    lon_grid, lat_grid = np.meshgrid(lons, lats, indexing="ij")
+    data = [
+        {"lat": lat, "lon": lon, "precipitation": precipitation}
+        for lat, lon, precipitation in zip(
+            lat_grid.ravel().tolist(), lon_grid.ravel().tolist(), grid.T.ravel().tolist()
+        )
+    ]
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(min(t["computed_at"] for t in tiles.values()))),
+        "bbox": [min_lon, min_lat, max_lon, max_lat],
+        "resolution": TILE_DEG / cells,
+        "tiles": len(tiles),
+        "tiles_cached": hits,
+        "original_points": len(stations),
+        "stale_points": sum(1 for p in stations if p.get("stale")),
+        "missing_points": sum(1 for p in stations if p.get("missing")),
+        # Some tile was built from stale or missing stations (cached only TILE_DEGRADED_TTL)
+        "stale": any(t["degraded"] for t in tiles.values()),
+        "interpolated_points": len(data),
+        "data": data,
+    }
+
 # === 8. FastAPI Interpolated Grid Route ====
+# Plain `def` routes run in the threadpool, so upstream fetches don't block the event loop
 @router.get("/realtime")
-async def get_real_time_rainmap(grid_size: int = 15, density: int = 50):
+def get_real_time_rainmap(request: Request, grid_size: int = 15, density: int = 50,
+                          bbox: str = None, resolution: float = DEFAULT_RESOLUTION):
     """
     Returns real-time interpolated precipitation data as JSON.
+    The body is built and compressed once per grid refresh (see compression.py).
+    With `bbox` (min_lon,min_lat,max_lon,max_lat) only that viewport is computed,
+    at `resolution` degrees per cell, from cached tiles (grid_size/density are ignored).
     Example: GET /rainmap/realtime?grid_size=10&density=40
+    Example: GET /rainmap/realtime?bbox=-101,19,-98,21&resolution=0.05
     """
+    if bbox is not None:
+        try:
+            return JSONResponse(content=generate_viewport_json(bbox, resolution))
+        except ValueError as e:
+            return JSONResponse(status_code=400, content={"error": str(e)})
+        except Exception as e:
+            logger.error(f"Error in /rainmap/realtime (bbox={bbox}): {str(e)}")
+            logger.error(traceback.format_exc())
+            return JSONResponse(
+                status_code=200,
+                content={
+                    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "original_points": 0,
+                    "interpolated_points": 0,
+                    "data": [],
+                    "error": f"Could not fetch data: {str(e)}"
+                }
+            )
+    error = grid_error(grid_size, density)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
     try:
         logger.info(f"Received request for rainmap - grid_size: {grid_size}, density: {density}")
-        result = generate_real_time_json(grid_size, density)
-        logger.info(f"Successfully generated rainmap with {len(result['data'])} points")
-        return JSONResponse(content=result)
+        entry = realtime_entry(grid_size, density)
+        version = ("realtime", grid_size, density, entry["generation"], entry["written_at"], entry.get("stale", False))
+        response = compression.cached_response(
+            request, version, lambda: compression.json_bytes(generate_real_time_json(grid_size, density, entry))
+        )
+        # Seconds since the grid was refreshed (kept out of the body so it stays cacheable)
+        response.headers["Age"] = str(int(time.time() - entry["written_at"]))
+        return response
     except Exception as e:
         logger.error(f"Error in /rainmap/realtime: {str(e)}")
         logger.error(traceback.format_exc())
@@ -190,17 +683,291 @@ async def get_real_time_rainmap(grid_size: int = 15, density: int = 50):
             }
         )
 
+# === 8b. FastAPI Forecast Route ===
+@router.get("/forecast")
+def get_forecast_rainmap(grid_size: int = 15, density: int = 50, hours: int = 24, frame: int = None):
+    """
+    Hourly precipitation forecast interpolated over the grid, from one upstream refresh.
+    Without `frame` returns the whole cube (frames[time][lat][lon]); with `frame`
+    returns that hour in the same point-list format as /realtime.
+    Example: GET /rainmap/forecast?hours=12&frame=3
+    """
+    error = grid_error(grid_size, density)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    if not 1 <= hours <= MAX_FORECAST_HOURS:
+        return JSONResponse(
+            status_code=400, content={"error": f"hours must be between 1 and {MAX_FORECAST_HOURS}"}
+        )
+    if frame is not None and not 0 <= frame < hours:
+        return JSONResponse(status_code=400, content={"error": f"frame must be between 0 and {hours - 1}"})
+
+    try:
+        entry = forecast_entry(grid_size, density, hours)
+        meta, cube = entry["meta"], entry["array"]
+        if frame is None:
+            return JSONResponse(content={
+                "timestamp": meta["timestamp"],
+                "original_points": meta["original_points"],
+                "missing_points": meta.get("missing_points", 0),
+                "stale": entry.get("stale", False),
+                "hours": hours,
+                "times": meta["times"],
+                "lats": meta["lats"],
+                "lons": meta["lons"],
+                # Encoded straight from the float32 array (codec.py): no lists of Python floats
+                "frames": np.round(cube, 3),
+            })
+
+        lat_grid, lon_grid = np.meshgrid(meta["lats"], meta["lons"], indexing="ij")
+        data = [
+            {"lat": lat, "lon": lon, "precipitation": None if np.isnan(precipitation) else precipitation}
+            for lat, lon, precipitation in zip(
+                lat_grid.ravel().tolist(), lon_grid.ravel().tolist(), cube[frame].ravel().tolist()
+            )
+        ]
+        return JSONResponse(content={
+            "timestamp": meta["timestamp"],
+            "time": meta["times"][frame] if frame < len(meta["times"]) else None,
+            "frame": frame,
+            "hours": hours,
+            "original_points": meta["original_points"],
+            "missing_points": meta.get("missing_points", 0),
+            "stale": entry.get("stale", False),
+            "interpolated_points": len(data),
+            "data": data,
+        })
+    except Exception as e:
+        logger.error(f"Error in /rainmap/forecast: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal Server Error", "detail": str(e)},
+        )
+
+# === 8c. Raster overlay and XYZ tiles ===
+def raster_error(grid_size, density, hours, frame, fmt):
+    if fmt not in raster.MEDIA_TYPES:
+        return f"format must be one of {', '.join(raster.MEDIA_TYPES)}"
+    error = grid_error(grid_size, density)
+    if error:
+        return error
+    if frame is not None and not (1 <= hours <= MAX_FORECAST_HOURS and 0 <= frame < hours):
+        return f"frame must be between 0 and hours - 1 (hours <= {MAX_FORECAST_HOURS})"
+    return None
+
+def raster_unavailable(route, e):
+    """503 for an image route whose grid could not be built (upstream down and nothing cached)."""
+    logger.error(f"Error in {route}: {str(e)}")
+    logger.error(traceback.format_exc())
+    retry_after = int(openmeteo.BREAKER_COOLDOWN)
+    return JSONResponse(
+        status_code=503,
+        content={"error": f"Could not fetch data: {str(e)}", "retry_after": retry_after},
+        headers={"Retry-After": str(retry_after)},
+    )
+
+@router.get("/overlay")
+def get_rainmap_overlay(grid_size: int = 15, density: int = 50, format: str = "png",
+                        hours: int = 24, frame: int = None):
+    """
+    Interpolated grid as a single colormapped image (one pixel per grid cell,
+    north up). Its bounds come in the X-Rainmap-Bounds header (south,west,north,east).
+    With `frame`, renders that hour of the forecast cube instead of the realtime grid.
+    Example: GET /rainmap/overlay?format=webp
+    """
+    error = raster_error(grid_size, density, hours, frame, format)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    try:
+        grid, lats, lons, version = raster_source(grid_size, density, hours, frame)
+    except Exception as e:
+        return raster_unavailable("/rainmap/overlay", e)
+    image = raster.cached(("overlay", version, format), lambda: raster.overlay(grid, format))
+    return Response(
+        content=image,
+        media_type=raster.MEDIA_TYPES[format],
+        headers={"X-Rainmap-Bounds": f"{lats[0]},{lons[0]},{lats[-1]},{lons[-1]}"},
+    )
+
+@router.get("/tiles/{z}/{x}/{y}.{format}")
+def get_rainmap_tile(z: int, x: int, y: int, format: str, grid_size: int = 15, density: int = 50,
+                     hours: int = 24, frame: int = None):
+    """
+    Standard XYZ (Web Mercator, 256 px) tile of the interpolated grid.
+    Example: GET /rainmap/tiles/5/7/13.png
+    """
+    error = raster_error(grid_size, density, hours, frame, format)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    if not (0 <= z <= 18 and 0 <= x < 2**z and 0 <= y < 2**z):
+        return JSONResponse(status_code=404, content={"error": f"Tile {z}/{x}/{y} does not exist"})
+    try:
+        grid, lats, lons, version = raster_source(grid_size, density, hours, frame)
+    except Exception as e:
+        return raster_unavailable("/rainmap/tiles", e)
+    image = raster.cached(
+        ("tile", version, z, x, y, format),
+        lambda: raster.tile(grid, lats, lons, z, x, y, format),
+    )
+    return Response(content=image, media_type=raster.MEDIA_TYPES[format])
+
+# === 8d. Point lookup Route ===
+@router.get("/at")
+def get_rainmap_at(lat: float, lon: float, grid_size: int = 15, density: int = 50,
+                   max_age: int = RAINMAP_CACHE_TTL):
+    """
+    Precipitation at a point from the cached grid (exact station or bilinear sample),
+    falling back to a live fetch. `source` says which; `data_age` is in seconds.
+    Example: GET /rainmap/at?lat=19.43&lon=-99.13
+    """
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return JSONResponse(status_code=400, content={"error": "lat/lon out of range"})
+    error = grid_error(grid_size, density)
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    try:
+        return JSONResponse(content=lookup_point(lat, lon, grid_size, density, max_age))
+    except Exception as e:
+        logger.error(f"Error in /rainmap/at: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal Server Error", "detail": str(e)},
+        )
+
+# === 8e. History Route ===
+def parse_time(value, default):
+    """ISO 8601 (naive = server local time, like the `timestamp` fields) -> epoch seconds."""
+    if value is None:
+        return default
+    return datetime.fromisoformat(value).timestamp()
+
+@router.get("/history")
+def get_rainmap_history(lat: float, lon: float, from_: str = Query(None, alias="from"), to: str = None,
+                        grid_size: int = 15, density: int = 50, source: str = "grid"):
+    """
+    Recorded precipitation at (lat, lon) between `from` and `to` (ISO 8601,
+    default the last 24 h): the nearest interpolated cell, or the nearest
+    fetched station with source=station. One value per realtime refresh.
+    Example: GET /rainmap/history?lat=25.67&lon=-100.31&from=2026-10-18T00:00
+    """
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return JSONResponse(status_code=400, content={"error": "lat/lon out of range"})
+    if source not in ("grid", "station"):
+        return JSONResponse(status_code=400, content={"error": "source must be grid or station"})
+    if (grid_size, density) not in HISTORY_GRIDS:
+        recorded = ", ".join(f"grid_size={g}&density={d}" for g, d in sorted(HISTORY_GRIDS))
+        return JSONResponse(status_code=400, content={"error": f"History is only recorded for {recorded}"})
+    try:
+        end = parse_time(to, time.time())
+        start = parse_time(from_, end - 86400)
+    except ValueError:
+        return JSONResponse(status_code=400, content={"error": "from/to must be ISO 8601 dates"})
+    if not start <= end:
+        return JSONResponse(status_code=400, content={"error": "from must be before to"})
+    start = max(start, end - history.RETENTION_DAYS * 86400)
+
+    series = f"rainmap_{grid_size}_{density}" if source == "grid" else f"stations_{grid_size}"
+    try:
+        found = history.query(series, lat, lon, start, end)
+    except Exception as e:
+        logger.error(f"Error in /rainmap/history: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal Server Error", "detail": str(e)},
+        )
+    if found is None:
+        return JSONResponse(status_code=404, content={"error": f"No history for {series} in that range"})
+    cell_lat, cell_lon, times, values = found
+    return JSONResponse(content={
+        "lat": lat,
+        "lon": lon,
+        "cell": {"lat": cell_lat, "lon": cell_lon},
+        "source": source,
+        "from": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(start)),
+        "to": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(end)),
+        "points": len(times),
+        "series": [
+            {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(t)),
+                "precipitation": None if np.isnan(v) else round(float(v), 3),
+            }
+            for t, v in zip(times.tolist(), values.tolist())
+        ],
+    })
+
+# === 8f. Isohyet contours Route ===
+CONTOUR_THRESHOLDS = [value for value, _ in raster.COLOR_STOPS]
+MAX_CONTOUR_THRESHOLDS = 20
+
+def parse_thresholds(levels):
+    """'0.5,2,10' -> ascending positive thresholds (mm/h); None -> the raster color stops."""
+    if levels is None:
+        return CONTOUR_THRESHOLDS
+    try:
+        thresholds = [float(v) for v in levels.split(",")]
+    except ValueError:
+        raise ValueError("levels must be comma-separated numbers")
+    if not 1 <= len(thresholds) <= MAX_CONTOUR_THRESHOLDS:
+        raise ValueError(f"levels takes 1 to {MAX_CONTOUR_THRESHOLDS} thresholds")
+    if not all(np.isfinite(thresholds)) or thresholds[0] <= 0 or any(
+        a >= b for a, b in zip(thresholds, thresholds[1:])
+    ):
+        raise ValueError("levels must be positive and ascending")
+    return thresholds
+
+@router.get("/contours")
+def get_rainmap_contours(request: Request, grid_size: int = 15, density: int = 50, levels: str = None,
+                         tolerance: float = None, hours: int = 24, frame: int = None):
+    """
+    Isohyets of the interpolated grid as GeoJSON: one MultiPolygon per
+    threshold in `levels` (mm/h, default the overlay color stops) covering
+    the areas at or above it, simplified to `tolerance` degrees (default a
+    quarter of a grid cell, capped at half a cell; 0 keeps the exact outlines).
+    Built and compressed once per grid refresh.
+    With `frame`, contours that hour of the forecast cube instead.
+    Example: GET /rainmap/contours?levels=0.5,2,10
+    """
+    error = raster_error(grid_size, density, hours, frame, "png")
+    if error:
+        return JSONResponse(status_code=400, content={"error": error})
+    if tolerance is not None and not 0 <= tolerance <= 1:
+        return JSONResponse(status_code=400, content={"error": "tolerance must be between 0 and 1 degree"})
+    try:
+        thresholds = parse_thresholds(levels)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    try:
+        grid, lats, lons, version = raster_source(grid_size, density, hours, frame)
+
+        def render():
+            collection = contours.isohyets(grid, lats, lons, thresholds, tolerance)
+            collection["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(version[2]))
+            return compression.json_bytes(collection)
+
+        return compression.cached_response(request, ("contours", version, tuple(thresholds), tolerance), render)
+    except Exception as e:
+        logger.error(f"Error in /rainmap/contours: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal Server Error", "detail": str(e)},
+        )
+
 # === 9. FastAPI MEXICAN CITIES Route ===
 @router.get("/city")
-async def get_mexican_cities(selectedCity: str = "Ciudad de Mexico"):
+def get_mexican_cities(selectedCity: str = "Ciudad de Mexico", live: bool = False):
     """
-    Returns precipitation data from specific cities
+    Returns precipitation data from specific cities.
+    Served from the cached grid (see /rainmap/at) unless `live=true`.
     """
     try:
         logger.info(f"Received request for city: {selectedCity}")
         
-        # Find the city directly
-        city = next((c for c in MEXICAN_CITIES if c["name"] == selectedCity), None)
+        # Accent/case-insensitive lookup in the registry ("Guadalupe, Nuevo León" to pick the state)
+        city = cities.find(selectedCity)
 
         if not city:
             logger.warning(f"City not found: {selectedCity}")
@@ -209,7 +976,10 @@ async def get_mexican_cities(selectedCity: str = "Ciudad de Mexico"):
             )
 
         # Fetch precipitation
-        data = fetch_point({"lat": city["lat"], "lon": city["lon"]})
+        if live:
+            data = fetch_point({"lat": city["lat"], "lon": city["lon"]})
+        else:
+            data = lookup_point(city["lat"], city["lon"])
         logger.info(f"City data fetched: {data}")
         
         return JSONResponse(content=data)
@@ -220,4 +990,59 @@ async def get_mexican_cities(selectedCity: str = "Ciudad de Mexico"):
         return JSONResponse(
             status_code=500,
             content={"error": "Internal Server Error", "detail": str(e)},
-        )
\ No newline at end of file
+        )
+
+# === 10. Batch cities Route ===
+@router.get("/cities")
+def get_cities_batch(names: List[str] = Query(...), live: bool = False):
+    """
+    Precipitation for many cities in one request: cached grid values where
+    available, one batched upstream fetch for the rest (or for all with `live=true`).
+    Cities go in repeated `names` params or separated by ";" (commas belong to
+    "Name, State", see cities.find).
+    Example: GET /rainmap/cities?names=Monterrey;Guadalupe, Nuevo León&names=merida
+    """
+    try:
+        requested = [n.strip() for value in names for n in value.split(";") if n.strip()]
+        if len(requested) > MAX_BATCH_CITIES:
+            return JSONResponse(
+                status_code=400, content={"error": f"At most {MAX_BATCH_CITIES} cities per request"}
+            )
+
+        found, not_found = [], []
+        for name in requested:
+            city = cities.find(name)
+            (found.append((name, city)) if city else not_found.append(name))
+
+        results = [None if live else lookup_cached(city["lat"], city["lon"]) for _, city in found]
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            metrics.inc("rainmap_point_live_fetch_total", value=len(misses))
+            fetched = fetch_points_batch([{"lat": found[i][1]["lat"], "lon": found[i][1]["lon"]} for i in misses])
+            timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+            for i, data in zip(misses, fetched):
+                # Fallback points keep their own stale/missing flags and data_age
+                results[i] = {"source": "live", "timestamp": timestamp, "data_age": 0.0, **data}
+
+        return JSONResponse(content={
+            "cities": [
+                {"query": name, "name": city["name"], "state": city["state"], **result}
+                for (name, city), result in zip(found, results)
+            ],
+            "not_found": not_found,
+        })
+    except Exception as e:
+        logger.error(f"Error in /rainmap/cities: {str(e)}")
+        logger.error(traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Internal Server Error", "detail": str(e)},
+        )
+
+@router.get("/cities/search")
+def search_cities(q: str, limit: int = 10):
+    """
+    City name autocomplete (prefix, accent-insensitive).
+    Example: GET /rainmap/cities/search?q=san
+    """
+    return JSONResponse(content={"query": q, "results": cities.search(q, max(1, min(limit, 50)))})
@@ -1,20 +1,29 @@
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
 from pathlib import Path
-import json, glob, os, time
+import glob, os, time, re, bisect, threading
 from datetime import datetime
-
-router = APIRouter()
-# Obtener el directorio base del proyecto (donde está este archivo)
-BASE_DIR = Path(__file__).parent.parent.parent
-DATA_DIR = BASE_DIR / "Data" / "Data"
+import numpy as np
+from app.services import cities, codec, compression, metrics, profiler, scheduler, shared_cache
+from app.services.codec import JSONResponse
+from app.services.exposicion import CARPETA_EXPOSICION, EXPOSICION_RADIO_KM, clave_ciudad, distancia_efectiva
+from app.services.geojson_tormentas import CARPETA_GEOJSON, a_geojson
+from app.services.utils import DATA_DIR, MARCADOR_COMPLETO, env_bool
+
+router = APIRouter(route_class=profiler.ProfiledRoute)
 print(f"DATA_DIR: {DATA_DIR}")
 
-# --- CACHE SIMPLE ---
-# Guardará las rutas a los directorios por 5 minutos (300 segundos)
-LATEST_DIR_CACHE = {"path": None, "timestamp": 0}
-DATE_DIR_CACHE = {}  # key: date, value: {"path": None, "timestamp": 0}
+# --- ÍNDICE DE SNAPSHOTS ---
+# Lista ordenada de snapshots completos. Se reconstruye cuando cambia el mtime de
+# DATA_DIR (schedule.py publica cada corrida con un rename atómico, lo que
+# actualiza el mtime) o, por seguridad, cada CACHE_TTL segundos.
+# Con varios workers, solo uno escanea el directorio y publica el índice en el
+# cache compartido (ver shared_cache.py); los demás lo leen de ahí.
+SNAPSHOT_INDEX = {"names": [], "mtime": None, "timestamp": 0}
 CACHE_TTL = 300  # 5 minutos
+SNAPSHOT_RE = re.compile(r"^\d{8}_\d{6}$")
+# Aceptar directorios escritos antes del marcador _COMPLETE (ver schedule.py)
+ACCEPT_LEGACY_SNAPSHOTS = env_bool("ACCEPT_LEGACY_SNAPSHOTS", True)
 
 
 def parse_dirname_timestamp(dir_path):
@@ -29,91 +38,144 @@ def parse_dirname_timestamp(dir_path):
         return 0
 
 
+def is_complete_snapshot(dir_path):
+    """Un snapshot es visible solo si tiene nombre válido y su marcador _COMPLETE."""
+    if not SNAPSHOT_RE.match(dir_path.name) or not dir_path.is_dir():
+        return False
+    if (dir_path / MARCADOR_COMPLETO).exists():
+        return True
+    return ACCEPT_LEGACY_SNAPSHOTS
+
+
+def get_snapshot_index():
+    """Devuelve los nombres de los snapshots completos, ordenados por timestamp."""
+    current_time = time.time()
+    try:
+        mtime = DATA_DIR.stat().st_mtime_ns
+    except FileNotFoundError:
+        return []
+
+    # 1. Verificar cache: mismo mtime y dentro del TTL
+    if SNAPSHOT_INDEX["mtime"] == mtime and (
+        current_time - SNAPSHOT_INDEX["timestamp"] < CACHE_TTL
+    ):
+        metrics.inc("storm_snapshot_index_cache_total", {"result": "hit"})
+        return SNAPSHOT_INDEX["names"]
+
+    # 2. Reconstruir (los nombres YYYYMMDD_HHMMSS ordenan igual que su timestamp)
+    metrics.inc(
+        "storm_snapshot_index_cache_total",
+        {"result": "miss"},
+        help="Snapshot index lookups served from cache (hit) or rebuilt (miss)",
+    )
+    entry = shared_cache.get_or_build(
+        "snapshot_index",
+        build_snapshot_index,
+        max_age=CACHE_TTL,
+        valid=lambda e: e["meta"].get("mtime") == mtime and e["meta"].get("data_dir") == str(DATA_DIR),
+        serve_stale=False,
+    )
+    names = [name.decode() for name in entry["array"].tolist()]
+    metrics.set_gauge("storm_snapshots", len(names), help="Complete snapshots in the index")
+    SNAPSHOT_INDEX.update(names=names, mtime=mtime, timestamp=current_time)
+    INDEX_READY.set()
+    return names
+
+
+def build_snapshot_index():
+    """Escanea DATA_DIR. Devuelve (nombres como arreglo S15, meta) para el cache compartido."""
+    mtime = DATA_DIR.stat().st_mtime_ns
+    with metrics.timed(
+        "storm_snapshot_index_scan_seconds", help="Time to scan DATA_DIR and rebuild the snapshot index"
+    ):
+        names = sorted(d.name for d in DATA_DIR.iterdir() if is_complete_snapshot(d))
+    return np.array(names, dtype="S15"), {"mtime": mtime, "data_dir": str(DATA_DIR)}
+
+
+def _names_for_date(names, target_date: str):
+    """Filtra los snapshots cuyo nombre contiene la fecha (búsqueda binaria si es YYYYMMDD)."""
+    if len(target_date) == 8 and target_date.isdigit():
+        lo = bisect.bisect_left(names, target_date)
+        hi = bisect.bisect_left(names, target_date + "~")
+        return names[lo:hi]
+    return [name for name in names if target_date in name]
+
+
+# Listo cuando el índice de snapshots se construyó al menos una vez (ver /readyz en main.py)
+INDEX_READY = threading.Event()
+# Último error al construirlo (None si no falló), para /readyz
+INDEX_STATUS = {"error": None, "attempts": 0}
+INDEX_RETRY_MAX = 60  # segundos entre reintentos, como máximo
+
+
+def warm_snapshot_index():
+    """
+    Construye el índice en segundo plano al iniciar e imprime un resumen.
+    Si falla (p.ej. DATA_DIR montado tarde) reintenta con espera creciente; el
+    worker no se reporta listo hasta lograrlo.
+    """
+    espera = 1
+    while True:
+        INDEX_STATUS["attempts"] += 1
+        try:
+            names = get_snapshot_index()
+        except Exception as e:
+            INDEX_STATUS["error"] = str(e)
+            print(f"⚠️ Error al construir el índice de snapshots (reintento en {espera} s): {e}")
+            time.sleep(espera)
+            espera = min(espera * 2, INDEX_RETRY_MAX)
+            continue
+        INDEX_STATUS["error"] = None
+        INDEX_READY.set()
+        latest = f", más reciente: {names[-1]}" if names else ""
+        print(f"📂 Índice de snapshots listo: {len(names)} snapshots{latest}")
+        return
+
+
 # Al iniciar, mostrar info
 @router.on_event("startup")
 async def startup_event():
     print("=" * 60)
     print(f"DATA_DIR: {DATA_DIR.absolute()}")
     print(f"DATA_DIR existe: {DATA_DIR.exists()}")
-
-    if DATA_DIR.exists():
-        dirs = [d for d in DATA_DIR.glob("*") if d.is_dir()]
-        print(f"\nDirectorios encontrados ({len(dirs)}):")
-
-        # Mostrar solo los últimos 10
-        for d in sorted(dirs)[-10:]:
-            mtime = datetime.fromtimestamp(os.path.getmtime(d))
-            print(f" {d.name} - modificado: {mtime}")
-
-        if dirs:
-            # USAR LA MISMA LÓGICA QUE get_latest_directory()
-            latest = max(dirs, key=parse_dirname_timestamp)
-            print(f"\n Directorio elegido como más reciente: {latest.name}")
-            print(f"   Timestamp parseado: {parse_dirname_timestamp(latest)}")
     print("=" * 60)
+    # Escanear DATA_DIR tarda más cuanto más historial hay: no bloquear el arranque
+    threading.Thread(target=warm_snapshot_index, name="snapshot-index", daemon=True).start()
 
 
 def get_latest_directory():
-    """Devuelve el directorio más reciente (AHORA CON CACHE)"""
-    current_time = time.time()
-    # 1. Verificar cache
-    if LATEST_DIR_CACHE["path"] and (
-        current_time - LATEST_DIR_CACHE["timestamp"] < CACHE_TTL
-    ):
-        return LATEST_DIR_CACHE["path"]
-
-    # 2. Si no hay cache, escanear
-    if not DATA_DIR.exists():
-        return None
-    dirs = [d for d in DATA_DIR.glob("*") if d.is_dir()]
-    if not dirs:
+    """Devuelve el snapshot completo más reciente."""
+    names = get_snapshot_index()
+    if not names:
         return None
-
-    # 3. Calcular y guardar en cache
-    latest = max(dirs, key=parse_dirname_timestamp)
-    LATEST_DIR_CACHE["path"] = latest
-    LATEST_DIR_CACHE["timestamp"] = current_time
-    return latest
+    return DATA_DIR / names[-1]
 
 
 def get_directory_by_date(target_date: str):
-    """Encuentra el directorio más reciente para una fecha (AHORA CON CACHE)"""
-    current_time = time.time()
-    # 1. Verificar cache para esta fecha
-    if target_date in DATE_DIR_CACHE and (
-        current_time - DATE_DIR_CACHE[target_date]["timestamp"] < CACHE_TTL
-    ):
-        return DATE_DIR_CACHE[target_date]["path"]
-
-    # 2. Si no hay cache, escanear
-    if not DATA_DIR.exists():
-        return None
-    matching_dirs = [
-        dir_path for dir_path in DATA_DIR.glob(f"*{target_date}*") if dir_path.is_dir()
-    ]
-
-    # 3. Calcular y guardar en cache
-    if not matching_dirs:
-        DATE_DIR_CACHE[target_date] = {"path": None, "timestamp": current_time}
+    """Encuentra el snapshot completo más reciente para una fecha."""
+    matching = _names_for_date(get_snapshot_index(), target_date)
+    if not matching:
         return None
+    return DATA_DIR / matching[-1]
 
-    latest_for_date = max(matching_dirs, key=parse_dirname_timestamp)
-    DATE_DIR_CACHE[target_date] = {"path": latest_for_date, "timestamp": current_time}
-    return latest_for_date
 
-
-# --- NUEVA FUNCIÓN ---
 def get_all_dirs_by_date(target_date: str):
-    """Encuentra TODOS los directorios de una fecha, ordenados por timestamp."""
-    if not DATA_DIR.exists():
-        return []
+    """Encuentra TODOS los snapshots completos de una fecha, ordenados por timestamp."""
+    return [DATA_DIR / name for name in _names_for_date(get_snapshot_index(), target_date)]
 
-    matching_dirs = [
-        dir_path for dir_path in DATA_DIR.glob(f"*{target_date}*") if dir_path.is_dir()
-    ]
 
-    # Ordenar por el timestamp para que las imágenes salgan en orden
-    return sorted(matching_dirs, key=parse_dirname_timestamp)
+def load_compact_records(snapshot_dir):
+    """Carga los registros compactos de un snapshot: {storm_id: registro}."""
+    compact_dir = snapshot_dir / "Compacto"
+    if not compact_dir.exists():
+        raise HTTPException(
+            status_code=404,
+            detail="Este snapshot no tiene formato compacto (generado antes de que existiera).",
+        )
+    records = {}
+    for json_file in sorted(compact_dir.glob("tormenta_*.json")):
+        records[json_file.stem.replace("tormenta_", "", 1)] = codec.load(json_file)
+    return records
 
 
 @router.get("/")
@@ -121,48 +183,66 @@ def root():
     return {"message": "API del Sistema de Monitoreo de Tormentas Tropicales"}
 
 
+@router.get("/scheduler")
+def get_scheduler_status():
+    """Devuelve el estado del planificador: próxima corrida planeada, motivo y duraciones."""
+    try:
+        return JSONResponse(content=codec.load(scheduler.STATE_FILE))
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=404, detail="El planificador aún no ha publicado su estado."
+        )
+
+
 # RUTAS JSON =========================
 
 
 @router.get("/storms")
-def get_all_storms():
-    """Devuelve el JSON general más reciente (todas las tormentas)."""
+def get_all_storms(request: Request, compact: bool = False):
+    """
+    Devuelve el JSON general más reciente (todas las tormentas).
+    Con ?compact=true devuelve los registros compactos (ver storm_encoder.py).
+    Las respuestas de snapshots publicados se comprimen una sola vez (ver compression.py).
+    """
     latest_dir = get_latest_directory()
     if not latest_dir:
         raise HTTPException(status_code=404, detail="No hay datos generados aún.")
 
+    if compact:
+        records = load_compact_records(latest_dir)
+        return compression.cached_response(
+            request, ("storms_compact", latest_dir.name), lambda: compression.json_bytes(records)
+        )
+
     json_dir = latest_dir / "JSON"
     json_files = sorted(json_dir.glob("tormentas*.json"))
     if not json_files:
         raise HTTPException(status_code=404, detail="No se encontró el JSON general.")
 
-    latest_json = json_files[-1]
-    with open(latest_json, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return JSONResponse(content=data)
+    # El archivo publicado se parsea y comprime una vez, no en cada petición
+    return compression.file_response(request, json_files[-1])
 
 
 @router.get("/storms/{storm_id}")
-def get_single_storm(storm_id: str):
-    """Devuelve el JSON individual de una tormenta específica."""
+def get_single_storm(request: Request, storm_id: str, compact: bool = False):
+    """Devuelve el JSON individual de una tormenta específica (?compact=true: registro compacto)."""
     latest_dir = get_latest_directory()
     if not latest_dir:
         raise HTTPException(status_code=404, detail="No hay datos generados aún.")
 
-    json_path = latest_dir / "JSON" / f"tormenta_{storm_id}.json"
+    carpeta = "Compacto" if compact else "JSON"
+    json_path = latest_dir / carpeta / f"tormenta_{storm_id}.json"
     if not json_path.exists():
         raise HTTPException(
             status_code=404,
             detail=f"No se encontró el archivo JSON de la tormenta {storm_id}.",
         )
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    return JSONResponse(content=data)
+    return compression.file_response(request, json_path)
 
 
 @router.get("/date/{date}/storms")
-def get_storms_by_date(date: str):
+def get_storms_by_date(request: Request, date: str):
     """Devuelve todos los JSON de una fecha específica."""
     target_dir = get_directory_by_date(date)
     if not target_dir:
@@ -182,28 +262,30 @@ def get_storms_by_date(date: str):
             status_code=404, detail="No se encontraron archivos JSON para esta fecha."
         )
 
-    all_data = {}
-    for json_file in json_files:
-        try:
-            with open(json_file, "r", encoding="utf-8") as f:
-                all_data[json_file.stem] = json.load(f)
-        except Exception as e:
-            all_data[json_file.stem] = {
-                "error": f"No se pudo cargar el archivo: {str(e)}"
+    def render():
+        all_data = {}
+        for json_file in json_files:
+            try:
+                all_data[json_file.stem] = codec.load(json_file)
+            except Exception as e:
+                all_data[json_file.stem] = {
+                    "error": f"No se pudo cargar el archivo: {str(e)}"
+                }
+        return compression.json_bytes(
+            {
+                "date": date,
+                "directory": target_dir.name,
+                "total_files": len(json_files),
+                "data": all_data,
             }
+        )
 
-    return JSONResponse(
-        content={
-            "date": date,
-            "directory": target_dir.name,
-            "total_files": len(json_files),
-            "data": all_data,
-        }
-    )
+    # El snapshot publicado no cambia: se lee, serializa y comprime una vez
+    return compression.cached_response(request, ("date_storms", date, target_dir.name), render)
 
 
 @router.get("/date/{date}/storms/{storm_id}")
-def get_storm_by_date_and_id(date: str, storm_id: str):
+def get_storm_by_date_and_id(request: Request, date: str, storm_id: str):
     """Devuelve el archivo JSON de una tormenta específica en una fecha específica."""
     target_dir = get_directory_by_date(date)
     if not target_dir:
@@ -227,24 +309,161 @@ def get_storm_by_date_and_id(date: str, storm_id: str):
             )
         json_path = json_files[0]
 
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    def render():
+        data = codec.load(json_path)
+        return compression.json_bytes(
+            {
+                "date": date,
+                "storm_id": storm_id,
+                "file": json_path.name,
+                "data": data,
+            }
+        )
+
+    return compression.cached_response(request, ("date_storm", date, storm_id, str(json_path)), render)
+
+
+# RUTAS EXPOSICIÓN =========================
+
+# Tablas de exposición del snapshot más reciente; los snapshots publicados no
+# cambian, así que basta con invalidar cuando cambia el snapshot.
+# Archivos derivados del snapshot más reciente (Exposicion/, GeoJSON/), leídos una vez por snapshot
+SNAPSHOT_FILE_CACHE = {"snapshot": None, "files": {}}
+
+
+def load_snapshot_file(snapshot_dir, folder, filename, missing_detail):
+    """Lee (y guarda en cache) <snapshot>/<folder>/<filename>, o 404 con `missing_detail`."""
+    if SNAPSHOT_FILE_CACHE["snapshot"] != snapshot_dir.name:
+        SNAPSHOT_FILE_CACHE.update(snapshot=snapshot_dir.name, files={})
+    files = SNAPSHOT_FILE_CACHE["files"]
+    if (folder, filename) not in files:
+        path = snapshot_dir / folder / filename
+        if not path.exists():
+            raise HTTPException(status_code=404, detail=missing_detail)
+        files[(folder, filename)] = codec.load(path)
+    return files[(folder, filename)]
+
+
+def load_exposure(snapshot_dir, filename):
+    """Archivo de <snapshot>/Exposicion, o 404."""
+    return load_snapshot_file(
+        snapshot_dir, CARPETA_EXPOSICION, filename,
+        "Este snapshot no tiene tabla de exposición para esa consulta.",
+    )
+
+
+@router.get("/storms/{storm_id}/exposure")
+def get_storm_exposure(request: Request, storm_id: str, radius_km: float = 200):
+    """
+    Ciudades a menos de `radius_km` de la trayectoria, el pronóstico o el borde
+    del cono de la tormenta, ordenadas por esa distancia.
+    """
+    latest_dir = get_latest_directory()
+    if not latest_dir:
+        raise HTTPException(status_code=404, detail="No hay datos generados aún.")
 
-    return JSONResponse(
-        content={
-            "date": date,
-            "storm_id": storm_id,
-            "file": json_path.name,
-            "data": data,
-        }
+    table = load_exposure(latest_dir, f"tormenta_{storm_id}.json")
+    if radius_km > table["radius_km"]:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La tabla de exposición solo cubre hasta {table['radius_km']:.0f} km.",
+        )
+    return compression.cached_response(
+        request,
+        ("exposure", latest_dir.name, storm_id, radius_km),
+        lambda: compression.json_bytes(
+            {
+                "snapshot": latest_dir.name,
+                "storm_id": storm_id,
+                "radius_km": radius_km,
+                "cities": [c for c in table["cities"] if distancia_efectiva(c) <= radius_km],
+            }
+        ),
+    )
+
+
+@router.get("/cities/{name}/threats")
+def get_city_threats(request: Request, name: str, radius_km: float = 500):
+    """Tormentas del snapshot más reciente que pasan o pasarán a menos de `radius_km` de la ciudad."""
+    city = cities.find(name)
+    if not city:
+        raise HTTPException(status_code=404, detail=f"Ciudad desconocida: {name}")
+    # ciudades.json solo guarda amenazas hasta el radio con que el scheduler calculó la tabla
+    if radius_km > EXPOSICION_RADIO_KM:
+        raise HTTPException(
+            status_code=400,
+            detail=f"La tabla de exposición solo cubre hasta {EXPOSICION_RADIO_KM:.0f} km.",
+        )
+
+    latest_dir = get_latest_directory()
+    if not latest_dir:
+        raise HTTPException(status_code=404, detail="No hay datos generados aún.")
+
+    threats = load_exposure(latest_dir, "ciudades.json").get(clave_ciudad(city), [])
+    return compression.cached_response(
+        request,
+        ("threats", latest_dir.name, clave_ciudad(city), radius_km),
+        lambda: compression.json_bytes(
+            {
+                "snapshot": latest_dir.name,
+                "city": city["name"],
+                "state": city["state"],
+                "radius_km": radius_km,
+                "threats": [t for t in threats if distancia_efectiva(t) <= radius_km],
+            }
+        ),
+    )
+
+
+@router.get("/storms/{storm_id}/geojson")
+def get_storm_geojson(request: Request, storm_id: str, zoom: int = 6):
+    """
+    Trayectoria, pronóstico y cono de la tormenta como GeoJSON, simplificados para
+    el `zoom` del mapa (XYZ, 0-22): a menor zoom, menos vértices y decimales.
+    """
+    if not 0 <= zoom <= 22:
+        raise HTTPException(status_code=400, detail="zoom debe estar entre 0 y 22.")
+    latest_dir = get_latest_directory()
+    if not latest_dir:
+        raise HTTPException(status_code=404, detail="No hay datos generados aún.")
+
+    registro = load_snapshot_file(
+        latest_dir, CARPETA_GEOJSON, f"tormenta_{storm_id}.json",
+        "Este snapshot no tiene GeoJSON para esa tormenta.",
+    )
+
+    def render():
+        geojson = a_geojson(registro, zoom)
+        geojson["properties"]["snapshot"] = latest_dir.name
+        return compression.json_bytes(geojson)
+
+    return compression.cached_response(
+        request, ("geojson", latest_dir.name, storm_id, zoom), render, media_type="application/geo+json"
     )
 
 
 # RUTAS MAPAS =========================
 
 
+def find_profile_map(map_path, profile):
+    """Ruta del mapa en otro perfil de render (ver render.py), o 404 si no se generó."""
+    if profile is None:
+        return map_path, "image/png"
+    # Import diferido: render.py carga matplotlib, que la API no necesita en el camino normal
+    from app.services import render
+
+    if profile not in render.PERFILES:
+        raise HTTPException(status_code=400, detail=f"Perfil desconocido: {profile}")
+    profile_path = Path(render.ruta_para_perfil(str(map_path), profile))
+    if not profile_path.exists():
+        raise HTTPException(
+            status_code=404, detail=f"No se generó el mapa con el perfil '{profile}'."
+        )
+    return profile_path, render.MEDIA_TYPES[render.PERFILES[profile]["formato"]]
+
+
 @router.get("/maps")
-def get_general_map():
+def get_general_map(profile: str = None):
     """Devuelve el mapa general más reciente con todas las tormentas."""
     latest_dir = get_latest_directory()
     if not latest_dir:
@@ -255,13 +474,13 @@ def get_general_map():
     if not map_files:
         raise HTTPException(status_code=404, detail="No se encontró el mapa general.")
 
-    latest_map = map_files[-1]
-    return FileResponse(latest_map, media_type="image/png")
+    latest_map, media_type = find_profile_map(map_files[-1], profile)
+    return FileResponse(latest_map, media_type=media_type)
 
 
 @router.get("/maps/{storm_id}")
-def get_storm_map(storm_id: str):
-    """Devuelve el mapa individual de una tormenta específica mas reciente."""
+def get_storm_map(storm_id: str, profile: str = None):
+    """Devuelve el mapa individual de una tormenta específica mas reciente (?profile=web)."""
     latest_dir = get_latest_directory()
     if not latest_dir:
         raise HTTPException(status_code=404, detail="No hay mapas generados aún.")
@@ -272,7 +491,8 @@ def get_storm_map(storm_id: str):
             status_code=404, detail=f"No se encontró el mapa de la tormenta {storm_id}."
         )
 
-    return FileResponse(map_path, media_type="image/png")
+    map_path, media_type = find_profile_map(map_path, profile)
+    return FileResponse(map_path, media_type=media_type)
 
 
 # NUEVAS RUTAS PARA OBTENER METADATA DE IMÁGENES
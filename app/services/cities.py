@@ -0,0 +1,97 @@
+"""
+City registry for the rainmap endpoints, loaded from a bundled CSV
+(name, municipality, state, lat, lon). CITIES_FILE can point at a bigger
+catalog with the same columns (e.g. the full INEGI municipality list).
+
+Names are indexed normalized (lowercase, no accents, single spaces), so
+"ciudad de mexico" finds "Ciudad de México". Both the locality name and its
+municipality are indexed. Prefix search uses bisect over the sorted keys.
+The file is read on first use, not at import, to keep startup cheap.
+"""
+import bisect
+import csv
+import os
+import threading
+import unicodedata
+from pathlib import Path
+
+CITIES_FILE = Path(
+    os.environ.get("CITIES_FILE", Path(__file__).parent.parent / "data" / "mexican_cities.csv")
+)
+
+
+def normalize(text):
+    """'  Ciudad de  México ' -> 'ciudad de mexico'"""
+    decomposed = unicodedata.normalize("NFKD", text)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+def load_cities(path=CITIES_FILE):
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return [
+            {
+                "name": row["name"],
+                "municipality": row.get("municipality") or row["name"],
+                "state": row["state"],
+                "lat": float(row["lat"]),
+                "lon": float(row["lon"]),
+            }
+            for row in csv.DictReader(f)
+        ]
+
+
+def build_index(cities):
+    """{normalized name: [cities]} over names and municipalities, plus its sorted keys."""
+    index = {}
+    for city in cities:
+        for key in {normalize(city["name"]), normalize(city["municipality"])}:
+            index.setdefault(key, []).append(city)
+    return index, sorted(index)
+
+
+_REGISTRY = {}
+_LOCK = threading.Lock()
+
+
+def registry():
+    """{"cities", "index", "names"}, loaded once from CITIES_FILE."""
+    if not _REGISTRY:
+        with _LOCK:
+            if not _REGISTRY:
+                loaded = load_cities()
+                index, names = build_index(loaded)
+                _REGISTRY.update(cities=loaded, index=index, names=names)
+    return _REGISTRY
+
+
+def find(name):
+    """
+    City by name, accent- and case-insensitive. "Guadalupe, Nuevo León" picks
+    the state when several share the name; otherwise the first in the file wins.
+    """
+    state = None
+    if "," in name:
+        name, state = (part.strip() for part in name.rsplit(",", 1))
+    matches = registry()["index"].get(normalize(name), [])
+    if state:
+        matches = [c for c in matches if normalize(c["state"]) == normalize(state)]
+    # Prefer the locality itself over a different locality in a same-named municipality
+    exact = [c for c in matches if normalize(c["name"]) == normalize(name)]
+    return (exact or matches or [None])[0]
+
+
+def search(prefix, limit=10):
+    """Cities whose normalized name or municipality starts with `prefix`."""
+    key = normalize(prefix)
+    names, index = registry()["names"], registry()["index"]
+    start = bisect.bisect_left(names, key)
+    results, seen = [], set()
+    for name in names[start:]:
+        if not name.startswith(key) or len(results) >= limit:
+            break
+        for city in index[name]:
+            if id(city) not in seen:
+                seen.add(id(city))
+                results.append(city)
+    return results[:limit]
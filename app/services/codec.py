@@ -0,0 +1,93 @@
+"""
+JSON encoding shared by the API and the scheduler: response bodies, cached
+bodies (compression.py) and snapshot files (schedule.py).
+
+With `orjson` installed, encoding and decoding run in orjson, which also
+serializes NumPy arrays and scalars and datetimes natively, so records no
+longer need a Python-level pass converting them first. Without it the stdlib
+`json` module is used with a `default` doing the same conversions. Both write
+compact UTF-8 (no ASCII escaping, no whitespace) and turn non-string keys
+into strings. They differ in a few details:
+- Some floats are spelled differently (1e-05 vs 0.00001); the values are the same.
+- orjson writes float32 values in their short form.
+- orjson writes NaN and infinities as null. The stdlib fallback rejects
+  them, like JSONResponse always did.
+
+Snapshot files are written compact, which is also what the API serves, so
+compression.compact_file() can send them as they are on disk.
+SNAPSHOT_JSON_INDENT=1 writes them indented (2 spaces) for reading by hand.
+"""
+import json
+from datetime import date, datetime
+
+import numpy as np
+from fastapi.responses import JSONResponse as StarletteJSONResponse
+
+from app.services.utils import env_bool
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+INDENT_FILES = env_bool("SNAPSHOT_JSON_INDENT")
+
+
+def _default(obj):
+    """Types neither encoder handles on its own; anything else is written as str(), like the scheduler always did."""
+    if isinstance(obj, (np.ndarray, np.datetime64)) and obj.dtype.kind == "M":
+        return np.datetime_as_string(obj).tolist()  # tolist() would give ints for ns precision
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    return str(obj)
+
+
+def dumps(obj, indent=False):
+    """Object -> UTF-8 JSON bytes (compact unless `indent`)."""
+    if orjson is not None:
+        option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(
+        obj,
+        default=_default,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=2 if indent else None,
+        separators=(",", ": ") if indent else (",", ":"),
+    ).encode("utf-8")
+
+
+def loads(data):
+    """JSON bytes or str -> object."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def dump(obj, path, indent=None):
+    """Write `obj` to `path`, compact or indented per SNAPSHOT_JSON_INDENT. Returns bytes written."""
+    data = dumps(obj, INDENT_FILES if indent is None else indent)
+    with open(path, "wb") as f:
+        f.write(data)
+    return len(data)
+
+
+class JSONResponse(StarletteJSONResponse):
+    """
+    Drop-in JSONResponse rendering through dumps(). Routes pass plain data
+    (NumPy values included), so nothing needs converting beforehand.
+    """
+
+    def render(self, content):
+        return dumps(content)
@@ -0,0 +1,200 @@
+"""
+Content-Encoding negotiation for JSON responses whose content does not change
+once written: published snapshot files and derived views of them, and the
+rainmap grid of one shared-cache generation.
+
+Each body is compressed once per (content key, encoding) and kept in a
+byte-bounded LRU. Snapshot files can also carry precompressed siblings
+(<file>.gz, .br, .zst) written by the scheduler at publish time; files from
+older snapshots get theirs written on first request (kept in memory only if
+the directory is read-only).
+
+gzip is always available; brotli and zstd are used when their packages
+(`brotli`, `zstandard`) are installed.
+"""
+import gzip
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from fastapi.responses import Response
+
+from app.services import codec, metrics
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies smaller than this go out as is: the headers would eat most of the saving
+MIN_SIZE = 1024
+CACHE_MAX_BYTES = int(os.environ.get("COMPRESSION_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# Compressed once and served many times, so use the slow, dense levels
+ENCODERS = {"gzip": lambda data: gzip.compress(data, compresslevel=9, mtime=0)}
+if zstandard is not None:
+    ENCODERS["zstd"] = lambda data: zstandard.ZstdCompressor(level=19).compress(data)
+if brotli is not None:
+    ENCODERS["br"] = lambda data: brotli.compress(data, quality=11)
+PREFERENCE = [e for e in ("br", "zstd", "gzip") if e in ENCODERS]
+SUFFIXES = {"gzip": ".gz", "br": ".br", "zstd": ".zst"}
+
+
+def negotiate(accept_encoding):
+    """Best available encoding the client accepts (RFC 9110 q-values), or None for identity."""
+    accepted = {}
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    best, best_q = None, 0.0
+    for encoding in PREFERENCE:
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def json_bytes(content):
+    """Serialize like codec.JSONResponse does, so cached bodies match the uncached ones."""
+    return codec.dumps(content)
+
+
+# --- Byte-bounded LRU: (key, encoding) -> (body, encoding actually used) ---
+_CACHE = OrderedDict()
+_CACHE_BYTES = [0]
+_CACHE_LOCK = threading.Lock()
+
+
+def _cached(key, build):
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+    value = build()
+    with _CACHE_LOCK:
+        if key not in _CACHE:
+            _CACHE[key] = value
+            _CACHE_BYTES[0] += len(value[0])
+            while _CACHE_BYTES[0] > CACHE_MAX_BYTES and len(_CACHE) > 1:
+                _, (evicted, _) = _CACHE.popitem(last=False)
+                _CACHE_BYTES[0] -= len(evicted)
+    return value
+
+
+def _encode(body, encoding):
+    if encoding is None or len(body) < MIN_SIZE:
+        return body, None
+    with metrics.timed(
+        "response_compression_seconds", {"encoding": encoding}, help="Time spent compressing response bodies"
+    ):
+        return ENCODERS[encoding](body), encoding
+
+
+def _response(body, encoding, media_type):
+    metrics.inc(
+        "response_encoding_total",
+        {"encoding": encoding or "identity"},
+        help="Cacheable JSON responses by Content-Encoding",
+    )
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def cached_response(request, key, render, media_type="application/json"):
+    """
+    Response for immutable content identified by `key` (include whatever
+    version identifies it, e.g. the snapshot name). render() -> bytes runs
+    once per key; each negotiated encoding is compressed once.
+    """
+    encoding = negotiate(request.headers.get("accept-encoding"))
+
+    def plain():
+        return _cached((key, None), lambda: (render(), None))[0]
+
+    body, used = _cached((key, encoding), lambda: _encode(plain(), encoding))
+    return _response(body, used, media_type)
+
+
+# --- Snapshot files ---
+def _write_atomic(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def compact_file(path):
+    """
+    JSON file in the form json_bytes() gives. Files without line breaks are
+    already compact (codec.dump) and go out as they are. Indented ones
+    (snapshots written before codec.py, or with SNAPSHOT_JSON_INDENT) are re-serialized.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    if b"\n" not in data:
+        return data
+    return json_bytes(codec.loads(data))
+
+
+def precompress_file(path, encodings=None):
+    """
+    Write <path>.gz/.br/.zst next to the JSON file `path`, compressing its
+    compact form (the same bytes identity clients get). Returns {encoding: bytes written}.
+    """
+    data = compact_file(path)
+    if len(data) < MIN_SIZE:
+        return {}
+    sizes = {}
+    for encoding in encodings or PREFERENCE:
+        body = ENCODERS[encoding](data)
+        _write_atomic(f"{path}{SUFFIXES[encoding]}", body)
+        sizes[encoding] = len(body)
+    return sizes
+
+
+def _file_body(path, encoding):
+    if encoding is not None:
+        try:
+            with open(f"{path}{SUFFIXES[encoding]}", "rb") as f:
+                return f.read(), encoding
+        except FileNotFoundError:
+            pass
+    data = compact_file(path)
+    if encoding is None or len(data) < MIN_SIZE:
+        return data, None
+    sibling = f"{path}{SUFFIXES[encoding]}"
+    body, used = _encode(data, encoding)
+    try:
+        _write_atomic(sibling, body)
+    except OSError:
+        pass  # read-only snapshot: the LRU copy is all we keep
+    return body, used
+
+
+def file_response(request, path, media_type="application/json"):
+    """Serve a published (immutable) snapshot JSON file in compact form, negotiating its encoding."""
+    encoding = negotiate(request.headers.get("accept-encoding"))
+    path = str(path)
+    body, used = _cached(("file", path, os.stat(path).st_mtime_ns, encoding), lambda: _file_body(path, encoding))
+    return _response(body, used, media_type)
@@ -0,0 +1,197 @@
+"""
+Isohyets: the interpolated rainmap grid as GeoJSON polygons, one
+MultiPolygon per precipitation threshold covering every area at or above it.
+
+Polygons are traced with marching squares on the grid, upsampled
+UPSAMPLE times bilinearly first. This smooths the outlines the same way for
+every threshold because all of them are isolines of one continuous field.
+The traced outlines of different thresholds therefore never cross, and holes
+stay inside their polygons.
+
+Each ring is then simplified on its own with Douglas-Peucker (see
+geometry.py), which moves it by up to the tolerance. That keeps the guarantee
+only where neighbouring isolines are more than twice the tolerance apart: on
+steep gradients simplified outlines can touch or cross. The tolerance is
+therefore capped at MAX_TOLERANCE_CELLS of a grid cell, and tolerance=0
+skips simplification and keeps the guarantee exactly.
+
+The grid is padded with "no rain" so every isoline closes; polygons that reach
+the edge of the grid follow it. Exterior rings are counterclockwise and holes
+clockwise (RFC 7946). Thresholds are nested, so draw them in ascending order.
+"""
+import time
+
+import numpy as np
+
+from app.services import metrics
+from app.services.geometry import simplify_ring
+
+UPSAMPLE = 4
+# Default simplification tolerance, as a fraction of the original grid cell
+TOLERANCE_CELLS = 0.25
+# Upper bound for any requested tolerance, same unit
+MAX_TOLERANCE_CELLS = 0.5
+DECIMALS = 4
+# Pad and NaN value: far enough below any threshold that crossings land on the grid cell itself
+BELOW = -1e30
+
+# Marching squares: corner bits are 1 = (i, j), 2 = (i, j+1), 4 = (i+1, j+1), 8 = (i+1, j).
+# Segments between cell edges 0 = bottom, 1 = right, 2 = top, 3 = left, oriented
+# so the area at or above the threshold is on their left (exteriors come out counterclockwise).
+# Saddles (5, 10) take the first pair when the cell center is below the threshold.
+SEGMENTS = {
+    1: [(0, 3)], 2: [(1, 0)], 3: [(1, 3)], 4: [(2, 1)], 6: [(2, 0)], 7: [(2, 3)],
+    8: [(3, 2)], 9: [(0, 2)], 11: [(1, 2)], 12: [(3, 1)], 13: [(0, 1)], 14: [(3, 0)],
+    5: [(0, 3), (2, 1)], 10: [(1, 0), (3, 2)],
+}
+SADDLE_JOINED = {5: [(0, 1), (2, 3)], 10: [(3, 0), (1, 2)]}
+
+
+def upsample(grid, factor):
+    """Bilinear resample of `grid` (lat, lon) to (n - 1) * factor + 1 points per axis."""
+    if factor <= 1:
+        return grid
+    rows = np.linspace(0, grid.shape[0] - 1, (grid.shape[0] - 1) * factor + 1)
+    cols = np.linspace(0, grid.shape[1] - 1, (grid.shape[1] - 1) * factor + 1)
+    along = np.stack([np.interp(cols, np.arange(grid.shape[1]), row) for row in grid])
+    return np.stack([np.interp(rows, np.arange(grid.shape[0]), col) for col in along.T], axis=1)
+
+
+def isolines(field, threshold):
+    """
+    Closed rings where `field` (rows = y, columns = x, no NaN) crosses
+    `threshold`, as (n x 2) arrays of (x, y) index coordinates with the first
+    point repeated at the end. The field must be below the threshold on its border.
+    """
+    rows, cols = field.shape
+    above = field >= threshold
+    case = (
+        above[:-1, :-1] * 1 + above[:-1, 1:] * 2 + above[1:, 1:] * 4 + above[1:, :-1] * 8
+    ).astype(np.intp)
+    center_above = (field[:-1, :-1] + field[:-1, 1:] + field[1:, 1:] + field[1:, :-1]) / 4 >= threshold
+
+    # Edge ids: horizontal edge (i, j)-(i, j+1) is i * (cols - 1) + j, vertical
+    # edge (i, j)-(i+1, j) is rows * (cols - 1) + i * cols + j
+    vertical = rows * (cols - 1)
+    starts, ends = [], []
+    for value, segments in SEGMENTS.items():
+        ci, cj = np.nonzero(case == value)
+        if not len(ci):
+            continue
+        if value in SADDLE_JOINED:
+            joined = center_above[ci, cj]
+            groups = [(ci[~joined], cj[~joined], segments), (ci[joined], cj[joined], SADDLE_JOINED[value])]
+        else:
+            groups = [(ci, cj, segments)]
+        for gi, gj, pairs in groups:
+            edges = (
+                gi * (cols - 1) + gj,  # bottom
+                vertical + gi * cols + gj + 1,  # right
+                (gi + 1) * (cols - 1) + gj,  # top
+                vertical + gi * cols + gj,  # left
+            )
+            for a, b in pairs:
+                starts.append(edges[a])
+                ends.append(edges[b])
+    if not starts:
+        return []
+    starts, ends = np.concatenate(starts), np.concatenate(ends)
+
+    # Crossing point on each edge, linearly interpolated between its two grid values
+    horizontal = starts < vertical
+    i = np.where(horizontal, starts // (cols - 1), (starts - vertical) // cols)
+    j = np.where(horizontal, starts % (cols - 1), (starts - vertical) % cols)
+    v0 = field[i, j]
+    v1 = np.where(horizontal, field[i, np.minimum(j + 1, cols - 1)], field[np.minimum(i + 1, rows - 1), j])
+    t = (threshold - v0) / (v1 - v0)
+    points = np.column_stack([j + np.where(horizontal, t, 0), i + np.where(horizontal, 0, t)])
+
+    # Every crossing has one segment leaving it: follow them until each ring closes
+    following = dict(zip(starts.tolist(), ends.tolist()))
+    index = dict(zip(starts.tolist(), range(len(starts))))
+    rings = []
+    for start in starts.tolist():
+        if start not in following:
+            continue
+        ring = [index[start]]
+        edge = following.pop(start)
+        while edge != start:
+            ring.append(index[edge])
+            edge = following.pop(edge)
+        ring.append(ring[0])
+        rings.append(points[ring])
+    return rings
+
+
+def signed_area(ring):
+    """Shoelace area of a closed ring, positive when counterclockwise."""
+    x, y = ring[:, 0], ring[:, 1]
+    return float(np.dot(x[:-1], y[1:]) - np.dot(x[1:], y[:-1])) / 2
+
+
+def contains(ring, point):
+    """Even-odd test of `point` (x, y) against a closed ring."""
+    x, y = ring[:-1, 0], ring[:-1, 1]
+    nx, ny = ring[1:, 0], ring[1:, 1]
+    crosses = (y > point[1]) != (ny > point[1])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        at = x + (point[1] - y) * (nx - x) / (ny - y)
+    return bool(np.count_nonzero(crosses & (point[0] < at)) % 2)
+
+
+def polygons(rings):
+    """Group rings into GeoJSON polygons: each hole goes to the smallest exterior containing it."""
+    exteriors = sorted((r for r in rings if signed_area(r) > 0), key=signed_area)
+    shapes = [[r] for r in exteriors]
+    for hole in (r for r in rings if signed_area(r) < 0):
+        for shape in shapes:
+            if contains(shape[0], hole[0]):
+                shape.append(hole)
+                break
+    return shapes
+
+
+def isohyets(grid, lats, lons, thresholds, tolerance=None, upsample_factor=UPSAMPLE):
+    """
+    GeoJSON FeatureCollection of the areas of `grid` (lat, lon; ascending
+    regular axes; NaN = no data) at or above each threshold (mm/h).
+    `tolerance` is the Douglas-Peucker tolerance in degrees (default
+    TOLERANCE_CELLS of a grid cell, at most MAX_TOLERANCE_CELLS; 0 disables it).
+    """
+    start = time.perf_counter()
+    cell = min(abs(lats[1] - lats[0]), abs(lons[1] - lons[0]))
+    tolerance = min(TOLERANCE_CELLS * cell if tolerance is None else tolerance, MAX_TOLERANCE_CELLS * cell)
+    field = upsample(np.nan_to_num(np.asarray(grid, dtype=np.float64), nan=BELOW), upsample_factor)
+    field = np.pad(field, 1, constant_values=BELOW)
+    # Index coordinates of the padded field -> degrees
+    rows = np.linspace(lats[0], lats[-1], field.shape[0] - 2)
+    cols = np.linspace(lons[0], lons[-1], field.shape[1] - 2)
+
+    features, vertices = [], 0
+    for threshold in thresholds:
+        rings = []
+        for ring in isolines(field, threshold):
+            coords = np.column_stack([
+                np.interp(ring[:, 0] - 1, np.arange(len(cols)), cols),
+                np.interp(ring[:, 1] - 1, np.arange(len(rows)), rows),
+            ])
+            coords = simplify_ring(coords, tolerance)
+            if len(coords) >= 4 and signed_area(coords) != 0:
+                rings.append(coords)
+        shapes = polygons(rings)
+        vertices += sum(len(r) for shape in shapes for r in shape)
+        features.append({
+            "type": "Feature",
+            "properties": {"threshold": threshold},
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [[np.round(r, DECIMALS).tolist() for r in shape] for shape in shapes],
+            },
+        })
+    metrics.observe(
+        "rainmap_contour_seconds",
+        time.perf_counter() - start,
+        {"thresholds": len(thresholds)},
+        help="Isohyet tracing time by number of thresholds",
+    )
+    return {"type": "FeatureCollection", "vertices": vertices, "features": features}
@@ -0,0 +1,152 @@
+"""
+Exposición de ciudades a las tormentas de un snapshot.
+
+Para cada tormenta se juntan los puntos de la trayectoria observada y los del
+pronóstico del NHC; las distancias de todos los puntos de todas las tormentas
+a todas las ciudades del registro (app/services/cities.py) se calculan con una
+sola llamada a haversine() con broadcasting, una matriz (puntos, ciudades).
+
+schedule.py escribe el resultado en <snapshot>/Exposicion/:
+- tormenta_<id>.json: ciudades a menos de EXPOSICION_RADIO_KM, ordenadas por distancia
+
+La distancia que decide si una ciudad entra (distancia_efectiva()) es la menor
+entre la de la trayectoria, la del pronóstico y la del borde del cono: una
+ciudad dentro del cono o cerca de su borde entra aunque los centros del
+pronóstico queden lejos.
+- ciudades.json: {ciudad|estado: amenazas ordenadas por distancia}
+"""
+import os
+
+import numpy as np
+
+from app.services import cities
+from app.services.storm_encoder import serie
+from app.services.utils import haversine
+
+EXPOSICION_RADIO_KM = float(os.environ.get("EXPOSICION_RADIO_KM", 500))
+CARPETA_EXPOSICION = "Exposicion"
+
+# Radio aproximado del cono de incertidumbre del NHC por cuenca y hora de pronóstico, en millas náuticas.
+# Las llaves son storm.basin de tropycal; el Pacífico central usa los radios del oriental.
+HORAS_CONO = [0, 12, 24, 36, 48, 60, 72, 96, 120]
+RADIOS_CONO_MN = {
+    "north_atlantic": [0, 26, 39, 53, 67, 84, 97, 127, 175],
+    "east_pacific": [0, 26, 39, 50, 62, 72, 83, 105, 134],
+    "central_pacific": [0, 26, 39, 50, 62, 72, 83, 105, 134],
+}
+CUENCA_POR_DEFECTO = "north_atlantic"
+MN_A_KM = 1.852
+
+
+def radios_cono_km(fhr, cuenca=None):
+    """Radio del cono en km a las horas de pronóstico `fhr` (cuenca desconocida: Atlántico)."""
+    radios = RADIOS_CONO_MN.get(cuenca, RADIOS_CONO_MN[CUENCA_POR_DEFECTO])
+    return np.interp(fhr, HORAS_CONO, radios) * MN_A_KM
+
+
+def clave_ciudad(ciudad):
+    """Llave estable de una ciudad del registro: 'guadalupe|nuevo leon'."""
+    return f"{cities.normalize(ciudad['name'])}|{cities.normalize(ciudad['state'])}"
+
+
+def puntos_tormenta(storm, pronostico=None):
+    """
+    Puntos de trayectoria + pronóstico de una tormenta como arreglos alineados.
+    `pronostico` es el dict de storm.get_forecast_realtime() (lat, lon, vmax, fhr).
+    """
+    pronostico = pronostico or {}
+    tray_lat = np.asarray(serie(storm, "lat"), dtype=float)
+    pron_lat = np.asarray(pronostico.get("lat", []), dtype=float)
+    n_tray, n_pron = len(tray_lat), len(pron_lat)
+
+    def columna(tray, pron, n_t, n_p):
+        tray = np.asarray(tray, dtype=float) if len(tray) == n_t else np.full(n_t, np.nan)
+        pron = np.asarray(pron, dtype=float) if len(pron) == n_p else np.full(n_p, np.nan)
+        return np.concatenate([tray, pron])
+
+    return {
+        "id": storm.id,
+        "name": storm.name,
+        "cuenca": getattr(storm, "basin", None),
+        "lat": np.concatenate([tray_lat, pron_lat]),
+        "lon": columna(serie(storm, "lon"), pronostico.get("lon", []), n_tray, n_pron),
+        "vmax": columna(serie(storm, "vmax"), pronostico.get("vmax", []), n_tray, n_pron),
+        "fhr": columna(np.full(n_tray, np.nan), pronostico.get("fhr", []), n_tray, n_pron),
+        "es_pronostico": np.concatenate([np.zeros(n_tray, bool), np.ones(n_pron, bool)]),
+    }
+
+
+def _km(valor):
+    return round(float(valor), 1) if np.isfinite(valor) else None
+
+
+def distancia_efectiva(registro):
+    """Menor de distance_km y cone_distance_km de un registro (la del cono puede ser None)."""
+    cono = registro.get("cone_distance_km")
+    return registro["distance_km"] if cono is None else min(registro["distance_km"], cono)
+
+
+def calcular_exposicion(tormentas, ciudades=None, radio_km=EXPOSICION_RADIO_KM):
+    """
+    tormentas: lista de puntos_tormenta().
+    Devuelve ({storm_id: registros ordenados por distancia}, {clave_ciudad: amenazas ordenadas}).
+    """
+    ciudades = cities.registry()["cities"] if ciudades is None else ciudades
+    tormentas = [t for t in tormentas if len(t["lat"])]
+    if not tormentas or not ciudades:
+        return {}, {}
+
+    c_lat = np.array([c["lat"] for c in ciudades])
+    c_lon = np.array([c["lon"] for c in ciudades])
+    lat = np.concatenate([t["lat"] for t in tormentas])
+    lon = np.concatenate([t["lon"] for t in tormentas])
+    es_pronostico = np.concatenate([t["es_pronostico"] for t in tormentas])
+    fhr = np.concatenate([t["fhr"] for t in tormentas])
+    vmax = np.concatenate([t["vmax"] for t in tormentas])
+
+    # (puntos, ciudades) en una sola operación; puntos sin posición quedan en inf
+    distancias = haversine(lat[:, None], lon[:, None], c_lat[None, :], c_lon[None, :])
+    distancias = np.where(np.isnan(distancias), np.inf, distancias)
+    radio_cono = np.concatenate([radios_cono_km(np.nan_to_num(t["fhr"]), t.get("cuenca")) for t in tormentas])
+    al_cono = np.maximum(distancias - radio_cono[:, None], 0)
+
+    limites = np.cumsum([0] + [len(t["lat"]) for t in tormentas])
+    por_tormenta, por_ciudad = {}, {}
+    for t, a, b in zip(tormentas, limites[:-1], limites[1:]):
+        d = distancias[a:b]
+        pron = es_pronostico[a:b, None]
+        d_trayectoria = np.where(~pron, d, np.inf).min(axis=0)
+        d_pronostico = np.where(pron, d, np.inf).min(axis=0)
+        d_cono = np.where(pron, al_cono[a:b], np.inf).min(axis=0)
+        minima = np.minimum(d_trayectoria, d_pronostico)
+        efectiva = np.minimum(minima, d_cono)
+        cercano = a + d.argmin(axis=0)
+
+        indices = np.flatnonzero(efectiva <= radio_km)
+        indices = indices[np.argsort(efectiva[indices], kind="stable")]
+        registros = []
+        for j in indices:
+            ciudad, k = ciudades[j], cercano[j]
+            registro = {
+                "city": ciudad["name"],
+                "municipality": ciudad.get("municipality", ciudad["name"]),
+                "state": ciudad["state"],
+                "lat": ciudad["lat"],
+                "lon": ciudad["lon"],
+                "distance_km": _km(minima[j]),
+                "track_distance_km": _km(d_trayectoria[j]),
+                "forecast_distance_km": _km(d_pronostico[j]),
+                "cone_distance_km": _km(d_cono[j]),
+                "closest_point": "forecast" if es_pronostico[k] else "track",
+                "forecast_hour": int(fhr[k]) if es_pronostico[k] and np.isfinite(fhr[k]) else None,
+                "vmax": float(vmax[k]) if np.isfinite(vmax[k]) else None,
+            }
+            registros.append(registro)
+            por_ciudad.setdefault(clave_ciudad(ciudad), []).append(
+                {"storm_id": t["id"], "name": t["name"], **registro}
+            )
+        por_tormenta[t["id"]] = registros
+
+    for amenazas in por_ciudad.values():
+        amenazas.sort(key=distancia_efectiva)
+    return por_tormenta, por_ciudad
@@ -0,0 +1,135 @@
+"""
+Trayectoria, pronóstico y cono de una tormenta como GeoJSON, alternativa
+vectorial a los PNG de Mapas/.
+
+schedule.py escribe <snapshot>/GeoJSON/tormenta_<id>.json a partir de los
+mismos puntos que la tabla de exposición (exposicion.puntos_tormenta()).
+La trayectoria y el cono se guardan simplificados con Douglas-Peucker a varias
+tolerancias (NIVELES) y con coordenadas cuantizadas (enteros delta en
+1/ESCALA grados, ver geometry.quantize). La API elige el nivel según el zoom
+del mapa y arma el FeatureCollection (ver a_geojson()).
+"""
+import math
+
+import numpy as np
+
+from app.services.exposicion import radios_cono_km
+from app.services.geometry import buffer_outline, dequantize, douglas_peucker, quantize, simplify_ring
+
+CARPETA_GEOJSON = "GeoJSON"
+VERSION_GEOJSON = 1
+ESCALA = 10000  # 1e-4° (~11 m)
+
+# (zoom máximo, tolerancia en grados): alrededor de medio píxel de un tile de 256 px a ese zoom
+NIVELES = [(4, 0.1), (6, 0.025), (8, 0.006), (22, 0.0)]
+
+
+def _decimales(tolerancia):
+    """Decimales que vale la pena enviar para una tolerancia: 0.1° -> 2, 0.006° -> 4."""
+    if tolerancia <= 0:
+        return 4
+    return min(4, max(2, math.ceil(-math.log10(tolerancia)) + 1))
+
+
+def codificar_geojson(puntos):
+    """
+    puntos: un elemento de puntos_tormenta(). Devuelve el registro por niveles
+    que se guarda en GeoJSON/tormenta_<id>.json (None si no hay posiciones).
+    """
+    validos = np.isfinite(puntos["lat"]) & np.isfinite(puntos["lon"])
+    coords = np.column_stack([puntos["lon"], puntos["lat"]])
+    pron = puntos["es_pronostico"]
+    trayectoria = coords[validos & ~pron]
+    pronostico = coords[validos & pron]
+    if not len(trayectoria) and not len(pronostico):
+        return None
+
+    # El cono arranca en la última posición observada (hora 0) y sigue los puntos del pronóstico
+    cono = None
+    if len(pronostico):
+        inicio = trayectoria[-1:]
+        centro = np.concatenate([inicio, pronostico])
+        horas = np.concatenate([np.zeros(len(inicio)), np.nan_to_num(puntos["fhr"][validos & pron])])
+        radios = radios_cono_km(horas, puntos.get("cuenca"))
+        cono = buffer_outline(centro[:, 0], centro[:, 1], radios)
+
+    niveles = []
+    for zoom_max, tolerancia in NIVELES:
+        niveles.append({
+            "zoom_max": zoom_max,
+            "tolerancia": tolerancia,
+            "trayectoria": quantize(douglas_peucker(trayectoria, tolerancia), ESCALA),
+            "cono": quantize(simplify_ring(cono, tolerancia), ESCALA) if cono is not None else None,
+        })
+
+    vmax = puntos["vmax"][validos & pron]
+    return {
+        "v": VERSION_GEOJSON,
+        "storm_id": puntos["id"],
+        "name": puntos["name"],
+        "escala": ESCALA,
+        "niveles": niveles,
+        "pronostico": {
+            "coords": quantize(pronostico, ESCALA),
+            "fhr": [int(h) if np.isfinite(h) else None for h in puntos["fhr"][validos & pron]],
+            "vmax": [float(v) if np.isfinite(v) else None for v in vmax],
+        },
+    }
+
+
+def nivel_para_zoom(registro, zoom):
+    """El nivel más simplificado que sigue siendo fino para `zoom`."""
+    for nivel in registro["niveles"]:
+        if zoom <= nivel["zoom_max"]:
+            return nivel
+    return registro["niveles"][-1]
+
+
+def a_geojson(registro, zoom):
+    """Registro guardado -> FeatureCollection GeoJSON (RFC 7946) para el zoom pedido."""
+    nivel = nivel_para_zoom(registro, zoom)
+    escala, decimales = registro["escala"], _decimales(nivel["tolerancia"])
+    propiedades = {"storm_id": registro["storm_id"], "name": registro["name"]}
+
+    def coordenadas(deltas):
+        return np.round(dequantize(deltas, escala), decimales).tolist()
+
+    features = []
+    trayectoria = coordenadas(nivel["trayectoria"])
+    if len(trayectoria) >= 2:
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "LineString", "coordinates": trayectoria},
+            "properties": {**propiedades, "kind": "track"},
+        })
+
+    pronostico = registro["pronostico"]
+    puntos = coordenadas(pronostico["coords"])
+    if puntos:
+        # La línea del pronóstico sale de la última posición observada
+        linea = trayectoria[-1:] + puntos
+        if len(linea) >= 2:
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "LineString", "coordinates": linea},
+                "properties": {**propiedades, "kind": "forecast_track"},
+            })
+        for coordenada, fhr, vmax in zip(puntos, pronostico["fhr"], pronostico["vmax"]):
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": coordenada},
+                "properties": {**propiedades, "kind": "forecast_point", "forecast_hour": fhr, "vmax": vmax},
+            })
+
+    if nivel["cono"]:
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [coordenadas(nivel["cono"])]},
+            "properties": {**propiedades, "kind": "cone"},
+        })
+
+    return {
+        "type": "FeatureCollection",
+        "features": features,
+        "properties": {**propiedades, "zoom": zoom, "tolerance_deg": nivel["tolerancia"]},
+    }
@@ -0,0 +1,110 @@
+"""
+Planar geometry helpers for vector map output: Douglas-Peucker
+simplification, delta-encoded coordinate quantization and buffered-line
+outlines (forecast cones).
+
+Coordinates are (lon, lat) degrees, as in GeoJSON. Tolerances are in degrees
+too: at the zoom levels maps are viewed at, the distortion of treating
+degrees as planar is well below a pixel.
+"""
+import numpy as np
+
+KM_PER_DEG_LAT = 110.57
+KM_PER_DEG_LON = 111.32  # at the equator, scaled by cos(lat)
+
+
+def segment_distances(points, start, end):
+    """Distance from each of `points` (n x 2) to the segment start-end."""
+    segment = end - start
+    length2 = float(segment @ segment)
+    if length2 == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ segment / length2, 0, 1)
+    return np.hypot(*(points - (start + t[:, None] * segment)).T)
+
+
+def douglas_peucker(coords, tolerance):
+    """Simplify an open line (n x 2), keeping its endpoints. Iterative, so long lines don't recurse."""
+    coords = np.asarray(coords, dtype=np.float64)
+    if len(coords) < 3 or tolerance <= 0:
+        return coords
+    keep = np.zeros(len(coords), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(coords) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        distances = segment_distances(coords[a + 1:b], coords[a], coords[b])
+        i = int(distances.argmax())
+        if distances[i] > tolerance:
+            k = a + 1 + i
+            keep[k] = True
+            stack.extend([(a, k), (k, b)])
+    return coords[keep]
+
+
+def simplify_ring(ring, tolerance):
+    """
+    Simplify a closed ring (first point == last). It is split at the point
+    farthest from the start so both halves have distinct endpoints; rings that
+    would collapse below 4 points are returned unchanged.
+    """
+    ring = np.asarray(ring, dtype=np.float64)
+    if len(ring) < 5 or tolerance <= 0:
+        return ring
+    k = int(np.hypot(*(ring - ring[0]).T).argmax())
+    simplified = np.concatenate(
+        [douglas_peucker(ring[:k + 1], tolerance), douglas_peucker(ring[k:], tolerance)[1:]]
+    )
+    return simplified if len(simplified) >= 4 else ring
+
+
+def quantize(coords, scale):
+    """(n x 2) degrees -> flat list of int deltas in 1/scale degree units (first pair absolute)."""
+    q = np.round(np.asarray(coords, dtype=np.float64).reshape(-1, 2) * scale).astype(np.int64)
+    if len(q):
+        q[1:] = np.diff(q, axis=0)
+    return q.ravel().tolist()
+
+
+def dequantize(deltas, scale):
+    """Inverse of quantize(): (n x 2) float array."""
+    return np.cumsum(np.asarray(deltas, dtype=np.int64).reshape(-1, 2), axis=0) / scale
+
+
+def buffer_outline(lons, lats, radii_km, segments=16):
+    """
+    Closed ring around a line whose half-width varies per vertex (radii in km):
+    offset both sides along the normals and close the ends with semicircles.
+    Computed in a local equirectangular projection around the mean latitude.
+    """
+    lons, lats, radii = (np.asarray(a, dtype=np.float64) for a in (lons, lats, radii_km))
+    kx = KM_PER_DEG_LON * np.cos(np.radians(lats.mean()))
+    points = np.column_stack([lons * kx, lats * KM_PER_DEG_LAT])
+
+    if len(points) == 1:
+        angles = np.linspace(0, 2 * np.pi, 4 * segments + 1)
+        ring = points[0] + radii[0] * np.column_stack([np.cos(angles), np.sin(angles)])
+    else:
+        tangents = np.gradient(points, axis=0)
+        tangents /= np.maximum(np.hypot(*tangents.T), 1e-12)[:, None]
+        normals = np.column_stack([-tangents[:, 1], tangents[:, 0]])
+        left = points + radii[:, None] * normals
+        right = points - radii[:, None] * normals
+
+        def cap(center, radius, normal, sweep):
+            # From +normal around to -normal: ahead of the line at the end, behind it at the start
+            start = np.arctan2(normal[1], normal[0])
+            angles = start + sweep * np.linspace(0, np.pi, segments + 1)[1:-1]
+            return center + radius * np.column_stack([np.cos(angles), np.sin(angles)])
+
+        # Traced clockwise; reversed so the exterior ring is counterclockwise (RFC 7946)
+        ring = np.concatenate([
+            left,
+            cap(points[-1], radii[-1], normals[-1], -1),
+            right[::-1],
+            cap(points[0], radii[0], -normals[0], -1),
+            left[:1],
+        ])[::-1]
+    return np.column_stack([ring[:, 0] / kx, ring[:, 1] / KM_PER_DEG_LAT])
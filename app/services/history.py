@@ -0,0 +1,136 @@
+"""
+Append-only, day-partitioned store of rainmap refreshes (station values and
+interpolated grids), so past precipitation can be queried without going
+back upstream.
+
+Each series (e.g. "rainmap_15_50", "stations_15") is a directory under
+HISTORY_DIR with three files per UTC day:
+
+    YYYYMMDD.f32         records, one per refresh: N float32 values (NaN = no data)
+    YYYYMMDD.times       float64 epoch seconds, one per record
+    YYYYMMDD.coords.npy  (N x 2) lat, lon of each value, written with the first record
+
+The value record is appended before its timestamp, so a reader that counts
+min(timestamps, complete records) never sees a partial refresh. A point query
+memory-maps each day as a (records x N) array and reads one column: only the
+pages holding that cell are touched, never the whole day.
+
+One worker refreshes each grid (see shared_cache.get_or_build), so each series
+has a single writer; appends still take an flock in case two processes race.
+Days older than HISTORY_RETENTION_DAYS are deleted on append.
+"""
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from app.services import metrics
+from app.services.utils import haversine
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, nothing to serialize
+    fcntl = None
+
+# Runtime state, outside the source tree (XDG state dir unless RAINMAP_HISTORY_DIR is set)
+_STATE_HOME = Path(os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state")
+HISTORY_DIR = Path(os.environ.get("RAINMAP_HISTORY_DIR", _STATE_HOME / "weatherstorm" / "history"))
+RETENTION_DAYS = int(os.environ.get("HISTORY_RETENTION_DAYS", 30))
+
+DTYPE = np.dtype("<f4")
+TIME_DTYPE = np.dtype("<f8")
+
+
+def _day(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y%m%d")
+
+
+def _paths(series, day):
+    base = HISTORY_DIR / series / day
+    return base.with_suffix(".f32"), base.with_suffix(".times"), base.with_suffix(".coords.npy")
+
+
+def append(series, lats, lons, values, ts=None):
+    """Append one refresh (N values at N lat/lon points) to `series`."""
+    ts = time.time() if ts is None else ts
+    values = np.asarray(values, dtype=DTYPE).ravel()
+    data_path, times_path, coords_path = _paths(series, _day(ts))
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+
+    fd = os.open(times_path, os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        if coords_path.exists():
+            coords = np.load(coords_path, mmap_mode="r")
+            if len(coords) != len(values):
+                raise ValueError(f"{series}: {len(values)} values, day started with {len(coords)}")
+        else:
+            np.save(coords_path, np.column_stack([lats, lons]).astype(np.float64))
+        # Trim a record left half-written by a crash, then record, then its timestamp
+        records = os.fstat(fd).st_size // TIME_DTYPE.itemsize
+        with open(data_path, "ab") as f:
+            if f.tell() > records * len(values) * DTYPE.itemsize:
+                f.truncate(records * len(values) * DTYPE.itemsize)
+            f.write(values.tobytes())
+        os.write(fd, np.array([ts], dtype=TIME_DTYPE).tobytes())
+    finally:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+    metrics.inc("history_records_total", {"series": series}, help="Refreshes appended to the history store")
+    prune(series)
+
+
+def prune(series, now=None):
+    """Delete the days of `series` older than RETENTION_DAYS."""
+    cutoff = _day((now or time.time()) - RETENTION_DAYS * 86400)
+    directory = HISTORY_DIR / series
+    for path in directory.glob("*.times"):
+        day = path.name.split(".")[0]
+        if day < cutoff:
+            for old in _paths(series, day):
+                old.unlink(missing_ok=True)
+
+
+def _open_day(series, day):
+    """(times, records x N memmap, coords) for one day, or None if it has no complete record."""
+    data_path, times_path, coords_path = _paths(series, day)
+    try:
+        times = np.fromfile(times_path, dtype=TIME_DTYPE)
+        coords = np.load(coords_path, mmap_mode="r")
+        size = data_path.stat().st_size
+    except FileNotFoundError:
+        return None
+    count = min(len(times), size // (len(coords) * DTYPE.itemsize))
+    if count == 0:
+        return None
+    data = np.memmap(data_path, dtype=DTYPE, mode="r", shape=(count, len(coords)))
+    return times[:count], data, coords
+
+
+def query(series, lat, lon, start, end):
+    """
+    Series of the value nearest to (lat, lon) between epoch `start` and `end`.
+    Returns (cell lat, cell lon, times, values) or None if nothing was recorded.
+    """
+    cell, times, values = None, [], []
+    day, last = start - start % 86400, _day(end)
+    while _day(day) <= last:
+        opened = _open_day(series, _day(day))
+        day += 86400
+        if opened is None:
+            continue
+        day_times, data, coords = opened
+        index = int(haversine(lat, lon, coords[:, 0], coords[:, 1]).argmin())
+        rows = np.flatnonzero((day_times >= start) & (day_times <= end))
+        if len(rows):
+            cell = (float(coords[index, 0]), float(coords[index, 1]))
+            times.append(day_times[rows])
+            values.append(np.asarray(data[rows[0]:rows[-1] + 1, index])[rows - rows[0]])
+    if cell is None:
+        return None
+    return cell[0], cell[1], np.concatenate(times), np.concatenate(values)
+
@@ -0,0 +1,181 @@
+"""
+Minimal in-process metrics registry rendered in Prometheus text format.
+
+Recording a sample is a dict update under a lock, so instrumentation on hot
+paths costs well under a microsecond. All formatting happens in `render()`,
+i.e. only when /metrics is scraped. Collectors registered with
+`register_collector()` also run only at scrape time (e.g. to read the
+scheduler state file).
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+_LOCK = threading.Lock()
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+COUNTERS = {}  # name -> {labels: value}
+GAUGES = {}  # name -> {labels: value}
+HISTOGRAMS = {}  # name -> {"buckets": tuple, "series": {labels: [bucket counts..., sum, count]}}
+HELP = {}
+COLLECTORS = []
+
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def inc(name, labels=None, value=1, help=None):
+    """Increment a counter."""
+    key = _labels_key(labels)
+    with _LOCK:
+        series = COUNTERS.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+        if help:
+            HELP.setdefault(name, help)
+
+
+def set_gauge(name, value, labels=None, help=None):
+    """Set a gauge to an absolute value."""
+    key = _labels_key(labels)
+    with _LOCK:
+        GAUGES.setdefault(name, {})[key] = value
+        if help:
+            HELP.setdefault(name, help)
+
+
+def observe(name, value, labels=None, buckets=DEFAULT_BUCKETS, help=None):
+    """Record a sample in a histogram."""
+    key = _labels_key(labels)
+    index = bisect.bisect_left(buckets, value)
+    with _LOCK:
+        hist = HISTOGRAMS.setdefault(name, {"buckets": buckets, "series": {}})
+        counts = hist["series"].get(key)
+        if counts is None:
+            counts = hist["series"][key] = [0] * (len(hist["buckets"]) + 1) + [0.0, 0]
+        counts[index] += 1
+        counts[-2] += value
+        counts[-1] += 1
+        if help:
+            HELP.setdefault(name, help)
+
+
+@contextmanager
+def timed(name, labels=None, buckets=DEFAULT_BUCKETS, help=None):
+    """Context manager that observes the elapsed wall time in seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start, labels, buckets, help)
+
+
+def register_collector(fn):
+    """Register a callable run at scrape time, before rendering (may call set_gauge)."""
+    COLLECTORS.append(fn)
+    return fn
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """Render every metric in Prometheus text exposition format (version 0.0.4)."""
+    for collector in COLLECTORS:
+        try:
+            collector()
+        except Exception:
+            pass
+
+    lines = []
+    with _LOCK:
+        for kind, registry in (("counter", COUNTERS), ("gauge", GAUGES)):
+            for name in sorted(registry):
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+                for key, value in registry[name].items():
+                    lines.append(f"{name}{_format_labels(key)} {_format_value(value)}")
+
+        for name in sorted(HISTOGRAMS):
+            hist = HISTOGRAMS[name]
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, counts in hist["series"].items():
+                cumulative = 0
+                for bound, count in zip(list(hist["buckets"]) + [float("inf")], counts):
+                    cumulative += count
+                    le = _format_value(float(bound))
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(key)} {_format_value(counts[-2])}")
+                lines.append(f"{name}_count{_format_labels(key)} {counts[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+def _route_template(scope):
+    """Matched route template, including the router prefix."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    path = getattr(route, "path", "unmatched")
+    # Newer FastAPI versions keep included routers un-flattened and record the prefix here
+    included = scope.get("fastapi", {}).get("included_router")
+    prefix = getattr(getattr(included, "include_context", None), "prefix", "")
+    if prefix and not path.startswith(prefix):
+        path = prefix + path
+    return path
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording per-route latency.
+    Uses the route template (/api/storms/{storm_id}) as label, not the raw path,
+    to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            observe(
+                "http_request_duration_seconds",
+                time.perf_counter() - start,
+                {
+                    "route": _route_template(scope),
+                    "method": scope.get("method", ""),
+                    "status": status["code"],
+                },
+                help="HTTP request latency by route template",
+            )
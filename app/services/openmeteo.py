@@ -0,0 +1,272 @@
+"""
+Open-Meteo client shared by the rainmap routes: one lazily created session,
+per-call metrics and a circuit breaker.
+
+The breaker tracks the outcome of the last BREAKER_WINDOW calls. Once at
+least BREAKER_MIN_CALLS have been seen and the failure rate reaches
+BREAKER_FAILURE_RATE it opens: calls fail immediately with CircuitOpenError
+for BREAKER_COOLDOWN seconds. Then a single trial call is let through
+(half-open); success closes the breaker, failure opens it again.
+
+Every call also takes its share of the request budget and a concurrency
+slot from app/services/ratelimit.py, so the grid, city and batch paths are
+paced together.
+
+Callers fall back to the last good value per location (remember() /
+last_good()), flagged as stale, instead of inventing a 0.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.services import metrics, ratelimit
+
+logger = logging.getLogger(__name__)
+
+# Upstream endpoint (overridable to point at a local stub, see benchmarks/stub_openmeteo.py)
+OPEN_METEO_URL = os.environ.get("OPEN_METEO_URL", "https://api.open-meteo.com/v1/forecast")
+# (connect, read) seconds. The breaker handles sustained failures, so retries stay short
+UPSTREAM_TIMEOUT = (3.05, float(os.environ.get("UPSTREAM_READ_TIMEOUT", 6)))
+
+BREAKER_WINDOW = int(os.environ.get("UPSTREAM_BREAKER_WINDOW", 20))
+BREAKER_MIN_CALLS = int(os.environ.get("UPSTREAM_BREAKER_MIN_CALLS", 10))
+BREAKER_FAILURE_RATE = float(os.environ.get("UPSTREAM_BREAKER_FAILURE_RATE", 0.5))
+BREAKER_COOLDOWN = float(os.environ.get("UPSTREAM_BREAKER_COOLDOWN", 30))
+
+# Last good value per location, served (flagged stale) when upstream fails
+LAST_GOOD_MAX_AGE = int(os.environ.get("UPSTREAM_LAST_GOOD_MAX_AGE", 6 * 3600))
+# Locations include client-supplied coordinates (/rainmap/at): bound how many are kept
+LAST_GOOD_MAX_ENTRIES = int(os.environ.get("UPSTREAM_LAST_GOOD_MAX_ENTRIES", 10000))
+
+
+class UpstreamSkipped(Exception):
+    """Upstream was not called: circuit breaker open or request budget spent."""
+
+
+class CircuitOpenError(UpstreamSkipped):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+
+# --- Session ---
+def create_session():
+    # Configure retry strategy
+    retry_strategy = Retry(
+        total=2,  # Total retries (the circuit breaker takes over on sustained failures)
+        backoff_factor=0.5,  # Wait 0.5, 1 seconds between retries
+        # Retry on these status codes. Not 429: retrying a throttled call here would skip
+        # ratelimit.acquire(); it fails instead and the rate limiter backs off (see _call)
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET"]
+    )
+
+    # Create session
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=10)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    # Set headers
+    session.headers.update({
+        'User-Agent': 'WeatherApp/1.0',
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate'
+    })
+
+    return session
+
+
+# Global session, created on first upstream call (not at import: keeps startup cheap)
+session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    global session
+    if session is None:
+        with _session_lock:
+            if session is None:
+                session = create_session()
+    return session
+
+
+# --- Instrumentation ---
+def record_upstream(start, status):
+    """Record latency and outcome (HTTP status, timeout, connection_error) of one upstream call."""
+    metrics.observe(
+        "upstream_fetch_seconds",
+        time.perf_counter() - start,
+        help="Open-Meteo request latency",
+    )
+    metrics.inc(
+        "upstream_requests_total",
+        {"status": status},
+        help="Open-Meteo requests by HTTP status or failure kind",
+    )
+
+
+# --- Circuit breaker ---
+BREAKER = {
+    "state": "closed",  # closed | open | half_open
+    "outcomes": collections.deque(maxlen=BREAKER_WINDOW),  # True = success
+    "opened_at": None,
+    "trial_in_flight": False,
+}
+_breaker_lock = threading.Lock()
+# Callers that arrive while the half-open trial is in flight wait for its outcome
+# instead of failing instantly (they would drain a whole grid in microseconds)
+_trial_done = threading.Condition(_breaker_lock)
+
+
+def _set_state(state):
+    BREAKER["state"] = state
+    metrics.set_gauge(
+        "upstream_circuit_open",
+        1 if state == "open" else 0,
+        help="1 while the Open-Meteo circuit breaker is open",
+    )
+
+
+def breaker_allow():
+    """True if a call may go upstream now."""
+    with _breaker_lock:
+        if BREAKER["state"] == "closed":
+            return True
+        if BREAKER["state"] == "open":
+            if time.monotonic() - BREAKER["opened_at"] < BREAKER_COOLDOWN:
+                return False
+            _set_state("half_open")
+        # half-open: exactly one trial call at a time
+        if BREAKER["trial_in_flight"]:
+            _trial_done.wait_for(lambda: not BREAKER["trial_in_flight"], timeout=sum(UPSTREAM_TIMEOUT))
+            return BREAKER["state"] == "closed"
+        BREAKER["trial_in_flight"] = True
+        return True
+
+
+def breaker_record(ok):
+    with _breaker_lock:
+        if BREAKER["state"] == "half_open":
+            BREAKER["trial_in_flight"] = False
+            _trial_done.notify_all()
+            if ok:
+                BREAKER["outcomes"].clear()
+                _set_state("closed")
+                logger.info("Open-Meteo circuit closed")
+            else:
+                BREAKER["opened_at"] = time.monotonic()
+                _set_state("open")
+            return
+
+        outcomes = BREAKER["outcomes"]
+        outcomes.append(ok)
+        failures = outcomes.count(False)
+        if (
+            BREAKER["state"] == "closed"
+            and len(outcomes) >= BREAKER_MIN_CALLS
+            and failures / len(outcomes) >= BREAKER_FAILURE_RATE
+        ):
+            BREAKER["opened_at"] = time.monotonic()
+            _set_state("open")
+            logger.warning(
+                f"Open-Meteo circuit opened: {failures}/{len(outcomes)} recent calls failed"
+            )
+
+
+def breaker_release():
+    """Give back a half-open trial that never reached upstream."""
+    with _breaker_lock:
+        if BREAKER["state"] == "half_open" and BREAKER["trial_in_flight"]:
+            BREAKER["trial_in_flight"] = False
+            _trial_done.notify_all()
+
+
+def upstream_get(params, cost=1):
+    """
+    GET OPEN_METEO_URL through the breaker and the rate limiter and return the
+    decoded JSON. `cost` is the number of locations in the request.
+    Raises UpstreamSkipped without calling upstream while the breaker is open
+    or the budget is spent, and the requests exception (after recording it)
+    when the call fails.
+    """
+    if not breaker_allow():
+        metrics.inc(
+            "upstream_circuit_rejections_total",
+            help="Upstream calls skipped because the circuit breaker was open",
+        )
+        raise CircuitOpenError("Open-Meteo circuit breaker is open")
+    try:
+        waited = ratelimit.acquire(cost)
+    except ratelimit.BudgetExhaustedError as e:
+        breaker_release()
+        raise UpstreamSkipped(str(e)) from e
+
+    with ratelimit.slot():
+        return _call(params, paced=waited > 0)
+
+
+def _call(params, paced):
+    start = time.perf_counter()
+    try:
+        r = get_session().get(OPEN_METEO_URL, params=params, timeout=UPSTREAM_TIMEOUT)
+        record_upstream(start, r.status_code)
+        if r.status_code == 429:
+            ratelimit.on_throttled()
+        r.raise_for_status()
+        body = r.json()
+    except requests.exceptions.Timeout:
+        record_upstream(start, "timeout")
+        breaker_record(False)
+        raise
+    except requests.exceptions.RequestException as e:
+        if getattr(e, "response", None) is None:
+            retried = isinstance(e, requests.exceptions.RetryError)
+            record_upstream(start, "retries_exhausted" if retried else "connection_error")
+        breaker_record(False)
+        raise
+    except Exception:
+        breaker_record(False)
+        raise
+    breaker_record(True)
+    ratelimit.on_success(paced)
+    return body
+
+
+# --- Last good values ---
+LAST_GOOD = collections.OrderedDict()  # (lat, lon) rounded to 4 decimals -> (precipitation, time.time()), LRU
+_last_good_lock = threading.Lock()
+
+
+def remember(lat, lon, precipitation):
+    if precipitation is None:
+        return
+    key, now = (round(lat, 4), round(lon, 4)), time.time()
+    with _last_good_lock:
+        LAST_GOOD[key] = (precipitation, now)
+        LAST_GOOD.move_to_end(key)
+        # Oldest first: drop expired entries, then whatever is over the cap
+        while LAST_GOOD:
+            oldest = next(iter(LAST_GOOD.values()))
+            if len(LAST_GOOD) <= LAST_GOOD_MAX_ENTRIES and now - oldest[1] < LAST_GOOD_MAX_AGE:
+                break
+            LAST_GOOD.popitem(last=False)
+
+
+def last_good(lat, lon):
+    """
+    Fallback point for a failed fetch: the last good value flagged stale, or
+    precipitation None flagged missing (so interpolation can skip it).
+    """
+    with _last_good_lock:
+        cached = LAST_GOOD.get((round(lat, 4), round(lon, 4)))
+    if cached is not None and time.time() - cached[1] < LAST_GOOD_MAX_AGE:
+        metrics.inc("upstream_fallback_total", {"kind": "stale"}, help="Failed points served from fallback")
+        return {"lat": lat, "lon": lon, "precipitation": cached[0], "stale": True,
+                "data_age": round(time.time() - cached[1], 1)}
+    metrics.inc("upstream_fallback_total", {"kind": "missing"}, help="Failed points served from fallback")
+    return {"lat": lat, "lon": lon, "precipitation": None, "missing": True}
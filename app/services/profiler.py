@@ -0,0 +1,300 @@
+"""
+Opt-in statistical profiler for API requests and scheduler runs.
+
+A background thread wakes every PROFILE_INTERVAL seconds, reads the stack of
+each thread attached to an active profile (sys._current_frames()) and charges
+it the wall time and the thread CPU time elapsed since the previous sample.
+Nothing is traced between samples, so the overhead is bounded by the interval,
+and threads not being profiled are never touched.
+
+Requests are profiled when a random draw falls under PROFILE_SAMPLE_RATE, or
+when they carry `X-Profile: <PROFILE_ADMIN_TOKEN>`. The thread that runs the
+endpoint is attached via ProfiledRoute (sync routes run in the threadpool, not
+in the thread that sees the middleware). Scheduler runs are profiled with
+SCHEDULER_PROFILE=1 (see scheduler.ejecutar_una_vez).
+
+Finished profiles are kept as JSON files in a ring of the last
+PROFILE_RING_SIZE under SHARED_CACHE_DIR/profiles, so every worker (and the
+scheduler daemon) sees the same list. /admin/profiles serves them as
+collapsed stacks ("frame;frame;frame microseconds" per line), the input of
+flamegraph.pl, inferno and speedscope.
+"""
+import asyncio
+import functools
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+
+from app.services import metrics, shared_cache
+
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+INTERVAL = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+RING_SIZE = int(os.environ.get("PROFILE_RING_SIZE", 50))
+ADMIN_TOKEN = os.environ.get("PROFILE_ADMIN_TOKEN", "")
+PROFILE_DIR = shared_cache.SHARED_CACHE_DIR / "profiles"
+MAX_DEPTH = 128
+
+logger = logging.getLogger(__name__)
+
+_CURRENT = ContextVar("profile", default=None)
+_ACTIVE = set()
+_active_lock = threading.Lock()
+_sampler = [None]
+
+
+def _cpu_clock(ident):
+    """CPU seconds of thread `ident`, or None where per-thread clocks are unavailable."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(ident))
+    except (AttributeError, OSError):
+        return None
+
+
+def _collapse(frame):
+    """Root-first 'path/module.py:function' frames joined by ';'."""
+    names = []
+    while frame is not None and len(names) < MAX_DEPTH:
+        code = frame.f_code
+        path = code.co_filename.replace("\\", "/").rsplit("/", 2)
+        names.append(f"{'/'.join(path[-2:])}:{code.co_name}")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class Profile:
+    def __init__(self, name, kind):
+        self.id = time.strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        self.name = name
+        self.kind = kind
+        self.started = time.time()
+        self.duration = None
+        self.samples = 0
+        self.wall = Counter()  # stack -> microseconds
+        self.cpu = Counter()
+        self.threads = {}  # ident -> [last wall, last cpu]
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def attach(self):
+        """Sample the calling thread while inside the block."""
+        ident = threading.get_ident()
+        with self.lock:
+            self.threads[ident] = [time.perf_counter(), _cpu_clock(ident)]
+        try:
+            yield self
+        finally:
+            self.sample(sys._current_frames(), only=ident)
+            with self.lock:
+                self.threads.pop(ident, None)
+
+    def sample(self, frames, only=None):
+        now = time.perf_counter()
+        with self.lock:
+            for ident, last in self.threads.items():
+                frame = frames.get(ident)
+                if frame is None or (only is not None and ident != only):
+                    continue
+                stack = _collapse(frame)
+                cpu = _cpu_clock(ident)
+                self.wall[stack] += int((now - last[0]) * 1e6)
+                if cpu is not None and last[1] is not None:
+                    self.cpu[stack] += int((cpu - last[1]) * 1e6)
+                last[0], last[1] = now, cpu
+                self.samples += 1
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "kind": self.kind,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "duration": self.duration,
+            "interval": INTERVAL,
+            "samples": self.samples,
+            "wall_us": dict(self.wall),
+            "cpu_us": dict(self.cpu),
+        }
+
+
+def _sample_loop():
+    while True:
+        with _active_lock:
+            profiles = list(_ACTIVE)
+            if not profiles:
+                _sampler[0] = None
+                return
+        frames = sys._current_frames()
+        for profile in profiles:
+            profile.sample(frames)
+        del frames
+        time.sleep(INTERVAL)
+
+
+def _start(profile):
+    with _active_lock:
+        _ACTIVE.add(profile)
+        if _sampler[0] is None:
+            _sampler[0] = threading.Thread(target=_sample_loop, name="profiler", daemon=True)
+            _sampler[0].start()
+
+
+def _finish(profile):
+    with _active_lock:
+        _ACTIVE.discard(profile)
+    profile.duration = round(time.time() - profile.started, 4)
+    try:
+        save(profile)
+    except OSError as e:
+        logger.warning(f"Could not save profile {profile.id}: {e}")
+    metrics.inc("profiles_captured_total", {"kind": profile.kind}, help="Profiles captured")
+
+
+@contextmanager
+def capture(name, kind="run", enabled=True):
+    """Profile the calling thread for the duration of the block (yields None when not enabled)."""
+    if not enabled:
+        yield None
+        return
+    profile = Profile(name, kind)
+    _start(profile)
+    try:
+        with profile.attach():
+            yield profile
+    finally:
+        _finish(profile)
+
+
+# --- Ring of saved profiles ---
+def save(profile):
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{profile.id}.json"
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(profile.to_dict()), encoding="utf-8")
+    os.replace(tmp, path)
+    saved = sorted(PROFILE_DIR.glob("*.json"))  # ids start with the capture time
+    for old in saved[:-RING_SIZE]:
+        old.unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Summaries of the saved profiles, newest first."""
+    summaries = []
+    for path in sorted(PROFILE_DIR.glob("*.json"), reverse=True):
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue  # pruned or being replaced
+        summaries.append({
+            "id": data["id"],
+            "name": data["name"],
+            "kind": data["kind"],
+            "started": data["started"],
+            "duration": data["duration"],
+            "samples": data["samples"],
+            "wall_ms": round(sum(data["wall_us"].values()) / 1000, 1),
+            "cpu_ms": round(sum(data["cpu_us"].values()) / 1000, 1),
+        })
+    return summaries
+
+
+def load(profile_id):
+    """Saved profile as a dict, or None."""
+    if "/" in profile_id or "\\" in profile_id or profile_id.startswith("."):
+        return None
+    try:
+        return json.loads((PROFILE_DIR / f"{profile_id}.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+
+def collapsed(data, weight="wall"):
+    """Flamegraph input: one 'stack microseconds' line per distinct stack, heaviest first."""
+    stacks = data["wall_us" if weight == "wall" else "cpu_us"]
+    return "".join(f"{stack} {us}\n" for stack, us in sorted(stacks.items(), key=lambda s: -s[1]) if us > 0)
+
+
+# --- Request hooks ---
+def authorized(token):
+    """Admin token check; profiling endpoints and the header trigger are off until one is set."""
+    if not ADMIN_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())  # constant time
+
+
+def profiled(endpoint):
+    """Attach the thread running `endpoint` to the request's profile, if it has one."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            profile = _CURRENT.get()
+            if profile is None:
+                return await endpoint(*args, **kwargs)
+            with profile.attach():
+                return await endpoint(*args, **kwargs)
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            profile = _CURRENT.get()
+            if profile is None:
+                return endpoint(*args, **kwargs)
+            with profile.attach():
+                return endpoint(*args, **kwargs)
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """Route class for routers whose endpoints can be profiled: APIRouter(route_class=ProfiledRoute)."""
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware deciding which requests get profiled. The profile
+    id goes back in the X-Profile-Id header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        requested = headers.get(b"x-profile")
+        if not (
+            (requested is not None and authorized(requested.decode("latin-1")))
+            or (SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        query = scope.get("query_string", b"").decode("latin-1")
+        profile = Profile(f"{scope.get('method', '')} {scope['path']}{'?' + query if query else ''}", "request")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _CURRENT.set(profile)
+        _start(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _CURRENT.reset(token)
+            _finish(profile)
@@ -0,0 +1,132 @@
+"""
+Raster rendering of interpolated rainmap grids: one overlay image for the
+whole grid and standard XYZ (Web Mercator, 256 px) tiles.
+
+Colors come from a lookup table indexed by quantized precipitation, so
+colorizing a tile is one vectorized take. Tiles resample the grid bilinearly
+at their own pixel positions, so their size does not depend on the grid
+density. Encoded images are kept in an LRU keyed by the grid version.
+"""
+import io
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+TILE_SIZE = 256
+
+# (precipitation mm/h, RGBA). Below the first stop pixels are transparent.
+COLOR_STOPS = [
+    (0.1, (160, 210, 255, 110)),
+    (1.0, (60, 140, 240, 160)),
+    (2.5, (40, 180, 90, 180)),
+    (5.0, (250, 220, 40, 200)),
+    (10.0, (250, 140, 20, 210)),
+    (20.0, (225, 30, 30, 220)),
+    (50.0, (190, 40, 200, 230)),
+]
+LUT_STEP = 0.05  # mm/h per LUT entry
+LUT_SIZE = int(COLOR_STOPS[-1][0] / LUT_STEP) + 1
+
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp"}
+CACHE_SIZE = 1024
+
+
+def build_lut():
+    """(LUT_SIZE, 4) uint8 table: entry i is the color for i * LUT_STEP mm/h."""
+    values = np.arange(LUT_SIZE) * LUT_STEP
+    stops = np.array([v for v, _ in COLOR_STOPS])
+    colors = np.array([c for _, c in COLOR_STOPS], dtype=np.float64)
+    lut = np.stack([np.interp(values, stops, colors[:, k]) for k in range(4)], axis=1)
+    lut[values < stops[0]] = 0
+    return lut.round().astype(np.uint8)
+
+
+_LUT = []  # built on first use
+
+
+def colorize(values):
+    """Precipitation array (any shape, NaN = no data) -> RGBA uint8 array."""
+    if not _LUT:
+        _LUT.append(build_lut())
+    index = np.nan_to_num(values, nan=0.0) / LUT_STEP
+    index = np.clip(index, 0, LUT_SIZE - 1).astype(np.intp)
+    return _LUT[0][index]
+
+
+def encode(rgba, fmt="png"):
+    # Deferred: PIL is only needed once an image is actually requested
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    image = Image.fromarray(rgba, "RGBA")
+    if fmt == "webp":
+        image.save(buffer, format="WEBP", quality=80, method=4)
+    else:
+        image.save(buffer, format="PNG", compress_level=6)
+    return buffer.getvalue()
+
+
+def sample(grid, lats, lons, sample_lats, sample_lons):
+    """
+    Bilinear sample of `grid` (lat, lon), defined on ascending regular axes, at
+    the given points (broadcastable arrays). NaN outside the grid.
+    """
+    fi = (np.asarray(sample_lats) - lats[0]) / (lats[-1] - lats[0]) * (len(lats) - 1)
+    fj = (np.asarray(sample_lons) - lons[0]) / (lons[-1] - lons[0]) * (len(lons) - 1)
+    fi, fj = np.broadcast_arrays(fi, fj)
+    outside = (fi < 0) | (fi > len(lats) - 1) | (fj < 0) | (fj > len(lons) - 1)
+    fi = np.clip(fi, 0, len(lats) - 1)
+    fj = np.clip(fj, 0, len(lons) - 1)
+    i0 = np.minimum(fi.astype(np.intp), len(lats) - 2)
+    j0 = np.minimum(fj.astype(np.intp), len(lons) - 2)
+    di, dj = fi - i0, fj - j0
+    values = (
+        grid[i0, j0] * (1 - di) * (1 - dj)
+        + grid[i0 + 1, j0] * di * (1 - dj)
+        + grid[i0, j0 + 1] * (1 - di) * dj
+        + grid[i0 + 1, j0 + 1] * di * dj
+    )
+    return np.where(outside, np.nan, values)
+
+
+def overlay(grid, fmt="png"):
+    """Whole grid as one north-up image (one pixel per grid cell)."""
+    return encode(np.ascontiguousarray(colorize(grid)[::-1]), fmt)
+
+
+def tile_bounds(z, x, y):
+    """(south, west, north, east) of XYZ tile z/x/y."""
+    n = 2**z
+    west, east = x / n * 360 - 180, (x + 1) / n * 360 - 180
+    north = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * y / n))))
+    south = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + 1) / n))))
+    return south, west, north, east
+
+
+def tile(grid, lats, lons, z, x, y, fmt="png"):
+    """Render XYZ tile z/x/y of `grid`. Pixels outside the grid are transparent."""
+    n = 2**z
+    pixel = (np.arange(TILE_SIZE) + 0.5) / TILE_SIZE
+    tile_lons = (x + pixel) / n * 360 - 180
+    tile_lats = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * (y + pixel) / n))))
+    values = sample(grid, lats, lons, tile_lats[:, None], tile_lons[None, :])
+    return encode(colorize(values), fmt)
+
+
+_CACHE = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def cached(key, render):
+    """LRU of encoded images. `key` must include the grid version."""
+    with _CACHE_LOCK:
+        if key in _CACHE:
+            _CACHE.move_to_end(key)
+            return _CACHE[key]
+    data = render()
+    with _CACHE_LOCK:
+        _CACHE[key] = data
+        while len(_CACHE) > CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return data
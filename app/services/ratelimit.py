@@ -0,0 +1,186 @@
+"""
+Request budget and concurrency control for the upstream weather API.
+
+Budget: a token bucket (MINUTE_BUDGET tokens, refilled continuously) plus a
+daily counter (reset at 00:00 UTC), both stored in one small file under
+SHARED_CACHE_DIR and updated under flock, so every worker draws from the
+same budget. A call costs one token per location, which is how Open-Meteo
+counts them. acquire() sleeps when the bucket is short and raises
+BudgetExhaustedError when the wait would exceed MAX_WAIT or the daily
+budget is spent.
+
+Concurrency: each process lets at most `limit` upstream calls run at once.
+The limit grows by one after a window of successful, unthrottled calls and
+is halved on every 429 (AIMD), between 1 and MAX_CONCURRENCY.
+"""
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+from app.services import metrics, shared_cache
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, the budget lives in memory
+    fcntl = None
+
+# Open-Meteo's free tier allows 600 calls/min and 10 000/day; keep some headroom per minute
+MINUTE_BUDGET = float(os.environ.get("UPSTREAM_MINUTE_BUDGET", 500))
+DAILY_BUDGET = int(os.environ.get("UPSTREAM_DAILY_BUDGET", 10000))
+# Longest a call may sleep waiting for tokens before giving up
+MAX_WAIT = float(os.environ.get("UPSTREAM_MAX_WAIT", 10))
+MAX_CONCURRENCY = int(os.environ.get("UPSTREAM_MAX_CONCURRENCY", 8))
+START_CONCURRENCY = 2
+
+BUDGET_FILE = "upstream_budget.state"
+STATE = struct.Struct("<ddqd")  # tokens, updated_at, day (days since epoch, UTC), used today
+
+
+class BudgetExhaustedError(Exception):
+    """The call would exceed the daily budget or wait longer than MAX_WAIT for tokens."""
+
+
+# --- Shared budget ---
+_state_lock = threading.Lock()
+_state_file = {}  # "fd": descriptor of BUDGET_FILE, opened on first use (None = in memory)
+_memory = bytearray()
+
+
+def _fd():
+    if "fd" not in _state_file:
+        fd = None
+        if fcntl is not None:
+            try:
+                shared_cache.SHARED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+                fd = os.open(shared_cache.SHARED_CACHE_DIR / BUDGET_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError:
+                fd = None
+        _state_file["fd"] = fd
+    return _state_file["fd"]
+
+
+def _refill(raw, now):
+    """State after refilling the bucket up to `now` (a fresh bucket if `raw` is empty)."""
+    today = int(now // 86400)
+    if len(raw) != STATE.size:
+        return MINUTE_BUDGET, now, today, 0.0
+    tokens, updated_at, day, used = STATE.unpack(raw)
+    tokens = min(MINUTE_BUDGET, tokens + max(0.0, now - updated_at) * MINUTE_BUDGET / 60)
+    if day != today:
+        day, used = today, 0.0
+    return tokens, now, day, used
+
+
+def _transact(update):
+    """Apply update(state) -> (new state, result) to the shared state atomically. Returns result."""
+    with _state_lock:
+        fd = _fd()
+        if fd is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            raw = os.pread(fd, STATE.size, 0) if fd is not None else bytes(_memory)
+            state, result = update(_refill(raw, time.time()))
+            packed = STATE.pack(*state)
+            if fd is not None:
+                os.pwrite(fd, packed, 0)
+            else:
+                _memory[:] = packed
+        finally:
+            if fd is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    return result
+
+
+def acquire(cost=1):
+    """
+    Take `cost` tokens from the shared budget, sleeping while the bucket refills.
+    Returns the seconds spent waiting.
+    """
+    cost = min(float(cost), MINUTE_BUDGET)
+
+    def take(state):
+        tokens, now, day, used = state
+        if used + cost > DAILY_BUDGET:
+            return state, None
+        if tokens >= cost:
+            return (tokens - cost, now, day, used + cost), 0.0
+        return state, (cost - tokens) * 60 / MINUTE_BUDGET
+
+    waited = 0.0
+    while True:
+        wait = _transact(take)
+        if wait is None:
+            raise BudgetExhaustedError(f"Daily upstream budget of {DAILY_BUDGET} calls spent")
+        if wait == 0.0:
+            if waited:
+                metrics.observe(
+                    "upstream_budget_wait_seconds", waited, help="Time calls waited for upstream budget"
+                )
+            return waited
+        if waited + wait > MAX_WAIT:
+            metrics.inc("upstream_budget_rejections_total", help="Calls refused by the upstream budget")
+            raise BudgetExhaustedError(f"Upstream minute budget spent (next tokens in {wait:.1f} s)")
+        time.sleep(wait)
+        waited += wait
+
+
+def remaining():
+    """{"minute": tokens left in the bucket, "day": calls left today}."""
+    return _transact(lambda s: (s, {"minute": s[0], "day": DAILY_BUDGET - s[3]}))
+
+
+def collect_metrics():
+    """Collector for /metrics: remaining budget, read from the shared state at scrape time."""
+    for window, value in remaining().items():
+        metrics.set_gauge(
+            "upstream_budget_remaining",
+            round(value, 1),
+            {"window": window},
+            help="Upstream calls left in the shared minute bucket and daily budget",
+        )
+
+
+# --- Adaptive concurrency (per process) ---
+CONCURRENCY = {"limit": START_CONCURRENCY, "in_flight": 0, "successes": 0}
+_slots = threading.Condition()
+
+
+def _set_limit(limit):
+    CONCURRENCY["limit"] = limit
+    CONCURRENCY["successes"] = 0
+    metrics.set_gauge("upstream_concurrency_limit", limit, help="Concurrent upstream calls allowed")
+    _slots.notify_all()
+
+
+@contextmanager
+def slot():
+    """Hold one of the `limit` concurrent upstream call slots."""
+    with _slots:
+        _slots.wait_for(lambda: CONCURRENCY["in_flight"] < CONCURRENCY["limit"])
+        CONCURRENCY["in_flight"] += 1
+    try:
+        yield
+    finally:
+        with _slots:
+            CONCURRENCY["in_flight"] -= 1
+            _slots.notify()
+
+
+def on_success(paced=False):
+    """Additive increase after `limit` successful calls, unless the bucket is what slows us down."""
+    with _slots:
+        if paced:
+            CONCURRENCY["successes"] = 0
+            return
+        CONCURRENCY["successes"] += 1
+        if CONCURRENCY["successes"] >= CONCURRENCY["limit"] and CONCURRENCY["limit"] < MAX_CONCURRENCY:
+            _set_limit(CONCURRENCY["limit"] + 1)
+
+
+def on_throttled():
+    """Multiplicative decrease on a 429."""
+    with _slots:
+        _set_limit(max(1, CONCURRENCY["limit"] // 2))
+        metrics.inc("upstream_throttled_total", help="429 responses from upstream")
@@ -0,0 +1,110 @@
+"""
+Perfiles de renderizado para los mapas de schedule.py.
+
+- Backend Agg explícito: el scheduler corre sin pantalla y en hilos.
+- Un solo pase de render: se dibuja el canvas una vez, se calcula el bbox
+  ajustado con el mismo renderer y se recorta el buffer RGBA. Con
+  `bbox_inches='tight'` matplotlib vuelve a dibujar la figura completa.
+- Codificación con PIL y niveles de compresión ajustados (PNG sin `optimize`,
+  que prueba todas las estrategias de compresión, o WebP).
+
+tropycal crea su propia figura y ejes cartopy (con proyección centrada en
+cada tormenta) en cada plot, así que no se puede reutilizar la figura entre
+mapas; sí se cierra siempre para no acumular memoria en el proceso residente.
+"""
+import os
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+from PIL import Image
+
+# dpi: resolución; formato: png/webp; subdir: carpeta dentro de Mapas/ (None = Mapas/ mismo)
+# recorte: "unico" (un pase + recorte del buffer) o "savefig" (bbox_inches='tight', dos pases)
+PERFILES = {
+    "print": {"dpi": 300, "formato": "png", "compress_level": 6, "subdir": None, "recorte": "unico"},
+    "web": {"dpi": 110, "formato": "webp", "quality": 80, "method": 4, "subdir": "web", "recorte": "unico"},
+    "web-png": {"dpi": 110, "formato": "png", "compress_level": 3, "subdir": "web", "recorte": "unico"},
+    # Comportamiento original, para comparar en benchmarks/bench_render.py
+    "legacy": {"dpi": 300, "formato": "png", "subdir": None, "recorte": "savefig", "optimize": True},
+}
+
+# Perfiles que genera schedule.py para cada mapa, p.ej. MAP_PROFILES="print,web"
+PERFILES_MAPA = [
+    p.strip() for p in os.environ.get("MAP_PROFILES", "print").split(",") if p.strip() in PERFILES
+] or ["print"]
+
+MEDIA_TYPES = {"png": "image/png", "webp": "image/webp"}
+PADDING_PULGADAS = 0.1  # mismo default que pad_inches de savefig
+
+
+def ruta_para_perfil(ruta_png, perfil):
+    """Mapas/AL132025.png -> Mapas/web/AL132025.webp según el perfil."""
+    config = PERFILES[perfil]
+    carpeta, nombre = os.path.split(ruta_png)
+    base = os.path.splitext(nombre)[0]
+    if config["subdir"]:
+        carpeta = os.path.join(carpeta, config["subdir"])
+    return os.path.join(carpeta, f"{base}.{config['formato']}")
+
+
+def renderizar(fig, dpi):
+    """Dibuja la figura una sola vez y devuelve la imagen PIL recortada al contenido."""
+    fig.set_dpi(dpi)
+    fig.canvas.draw()
+    renderer = fig.canvas.get_renderer()
+    buffer = np.asarray(fig.canvas.buffer_rgba())
+    alto, ancho = buffer.shape[:2]
+
+    # bbox ajustado (en pulgadas) calculado con el renderer ya dibujado
+    bbox = fig.get_tightbbox(renderer).padded(PADDING_PULGADAS)
+    x0 = max(0, int(np.floor(bbox.x0 * dpi)))
+    x1 = min(ancho, int(np.ceil(bbox.x1 * dpi)))
+    y0 = max(0, int(np.floor(alto - bbox.y1 * dpi)))  # el eje y de la imagen va hacia abajo
+    y1 = min(alto, int(np.ceil(alto - bbox.y0 * dpi)))
+
+    imagen = Image.fromarray(buffer[y0:y1, x0:x1])
+    # Fondo blanco como facecolor='white' en savefig
+    fondo = Image.new("RGB", imagen.size, (255, 255, 255))
+    fondo.paste(imagen, mask=imagen.getchannel("A"))
+    return fondo
+
+
+def guardar_figura(fig, ruta, perfil="print"):
+    """Guarda la figura con el perfil indicado. Devuelve los bytes escritos."""
+    config = PERFILES[perfil]
+    os.makedirs(os.path.dirname(ruta) or ".", exist_ok=True)
+
+    if config["recorte"] == "savefig":
+        fig.savefig(
+            ruta,
+            dpi=config["dpi"],
+            bbox_inches="tight",
+            facecolor="white",
+            edgecolor="none",
+            format=config["formato"],
+            pil_kwargs={"optimize": config.get("optimize", False)},
+        )
+        return os.path.getsize(ruta)
+
+    imagen = renderizar(fig, config["dpi"])
+    if config["formato"] == "webp":
+        imagen.save(ruta, format="WEBP", quality=config["quality"], method=config["method"])
+    else:
+        imagen.save(ruta, format="PNG", compress_level=config["compress_level"])
+    return os.path.getsize(ruta)
+
+
+def guardar_perfiles(ruta_png, perfiles=None, fig=None):
+    """Guarda la figura actual en todos los perfiles configurados y la cierra."""
+    fig = fig or plt.gcf()
+    try:
+        return {
+            perfil: guardar_figura(fig, ruta_para_perfil(ruta_png, perfil), perfil)
+            for perfil in (perfiles or PERFILES_MAPA)
+        }
+    finally:
+        plt.close(fig)
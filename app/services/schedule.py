@@ -1,7 +1,6 @@
 
 #Codigo Hannah - Version con traducción completa y limpieza de texto
-from tropycal import realtime
-import json
+from app.services.render import guardar_perfiles  # fija el backend Agg antes de tropycal/pyplot
 from datetime import datetime
 import os
 import numpy as np
@@ -9,27 +8,17 @@ import traceback
 import matplotlib.pyplot as plt
 from PIL import Image, ImageDraw, ImageFont
 import re
+import shutil
+import time
+import tracemalloc
+from contextlib import contextmanager
 from tzlocal import get_localzone
-
-# ==============================
-# CONFIGURACIÓN DE DIRECTORIOS
-# ==============================
-fecha = datetime.now()
-data_directory = "..\..\..\Data\Data"
-directorio = os.path.join(data_directory, f'{fecha:%Y%m%d_%H%M%S}')
-os.makedirs(directorio, exist_ok=True)
-
-# Subcarpetas
-mapas_dir = os.path.join(directorio, "Mapas")
-json_dir = os.path.join(directorio, "JSON")
-os.makedirs(mapas_dir, exist_ok=True)
-os.makedirs(json_dir, exist_ok=True)
-
-# Archivos base
-archivo_general = f'tormentas{fecha:%Y%m%d_%H%M%S}.json'
-mapa_general = f"mapa_{fecha:%Y%m%d_%H%M%S}.png"
-ruta_general_mapa = os.path.join(mapas_dir, mapa_general)
-ruta_general_datos = os.path.join(json_dir, archivo_general)
+from app.services import codec
+from app.services.storm_encoder import codificar_tormenta, resumen_tormenta
+from app.services.exposicion import CARPETA_EXPOSICION, EXPOSICION_RADIO_KM, calcular_exposicion, puntos_tormenta
+from app.services.geojson_tormentas import CARPETA_GEOJSON, codificar_geojson
+from app.services.compression import precompress_file
+from app.services.utils import DATA_DIR, MARCADOR_COMPLETO, PREFIJO_STAGING
 
 # ==============================
 # TEXTOS A ELIMINAR (serán borrados completamente)
@@ -383,25 +372,51 @@ def limpiar_y_traducir_matplotlib(es_mapa_general=False):
         print(f"⚠️ Error durante la limpieza y traducción: {e}")
         traceback.print_exc()
 
+# ==============================
+# DURACIÓN POR ETAPA
+# ==============================
+# Segundos acumulados por etapa en la corrida actual; el scheduler los publica
+# en su archivo de estado y la API los expone en /metrics.
+ETAPAS = {}
+# Pico de memoria por etapa (bytes por encima de lo asignado al entrar), solo si
+# tracemalloc está activo (ver benchmarks/bench_schedule.py); en producción queda vacío.
+MEMORIA = {}
+_picos = []  # pico visto por cada etapa anidada en curso
+
+@contextmanager
+def medir_etapa(nombre):
+    """Acumula en ETAPAS el tiempo del bloque (y en MEMORIA su pico de memoria)."""
+    inicio = time.perf_counter()
+    rastrear = tracemalloc.is_tracing()
+    if rastrear:
+        base, pico = tracemalloc.get_traced_memory()
+        if _picos:  # reset_peak() borra el pico de la etapa que nos contiene: se guarda antes
+            _picos[-1] = max(_picos[-1], pico)
+        tracemalloc.reset_peak()
+        _picos.append(0)
+    try:
+        yield
+    finally:
+        ETAPAS[nombre] = round(ETAPAS.get(nombre, 0) + time.perf_counter() - inicio, 4)
+        if rastrear:
+            pico = max(_picos.pop(), tracemalloc.get_traced_memory()[1])
+            if _picos:
+                _picos[-1] = max(_picos[-1], pico)
+            MEMORIA[nombre] = max(MEMORIA.get(nombre, 0), pico - base)
+
 def guardar_mapa_limpio(ruta_imagen):
     """
     Guarda el mapa actual con traducciones y sin textos no deseados.
     """
     try:
-        limpiar_y_traducir_matplotlib()
-
-        plt.savefig(
-            ruta_imagen,
-            dpi=300,
-            bbox_inches='tight',
-            facecolor='white',
-            edgecolor='none',
-            format='png',
-            pil_kwargs={'optimize': True}
-        )
+        with medir_etapa("limpieza_texto"):
+            limpiar_y_traducir_matplotlib()
 
-        print(f"✅ Mapa limpio guardado: {ruta_imagen}")
-        plt.close()
+        # Un archivo por perfil de render (MAP_PROFILES); el perfil "print" es el PNG original
+        with medir_etapa("png"):
+            tamanos = guardar_perfiles(ruta_imagen)
+
+        print(f"✅ Mapa limpio guardado: {ruta_imagen} ({', '.join(f'{p}: {b // 1024} KB' for p, b in tamanos.items())})")
 
     except Exception as e:
         print(f"❌ Error al guardar mapa: {e}")
@@ -411,19 +426,82 @@ def guardar_mapa_limpio(ruta_imagen):
 # ==============================
 # FUNCIONES AUXILIARES
 # ==============================
-def serializar(obj):
-    """Convierte objetos no serializables a tipos básicos compatibles con JSON."""
-    if isinstance(obj, np.ndarray):
-        return obj.tolist()
-    if isinstance(obj, (np.int32, np.int64, np.float32, np.float64)):
-        return obj.item()
-    if isinstance(obj, (datetime,)):
-        return str(obj)
-    if isinstance(obj, dict):
-        return {k: serializar(v) for k, v in obj.items()}
-    if isinstance(obj, (list, tuple)):
-        return [serializar(i) for i in obj]
-    return obj
+def datos_legados(storm):
+    """
+    Registro en el formato JSON original (JSON/tormenta_*.json).
+    Los campos de resumen salen de storm_encoder.resumen_tormenta(), que lee las
+    series de storm.vars; antes se leían de storm.attrs y quedaban en null.
+    Los valores de NumPy los escribe codec.py tal cual; `date` y `zona_horaria`
+    conservan el formato str() que siempre tuvieron.
+    """
+    resumen = resumen_tormenta(storm)
+    return {
+        "id": storm.id,
+        "name": storm.name,
+        "year": storm.year,
+        'date': str(datetime.now()),
+        'zona_horaria': str(get_localzone()),
+        "season": storm.season,
+        "basin": storm.basin,
+        "max_wind": resumen["max_wind"],
+        "min_pressure": resumen["min_pressure"],
+        "ace": storm.ace,
+        "invest": storm.invest,
+        "start_time": resumen["start_time"],
+        "end_time": resumen["end_time"],
+        "category": resumen["category"],
+        "storm_type": getattr(storm, "type", None),
+        "source": storm.source_info
+    }
+
+# ==============================
+# PUBLICACIÓN DE SNAPSHOTS
+# ==============================
+STAGING_MAX_EDAD = 6 * 3600  # staging más viejo que esto es de una corrida que murió
+
+def limpiar_staging_abandonado(data_dir=DATA_DIR):
+    """Borra directorios de staging que quedaron de corridas interrumpidas."""
+    if not os.path.isdir(data_dir):
+        return
+    limite = time.time() - STAGING_MAX_EDAD
+    for nombre in os.listdir(data_dir):
+        ruta = os.path.join(data_dir, nombre)
+        if nombre.startswith(PREFIJO_STAGING) and os.path.getmtime(ruta) < limite:
+            print(f"🧹 Eliminando staging abandonado: {nombre}")
+            shutil.rmtree(ruta, ignore_errors=True)
+
+def publicar_snapshot(staging, directorio, storms_list):
+    """
+    Escribe el manifiesto _COMPLETE y publica el snapshot con un rename atómico.
+    Hasta este punto la API no puede ver el directorio (ver storm_routes.get_snapshot_index).
+    Antes se comprimen los JSON (hermanos .gz/.br/.zst) para que la API no lo haga en cada petición.
+    """
+    with medir_etapa("compresion"):
+        for raiz, _, nombres in os.walk(staging):
+            for nombre in nombres:
+                if nombre.endswith(".json"):
+                    try:
+                        precompress_file(os.path.join(raiz, nombre))
+                    except Exception as e:  # sin hermanos comprimidos el archivo se sirve igual
+                        print(f"⚠️ No se pudo comprimir {nombre}: {e}")
+
+    archivos = {}
+    for raiz, _, nombres in os.walk(staging):
+        for nombre in nombres:
+            ruta = os.path.join(raiz, nombre)
+            archivos[os.path.relpath(ruta, staging).replace(os.sep, "/")] = os.path.getsize(ruta)
+
+    manifiesto = {
+        "snapshot": os.path.basename(directorio),
+        "publicado": datetime.now().isoformat(timespec="seconds"),
+        "tormentas": list(storms_list),
+        "archivos": archivos,
+    }
+    codec.dump(manifiesto, os.path.join(staging, MARCADOR_COMPLETO))
+
+    # rename dentro del mismo sistema de archivos: la API ve todo o nada
+    os.rename(staging, directorio)
+    print(f"📦 Snapshot publicado: {directorio} ({len(archivos)} archivos)")
 
 # ==============================
 # CONFIGURAR MATPLOTLIB
@@ -433,144 +511,260 @@ matplotlib.rcParams['font.sans-serif'] = ['DejaVu Sans', 'Arial', 'Helvetica', '
 matplotlib.rcParams['axes.unicode_minus'] = False
 matplotlib.rcParams['figure.max_open_warning'] = 50
 
+
 # ==============================
-# DESCARGA Y PROCESAMIENTO
+# FUENTE DE DATOS
 # ==============================
-print("=" * 60)
-print("🌀 SISTEMA DE MONITOREO DE TORMENTAS TROPICALES")
-print("=" * 60)
-print("\n📡 Descargando tormentas activas...")
-
-realtime_obj = realtime.Realtime()
-storms_list = realtime_obj.list_active_storms()
-print(f"✅ Tormentas activas detectadas: {len(storms_list)}")
+# Cualquier objeto con la interfaz de tropycal.realtime.Realtime que usa la corrida:
+# list_active_storms(), get_storm(id) y plot_summary(). Las tormentas deben tener
+# id/name/year/season/basin/ace/invest/source_info, series en .vars,
+# get_forecast_realtime() y plot_forecast_realtime() (ver benchmarks/bench_schedule.py).
+def fuente_nhc():
+    """Fuente por defecto: tormentas activas del NHC vía tropycal (descarga en vivo)."""
+    from tropycal import realtime  # import diferido: las corridas con fixtures no necesitan red ni tropycal
 
-if len(storms_list) == 0:
-    print("ℹ️  No hay tormentas activas en este momento.")
-else:
-    print(f"📋 Tormentas: {', '.join(storms_list)}")
+    return realtime.Realtime()
 
 # ==============================
-# MAPA GENERAL
+# ETAPAS DE LA CORRIDA
 # ==============================
-print("\n" + "=" * 60)
-print("🗺️  GENERANDO MAPA GENERAL")
-print("=" * 60)
+def preparar_directorios(data_dir, fecha):
+    """Crea el staging del snapshot y sus subcarpetas; devuelve las rutas."""
+    limpiar_staging_abandonado(data_dir)
+    # Todo se escribe en un directorio temporal; la API no lo ve hasta publicar_snapshot()
+    staging = os.path.join(data_dir, f'{PREFIJO_STAGING}{fecha:%Y%m%d_%H%M%S}')
+    rutas = {
+        "directorio": os.path.join(data_dir, f'{fecha:%Y%m%d_%H%M%S}'),
+        "staging": staging,
+        "mapas": os.path.join(staging, "Mapas"),
+        "json": os.path.join(staging, "JSON"),
+        "compacto": os.path.join(staging, "Compacto"),
+        "exposicion": os.path.join(staging, CARPETA_EXPOSICION),
+        "geojson": os.path.join(staging, CARPETA_GEOJSON),
+    }
+    for clave in ("mapas", "json", "compacto", "exposicion", "geojson"):
+        os.makedirs(rutas[clave], exist_ok=True)
+    return rutas
+
+def generar_mapa_general(fuente, rutas, fecha):
+    """Mapa resumen de la cuenca (Mapas/mapa_<fecha>.png)."""
+    print("\n" + "=" * 60)
+    print("🗺️  GENERANDO MAPA GENERAL")
+    print("=" * 60)
 
-try:
-    realtime_obj.plot_summary()
-    guardar_mapa_limpio(ruta_general_mapa)
-except Exception as e:
-    print(f"❌ Error al generar el mapa general: {e}")
-    traceback.print_exc()
+    try:
+        with medir_etapa("mapa_general"):
+            fuente.plot_summary()
+        guardar_mapa_limpio(os.path.join(rutas["mapas"], f"mapa_{fecha:%Y%m%d_%H%M%S}.png"))
+    except Exception as e:
+        print(f"❌ Error al generar el mapa general: {e}")
+        traceback.print_exc()
 
-# ==============================
-# DATOS GENERALES DE TORMENTAS
-# ==============================
-print("\n" + "=" * 60)
-print("📊 PROCESANDO DATOS GENERALES")
-print("=" * 60)
+def guardar_datos_generales(fuente, storms_list, rutas, fecha):
+    """JSON/tormentas<fecha>.json con el registro legado de cada tormenta."""
+    print("\n" + "=" * 60)
+    print("📊 PROCESANDO DATOS GENERALES")
+    print("=" * 60)
 
-datos_tormentas_general = {}
+    datos_tormentas_general = {}
 
-for i, storm_id in enumerate(storms_list):
-    try:
-        print(f"\n🌪️  Procesando: {storm_id}")
-        storm = realtime_obj.get_storm(storm_id)
-
-        datos_tormentas_general[i] = serializar({
-            "id": storm.id,
-            "name": storm.name,
-            "year": storm.year,
-            'date': datetime.now(),
-            'zona_horaria': get_localzone(),
-            "season": storm.season,
-            "basin": storm.basin,
-            "max_wind": storm.attrs["vmax"][-1] if "vmax" in storm.attrs and storm.attrs["vmax"].size > 0 else None,
-            "min_pressure": storm.attrs["mslp"][-1] if "mslp" in storm.attrs and storm.attrs["mslp"].size > 0 else None,
-            "ace": storm.ace,
-            "invest": storm.invest,
-            "start_time": storm.attrs["time"][0] if "time" in storm.attrs and storm.attrs["time"].size > 0 else None,
-            "end_time": storm.attrs["time"][-1] if "time" in storm.attrs and storm.attrs["time"].size > 0 else None,
-            "source": storm.source_info,
-            "category": getattr(storm, "category", None),
-            "storm_type": getattr(storm, "type", None)
-        })
-        print(f"   ✓ Datos extraídos correctamente")
+    for i, storm_id in enumerate(storms_list):
+        try:
+            print(f"\n🌪️  Procesando: {storm_id}")
+            storm = fuente.get_storm(storm_id)
 
-    except Exception as e:
-        print(f"   ⚠️ Error al procesar datos de {storm_id}: {e}")
+            datos_tormentas_general[i] = datos_legados(storm)
+            print(f"   ✓ Datos extraídos correctamente")
 
-# Guardar JSON general
-try:
-    with open(ruta_general_datos, 'w', encoding='utf-8') as f:
-        json.dump(datos_tormentas_general, f, indent=4, default=str, ensure_ascii=False)
-    print(f"\n✅ Archivo JSON general guardado: {ruta_general_datos}")
-except Exception as e:
-    print(f"\n❌ Error al guardar archivo JSON general: {e}")
+        except Exception as e:
+            print(f"   ⚠️ Error al procesar datos de {storm_id}: {e}")
 
-# ==============================
-# MAPAS Y DATOS INDIVIDUALES
-# ==============================
-print("\n" + "=" * 60)
-print("🎯 GENERANDO MAPAS Y DATOS INDIVIDUALES")
-print("=" * 60)
+    ruta_general_datos = os.path.join(rutas["json"], f'tormentas{fecha:%Y%m%d_%H%M%S}.json')
+    try:
+        with medir_etapa("json"):
+            codec.dump(datos_tormentas_general, ruta_general_datos)
+        print(f"\n✅ Archivo JSON general guardado: {ruta_general_datos}")
+    except Exception as e:
+        print(f"\n❌ Error al guardar archivo JSON general: {e}")
 
-for storm_id in storms_list:
+def procesar_tormenta(fuente, storm_id, rutas):
+    """
+    Mapa de pronóstico, JSON legado y registro compacto de una tormenta.
+    Devuelve (intensidad en kt, puntos_tormenta()) o None si la tormenta falló.
+    """
     print(f"\n{'='*40}")
     print(f"🌀 Tormenta: {storm_id}")
     print(f"{'='*40}")
 
     try:
-        storm = realtime_obj.get_storm(storm_id)
+        storm = fuente.get_storm(storm_id)
+        intensidad = resumen_tormenta(storm)["max_wind"]
 
         # --- Mapa individual ---
+        pronostico = None
         try:
-            print("   📍 Obteniendo pronóstico en tiempo real...")
-            storm.get_forecast_realtime()
+            with medir_etapa("mapa_tormenta"):
+                print("   📍 Obteniendo pronóstico en tiempo real...")
+                pronostico = storm.get_forecast_realtime()
 
-            print("   🎨 Generando mapa de pronóstico...")
-            storm.plot_forecast_realtime()
+                print("   🎨 Generando mapa de pronóstico...")
+                storm.plot_forecast_realtime()
 
-            ruta_mapa_individual = os.path.join(mapas_dir, f"{storm_id}.png")
+            ruta_mapa_individual = os.path.join(rutas["mapas"], f"{storm_id}.png")
             guardar_mapa_limpio(ruta_mapa_individual)
 
         except Exception as e:
             print(f"   ⚠️ No se pudo generar mapa para {storm_id}: {e}")
 
+        puntos = puntos_tormenta(storm, pronostico)
+
         # --- Datos individuales ---
         print("   💾 Guardando datos en JSON...")
-        datos_tormenta_individual = serializar({
-            "id": storm.id,
-            "name": storm.name,
-            "year": storm.year,
-            'date': datetime.now(),
-            'zona_horaria': get_localzone(),
-            "season": storm.season,
-            "basin": storm.basin,
-            "max_wind": storm.attrs["vmax"][-1] if "vmax" in storm.attrs and storm.attrs["vmax"].size > 0 else None,
-            "min_pressure": storm.attrs["mslp"][-1] if "mslp" in storm.attrs and storm.attrs["mslp"].size > 0 else None,
-            "ace": storm.ace,
-            "invest": storm.invest,
-            "start_time": storm.attrs["time"][0] if "time" in storm.attrs and storm.attrs["time"].size > 0 else None,
-            "end_time": storm.attrs["time"][-1] if "time" in storm.attrs and storm.attrs["time"].size > 0 else None,
-            "category": getattr(storm, "category", None),
-            "storm_type": getattr(storm, "type", None),
-            "source": storm.source_info
-        })
-
-        ruta_json_individual = os.path.join(json_dir, f"tormenta_{storm_id}.json")
-        with open(ruta_json_individual, 'w', encoding='utf-8') as f:
-            json.dump(datos_tormenta_individual, f, indent=4, default=str, ensure_ascii=False)
+        datos_tormenta_individual = datos_legados(storm)
+
+        ruta_json_individual = os.path.join(rutas["json"], f"tormenta_{storm_id}.json")
+        with medir_etapa("json"):
+            codec.dump(datos_tormenta_individual, ruta_json_individual)
         print(f"   ✓ JSON guardado: {ruta_json_individual}")
 
+        # --- Registro compacto (RLE + arreglos tipados) ---
+        ruta_compacta = os.path.join(rutas["compacto"], f"tormenta_{storm_id}.json")
+        with medir_etapa("json"):
+            codec.dump(
+                codificar_tormenta(storm, extra={'date': datetime.now().isoformat()}), ruta_compacta, indent=False
+            )
+        return intensidad, puntos
+
     except Exception as e:
         print(f"   ❌ Error inesperado al procesar {storm_id}: {e}")
         traceback.print_exc()
+        return None
 
-print("\n" + "=" * 60)
-print("✅ PROCESO FINALIZADO CORRECTAMENTE")
-print("=" * 60)
-print(f"\n📁 Resultados guardados en: {directorio}")
-print(f"   🗺️  Mapas: {mapas_dir}")
-print(f"   📄 JSON: {json_dir}")
\ No newline at end of file
+def guardar_exposicion(puntos, rutas):
+    """Exposicion/: ciudades cercanas a cada tormenta y amenazas por ciudad."""
+    try:
+        with medir_etapa("exposicion"):
+            por_tormenta, por_ciudad = calcular_exposicion(puntos)
+        with medir_etapa("json"):
+            for storm_id, registros in por_tormenta.items():
+                codec.dump(
+                    {"storm_id": storm_id, "radius_km": EXPOSICION_RADIO_KM, "cities": registros},
+                    os.path.join(rutas["exposicion"], f"tormenta_{storm_id}.json"), indent=False,
+                )
+            codec.dump(por_ciudad, os.path.join(rutas["exposicion"], "ciudades.json"), indent=False)
+        print(f"\n🏙️  Exposición calculada: {len(por_ciudad)} ciudades a menos de {EXPOSICION_RADIO_KM:.0f} km")
+    except Exception as e:
+        print(f"\n⚠️ Error al calcular la exposición de ciudades: {e}")
+        traceback.print_exc()
+
+def guardar_geojson(puntos, rutas):
+    """GeoJSON/: trayectoria, pronóstico y cono de cada tormenta."""
+    for p in puntos:
+        try:
+            with medir_etapa("geojson"):
+                registro = codificar_geojson(p)
+            if registro is None:
+                continue
+            with medir_etapa("json"):
+                codec.dump(registro, os.path.join(rutas["geojson"], f"tormenta_{p['id']}.json"), indent=False)
+        except Exception as e:
+            print(f"⚠️ Error al generar el GeoJSON de {p['id']}: {e}")
+            traceback.print_exc()
+    print(f"🧭 GeoJSON generado para {len(os.listdir(rutas['geojson']))} tormentas")
+
+# ==============================
+# CORRIDA COMPLETA
+# ==============================
+def ejecutar_monitoreo(omitir_si_vacio=False, fuente=None, data_dir=None):
+    """
+    Ejecuta una corrida completa: descarga, mapas y JSON.
+    Se puede llamar varias veces desde un mismo proceso (ver scheduler.py).
+
+    Args:
+        omitir_si_vacio: si no hay tormentas activas, no generar mapas ni directorio
+            (el scheduler lo activa cuando la corrida anterior tampoco tenía tormentas)
+        fuente: de dónde salen las tormentas (default: fuente_nhc(), en vivo)
+        data_dir: dónde se publica el snapshot (default: DATA_DIR)
+
+    Devuelve un resumen: directorio, tormentas, intensidades (kt), si se omitió,
+    segundos por etapa y, con tracemalloc activo, pico de memoria por etapa.
+    """
+    data_dir = data_dir or DATA_DIR
+    intensidades = {}
+    ETAPAS.clear()
+    MEMORIA.clear()
+
+    # ==============================
+    # DESCARGA Y PROCESAMIENTO
+    # ==============================
+    print("=" * 60)
+    print("🌀 SISTEMA DE MONITOREO DE TORMENTAS TROPICALES")
+    print("=" * 60)
+    print("\n📡 Descargando tormentas activas...")
+
+    with medir_etapa("listar_tormentas"):
+        fuente = fuente or fuente_nhc()
+        storms_list = fuente.list_active_storms()
+    print(f"✅ Tormentas activas detectadas: {len(storms_list)}")
+
+    if len(storms_list) == 0:
+        print("ℹ️  No hay tormentas activas en este momento.")
+    else:
+        print(f"📋 Tormentas: {', '.join(storms_list)}")
+
+    # Sin tormentas en esta corrida ni en la anterior: no hay nada nuevo que dibujar
+    if omitir_si_vacio and len(storms_list) == 0:
+        print("⏭️  Sin tormentas por segunda corrida consecutiva, se omite la generación de mapas.")
+        return {"directorio": None, "tormentas": [], "intensidades": {}, "omitida": True,
+                "etapas": dict(ETAPAS), "memoria": dict(MEMORIA)}
+
+    fecha = datetime.now()
+    rutas = preparar_directorios(data_dir, fecha)
+
+    generar_mapa_general(fuente, rutas, fecha)
+    guardar_datos_generales(fuente, storms_list, rutas, fecha)
+
+    # ==============================
+    # MAPAS Y DATOS INDIVIDUALES
+    # ==============================
+    print("\n" + "=" * 60)
+    print("🎯 GENERANDO MAPAS Y DATOS INDIVIDUALES")
+    print("=" * 60)
+
+    puntos = []  # trayectoria + pronóstico de cada tormenta, para la tabla de exposición
+    for storm_id in storms_list:
+        resultado = procesar_tormenta(fuente, storm_id, rutas)
+        if resultado is not None:
+            intensidades[storm_id], puntos_storm = resultado
+            puntos.append(puntos_storm)
+
+    guardar_exposicion(puntos, rutas)
+    guardar_geojson(puntos, rutas)
+
+    # ==============================
+    # PUBLICACIÓN ATÓMICA
+    # ==============================
+    directorio = rutas["directorio"]
+    with medir_etapa("publicacion"):
+        publicar_snapshot(rutas["staging"], directorio, storms_list)
+
+    print("\n" + "=" * 60)
+    print("✅ PROCESO FINALIZADO CORRECTAMENTE")
+    print("=" * 60)
+    print(f"\n📁 Resultados guardados en: {directorio}")
+    print(f"   🗺️  Mapas: {os.path.join(directorio, 'Mapas')}")
+    print(f"   📄 JSON: {os.path.join(directorio, 'JSON')}")
+    print(f"   🧭 GeoJSON: {os.path.join(directorio, CARPETA_GEOJSON)}")
+
+    return {
+        "directorio": directorio,
+        "tormentas": list(storms_list),
+        "intensidades": intensidades,
+        "omitida": False,
+        "etapas": dict(ETAPAS),
+        "memoria": dict(MEMORIA),
+    }
+
+
+if __name__ == "__main__":
+    ejecutar_monitoreo()
@@ -0,0 +1,324 @@
+"""
+Planificador residente para schedule.py.
+
+En lugar de lanzar `python -m app.services.schedule` desde cero cada hora,
+este proceso importa una sola vez tropycal/matplotlib/numpy/PIL y llama a
+`ejecutar_monitoreo()` en cada corrida. Puede correr como daemon
+(`python -m app.services.scheduler`) o como tarea asyncio dentro de la API
+(SCHEDULER_EMBEDDED=1).
+
+La cadencia es adaptativa (ver `planificar()`): con tormentas activas se
+corre justo después de cada aviso del NHC y más seguido si la intensidad
+está cambiando; sin tormentas en dos corridas seguidas no se generan mapas.
+La próxima corrida planeada se publica en SCHEDULER_STATE para la API.
+
+Variables de entorno:
+    SCHEDULER_INTERVAL  segundos entre corridas (default 3600)
+    SCHEDULER_OFFSET    desfase dentro del intervalo, p.ej. 300 = "minuto 5" (default 0)
+    SCHEDULER_ALIGN     alinear al reloj como cron, p.ej. cada hora en punto (default 1)
+    SCHEDULER_JITTER    segundos aleatorios extra antes de cada corrida (default 0)
+    SCHEDULER_LOG       archivo JSONL donde se registran las duraciones
+    SCHEDULER_STATE     archivo JSON con el estado y la próxima corrida
+    SCHEDULER_ADVISORY_DELAY   segundos después de la hora del aviso NHC (default 900)
+    SCHEDULER_FAST_INTERVAL    intervalo cuando la intensidad cambia (default 1200)
+    SCHEDULER_INTENSITY_DELTA  cambio de viento (kt) entre corridas que activa el modo rápido (default 10)
+    SCHEDULER_PROFILE   perfilar cada corrida (ver app/services/profiler.py y /admin/profiles) (default 0)
+"""
+import argparse
+import asyncio
+import os
+import random
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timezone
+
+from app.services import codec, profiler
+from app.services.utils import DATA_DIR, env_bool
+
+INTERVALO = int(os.environ.get("SCHEDULER_INTERVAL", 3600))
+OFFSET = int(os.environ.get("SCHEDULER_OFFSET", 0))
+ALINEAR = env_bool("SCHEDULER_ALIGN", True)
+JITTER = float(os.environ.get("SCHEDULER_JITTER", 0))
+RUNS_LOG = os.environ.get("SCHEDULER_LOG", str(DATA_DIR.parent / "scheduler_runs.jsonl"))
+STATE_FILE = os.environ.get("SCHEDULER_STATE", str(DATA_DIR.parent / "scheduler_state.json"))
+
+# El NHC emite avisos completos a las 03/09/15/21 UTC e intermedios a las 00/06/12/18 UTC
+CICLO_AVISOS_NHC = 3 * 3600
+RETRASO_AVISO = int(os.environ.get("SCHEDULER_ADVISORY_DELAY", 900))
+INTERVALO_RAPIDO = int(os.environ.get("SCHEDULER_FAST_INTERVAL", 1200))
+UMBRAL_INTENSIDAD = float(os.environ.get("SCHEDULER_INTENSITY_DELTA", 10))
+PERFILAR = env_bool("SCHEDULER_PROFILE")
+
+# Estado en memoria del planificador (mismo estilo que los caches de storm_routes)
+ESTADO = {
+    "en_curso": False,
+    "inicio_corrida": None,
+    "proxima": None,
+    "motivo": None,
+    "corridas": deque(maxlen=100),  # últimas corridas: inicio, duración, ok
+    "resultados": deque(maxlen=2),  # resumen de las dos últimas corridas de schedule.py
+    "omitidas": 0,  # corridas rechazadas por traslape
+}
+_LOCK = threading.Lock()
+
+
+def calcular_proxima(ahora, intervalo=INTERVALO, offset=OFFSET, alinear=ALINEAR, jitter=JITTER):
+    """
+    Devuelve el timestamp de la próxima corrida.
+    Con `alinear` se comporta como cron: múltiplos del intervalo + offset
+    (intervalo=3600, offset=300 -> cada hora al minuto 5).
+    """
+    if alinear:
+        proxima = ((ahora - offset) // intervalo + 1) * intervalo + offset
+    else:
+        proxima = ahora + intervalo
+    if jitter > 0:
+        proxima += random.uniform(0, jitter)
+    return proxima
+
+
+def proximo_aviso_nhc(ahora, retraso=RETRASO_AVISO):
+    """Timestamp del próximo ciclo de avisos NHC (cada 3 h UTC) más el retraso de publicación."""
+    proxima = (ahora // CICLO_AVISOS_NHC) * CICLO_AVISOS_NHC + retraso
+    while proxima <= ahora:
+        proxima += CICLO_AVISOS_NHC
+    return proxima
+
+
+def intensidad_cambiando(resultados, umbral=UMBRAL_INTENSIDAD):
+    """True si alguna tormenta cambió su viento máximo >= umbral, o apareció una nueva."""
+    if len(resultados) < 2:
+        return False
+    anterior, actual = resultados[-2]["intensidades"], resultados[-1]["intensidades"]
+    for storm_id, vmax in actual.items():
+        if storm_id not in anterior:
+            return True
+        if vmax is not None and anterior[storm_id] is not None and abs(vmax - anterior[storm_id]) >= umbral:
+            return True
+    return False
+
+
+def planificar(ahora, resultados=None):
+    """
+    Decide la próxima corrida según la actividad.
+    Devuelve (timestamp, motivo). Siempre es a lo más el intervalo regular.
+    """
+    resultados = ESTADO["resultados"] if resultados is None else resultados
+    candidatos = [(calcular_proxima(ahora, jitter=0), "intervalo regular")]
+
+    if resultados and resultados[-1]["tormentas"]:
+        candidatos.append((proximo_aviso_nhc(ahora), "aviso NHC"))
+        if intensidad_cambiando(resultados):
+            candidatos.append((ahora + INTERVALO_RAPIDO, "intensidad cambiando"))
+
+    proxima, motivo = min(candidatos)
+    if JITTER > 0:
+        proxima += random.uniform(0, JITTER)
+    return proxima, motivo
+
+
+def tarea_monitoreo():
+    """Corrida por defecto: schedule.py ya importado (módulos pesados en caliente)."""
+    from app.services import schedule
+
+    previa = ESTADO["resultados"][-1] if ESTADO["resultados"] else None
+    return schedule.ejecutar_monitoreo(omitir_si_vacio=previa is not None and not previa["tormentas"])
+
+
+def precargar():
+    """Importa de antemano los módulos pesados para que la primera corrida no pague el costo."""
+    inicio = time.perf_counter()
+    from app.services import schedule  # noqa: F401
+    from tropycal import realtime  # noqa: F401  (schedule.py lo importa recién en la primera corrida)
+
+    print(f"🔥 Módulos precargados en {time.perf_counter() - inicio:.2f}s")
+
+
+def registrar_corrida(registro):
+    """Guarda la corrida en memoria y la agrega al log JSONL."""
+    ESTADO["corridas"].append(registro)
+    try:
+        with open(RUNS_LOG, "ab") as f:
+            f.write(codec.dumps(registro) + b"\n")
+    except (OSError, TypeError, ValueError) as e:
+        print(f"⚠️ No se pudo escribir el log de corridas: {e}")
+
+
+def ejecutar_una_vez(tarea=None):
+    """
+    Ejecuta una corrida si no hay otra en curso.
+    Devuelve el registro de la corrida, o None si se omitió por traslape.
+    """
+    if not _LOCK.acquire(blocking=False):
+        ESTADO["omitidas"] += 1
+        print("⏭️  Corrida anterior aún en curso, se omite esta corrida.")
+        return None
+
+    tarea = tarea or tarea_monitoreo
+    inicio = time.time()
+    ESTADO["en_curso"] = True
+    ESTADO["inicio_corrida"] = inicio
+    guardar_estado()  # otros workers leen el archivo: que vean la corrida en curso
+    ok, error, resultado, perfil = True, None, None, None
+    try:
+        with profiler.capture("schedule.ejecutar_monitoreo", kind="scheduler", enabled=PERFILAR) as perfil:
+            resultado = tarea()
+    except Exception as e:
+        ok, error = False, str(e)
+        print(f"❌ Error en la corrida: {e}")
+        traceback.print_exc()
+    finally:
+        ESTADO["en_curso"] = False
+        ESTADO["inicio_corrida"] = None
+        _LOCK.release()
+
+    registro = {
+        "inicio": datetime.fromtimestamp(inicio).isoformat(timespec="seconds"),
+        "duracion": round(time.time() - inicio, 3),
+        "ok": ok,
+        "error": error,
+    }
+    if perfil is not None:
+        registro["perfil"] = perfil.id
+    if isinstance(resultado, dict):
+        ESTADO["resultados"].append(resultado)
+        registro["tormentas"] = len(resultado.get("tormentas", []))
+        registro["omitida"] = resultado.get("omitida", False)
+        registro["etapas"] = resultado.get("etapas", {})
+    registrar_corrida(registro)
+    guardar_estado()
+    print(f"⏱️  Corrida terminada en {registro['duracion']:.1f}s (ok={ok})")
+    return registro
+
+
+def resumen_duraciones():
+    """
+    Estadísticas de las últimas corridas, para decidir si se puede bajar el intervalo.
+    `intervalo_minimo_sugerido` deja 50% de margen sobre el p95.
+    """
+    duraciones = sorted(c["duracion"] for c in ESTADO["corridas"] if c["ok"])
+    if not duraciones:
+        return {"corridas": 0}
+    p95 = duraciones[min(len(duraciones) - 1, int(round(0.95 * (len(duraciones) - 1))))]
+    return {
+        "corridas": len(duraciones),
+        "ultima": ESTADO["corridas"][-1]["duracion"],
+        "p50": duraciones[len(duraciones) // 2],
+        "p95": p95,
+        "max": duraciones[-1],
+        "omitidas": ESTADO["omitidas"],
+        "intervalo_actual": INTERVALO,
+        "intervalo_minimo_sugerido": int(p95 * 1.5) + 1,
+    }
+
+
+def guardar_estado():
+    """Publica el estado del planificador (próxima corrida incluida) para que la API lo lea."""
+    proxima = ESTADO["proxima"]
+    estado = {
+        "proxima": datetime.fromtimestamp(proxima, timezone.utc).isoformat(timespec="seconds") if proxima else None,
+        "proxima_ts": proxima,
+        "motivo": ESTADO["motivo"],
+        "en_curso": ESTADO["en_curso"],
+        "inicio_corrida": (
+            datetime.fromtimestamp(ESTADO["inicio_corrida"], timezone.utc).isoformat(timespec="seconds")
+            if ESTADO["inicio_corrida"] else None
+        ),
+        "ultima_corrida": ESTADO["corridas"][-1] if ESTADO["corridas"] else None,
+        "tormentas_activas": ESTADO["resultados"][-1]["tormentas"] if ESTADO["resultados"] else None,
+        "duraciones": resumen_duraciones(),
+        "actualizado": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+    tmp = STATE_FILE + ".tmp"
+    try:
+        codec.dump(estado, tmp, indent=True)
+        os.replace(tmp, STATE_FILE)
+    except (OSError, TypeError, ValueError) as e:
+        print(f"⚠️ No se pudo guardar el estado del planificador: {e}")
+
+
+def recolectar_metricas():
+    """
+    Collector para /metrics (ver app/services/metrics.py): lee el archivo de estado,
+    que puede venir de otro proceso (monitor.sh), y publica la última corrida.
+    """
+    from app.services import metrics
+
+    try:
+        estado = codec.load(STATE_FILE)
+    except (OSError, ValueError):
+        return
+
+    if estado.get("proxima_ts"):
+        metrics.set_gauge(
+            "scheduler_next_run_timestamp_seconds", estado["proxima_ts"],
+            help="Unix time of the next planned scheduler run",
+        )
+    ultima = estado.get("ultima_corrida")
+    if not ultima:
+        return
+    metrics.set_gauge(
+        "scheduler_last_run_duration_seconds", ultima["duracion"],
+        help="Wall time of the last scheduler run",
+    )
+    metrics.set_gauge(
+        "scheduler_last_run_success", 1 if ultima["ok"] else 0,
+        help="1 if the last scheduler run finished without error",
+    )
+    for etapa, segundos in ultima.get("etapas", {}).items():
+        metrics.set_gauge(
+            "scheduler_last_run_stage_seconds", segundos, {"stage": etapa},
+            help="Per-stage wall time of the last scheduler run",
+        )
+
+
+async def bucle(tarea=None, detener=None, inmediata=False):
+    """
+    Bucle principal: espera hasta la próxima corrida y la ejecuta en un hilo
+    para no bloquear el event loop (matplotlib y tropycal son bloqueantes).
+    """
+    detener = detener or asyncio.Event()
+    if inmediata:
+        await asyncio.to_thread(ejecutar_una_vez, tarea)
+
+    while not detener.is_set():
+        proxima, motivo = planificar(time.time())
+        ESTADO["proxima"], ESTADO["motivo"] = proxima, motivo
+        guardar_estado()
+        print(f"⏳ Próxima corrida: {datetime.fromtimestamp(proxima):%Y-%m-%d %H:%M:%S} ({motivo})")
+        try:
+            await asyncio.wait_for(detener.wait(), timeout=max(0, proxima - time.time()))
+            break
+        except asyncio.TimeoutError:
+            pass
+        await asyncio.to_thread(ejecutar_una_vez, tarea)
+
+
+def iniciar_tarea(tarea=None):
+    """Arranca el planificador como tarea asyncio dentro de un event loop existente (modo embebido)."""
+    detener = asyncio.Event()
+    task = asyncio.create_task(bucle(tarea, detener))
+    return task, detener
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planificador residente de schedule.py")
+    parser.add_argument("--once", action="store_true", help="ejecutar una sola corrida y salir")
+    parser.add_argument("--now", action="store_true", help="ejecutar una corrida al arrancar")
+    args = parser.parse_args()
+
+    print("🌤️  Iniciando planificador residente...")
+    precargar()
+    if args.once:
+        ejecutar_una_vez()
+        return
+    try:
+        asyncio.run(bucle(inmediata=args.now))
+    except KeyboardInterrupt:
+        print("👋 Planificador detenido.")
+
+
+if __name__ == "__main__":
+    main()
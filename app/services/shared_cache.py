@@ -0,0 +1,252 @@
+"""
+Cross-process cache tier for multi-worker deployments.
+
+Each entry is one memory-mapped file in SHARED_CACHE_DIR (tmpfs at /dev/shm
+when available) with a fixed, versioned header:
+
+    magic "WSC1" | format u16 | generation u64 | written_at f64 | meta_len u32 | payload_len u64
+    meta (JSON: dtype, shape and caller metadata), padded to PAYLOAD_ALIGN
+    payload (raw NumPy array bytes)
+
+Writers build the file next to the target and publish it with os.replace, so
+readers never see a partial entry. Readers map the file read-only and get a
+NumPy view over the mapping (zero-copy); the mapping is reused until the file
+is replaced. Refreshes are serialized with an flock per entry: one worker
+rebuilds while the others keep serving the previous generation.
+
+The directory is RAM-backed, so its entries are kept under MAX_BYTES: each
+publish evicts the least recently written entries beyond that budget. Evicted
+entries are rebuilt on their next read like any other miss.
+"""
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process, every caller is the leader
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"WSC1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHQdIQ")
+PAYLOAD_ALIGN = 64
+
+
+def _default_dir():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return Path(base) / "weatherstorm-cache"
+
+
+SHARED_CACHE_DIR = Path(os.environ.get("SHARED_CACHE_DIR", _default_dir()))
+MAX_BYTES = int(os.environ.get("SHARED_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+_MAPPINGS = {}  # name -> (st_ino, st_mtime_ns, entry)
+_LOCAL = threading.Lock()
+
+
+def _path(name):
+    return SHARED_CACHE_DIR / f"{name}.bin"
+
+
+def _ensure_dir():
+    try:
+        SHARED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        return True
+    except OSError:
+        return False
+
+
+def publish(name, array, meta=None):
+    """Atomically replace entry `name` with `array` (and JSON-serializable `meta`)."""
+    if not _ensure_dir():
+        return None
+    array = np.ascontiguousarray(array)
+    previous = read(name)
+    generation = previous["generation"] + 1 if previous else 1
+    meta_bytes = json.dumps(
+        {"dtype": array.dtype.str, "shape": list(array.shape), "meta": meta or {}}
+    ).encode()
+    offset = HEADER.size + len(meta_bytes)
+    padding = -offset % PAYLOAD_ALIGN
+
+    # Unique per call: threads of one worker may rebuild the same entry at once
+    fd, tmp = tempfile.mkstemp(dir=SHARED_CACHE_DIR, prefix=f".{name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)  # mkstemp creates 0600; other workers may run as another user
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(MAGIC, FORMAT_VERSION, generation, time.time(), len(meta_bytes), array.nbytes))
+            f.write(meta_bytes)
+            f.write(b"\0" * padding)
+            f.write(array.tobytes())
+        os.replace(tmp, _path(name))
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    _enforce_budget(keep=_path(name))
+    return generation
+
+
+def _enforce_budget(keep):
+    """Unlink the oldest entries (never `keep`) until the directory fits in MAX_BYTES."""
+    entries = []
+    for path in SHARED_CACHE_DIR.glob("*.bin"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime_ns, st.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        try:
+            path.unlink()
+        except OSError:
+            continue
+        total -= size
+        logger.info(f"Evicted {path.name} from the shared cache ({size} bytes)")
+
+
+def _parse(buffer):
+    magic, version, generation, written_at, meta_len, payload_len = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    info = json.loads(bytes(buffer[HEADER.size:HEADER.size + meta_len]))
+    offset = HEADER.size + meta_len
+    offset += -offset % PAYLOAD_ALIGN
+    dtype = np.dtype(info["dtype"])
+    array = np.frombuffer(buffer, dtype=dtype, count=payload_len // dtype.itemsize, offset=offset)
+    return {
+        "generation": generation,
+        "written_at": written_at,
+        "meta": info["meta"],
+        "array": array.reshape(info["shape"]),
+    }
+
+
+def read(name):
+    """
+    Current entry as {"generation", "written_at", "meta", "array"}, or None.
+    The array is a read-only view over the shared mapping.
+    """
+    path = _path(name)
+    try:
+        st = os.stat(path)
+    except OSError:
+        with _LOCAL:
+            _MAPPINGS.pop(name, None)  # evicted: let the old mapping go
+        return None
+
+    with _LOCAL:
+        cached = _MAPPINGS.get(name)
+        if cached and cached[0] == st.st_ino and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        try:
+            with open(path, "rb") as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            entry = _parse(buffer)
+        except (OSError, ValueError, struct.error):
+            return None
+        # Arrays handed out earlier keep the old mapping alive until they are released
+        _MAPPINGS[name] = (st.st_ino, st.st_mtime_ns, entry)
+        return entry
+
+
+@contextmanager
+def refresh_lock(name, blocking=False):
+    """flock on `name`: yields True in the process that got it, False otherwise."""
+    if fcntl is None or not _ensure_dir():
+        yield True
+        return
+    with open(SHARED_CACHE_DIR / f"{name}.lock", "a+") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def hold_lock(name):
+    """Take `name` for the life of the process (leader election). Returns the handle or None."""
+    if fcntl is None or not _ensure_dir():
+        return True
+    f = open(SHARED_CACHE_DIR / f"{name}.lock", "a+")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        return None
+    return f
+
+
+def _usable(entry, max_age, valid):
+    if entry is None or (valid is not None and not valid(entry)):
+        return False
+    return max_age is None or time.time() - entry["written_at"] < max_age
+
+
+def get_or_build(name, build, max_age=None, valid=None, serve_stale=True):
+    """
+    Shared entry `name`, rebuilt by a single process when missing, older than
+    `max_age` seconds or rejected by `valid(entry)`.
+
+    `build()` returns (array, meta). While one worker rebuilds, the others
+    return the expired entry if `serve_stale` (and it still passes `valid`),
+    or wait for the rebuild otherwise. With `serve_stale`, a failed rebuild
+    also falls back to the expired entry, returned with "stale": True.
+    """
+    entry = read(name)
+    if _usable(entry, max_age, valid):
+        return entry
+
+    with refresh_lock(name) as leader:
+        if leader:
+            # Another worker may have refreshed while we were checking
+            entry = read(name)
+            if _usable(entry, max_age, valid):
+                return entry
+            try:
+                array, meta = build()
+            except Exception as e:
+                if serve_stale and entry is not None and (valid is None or valid(entry)):
+                    logger.warning(f"Refresh of {name} failed, serving the previous entry: {e}")
+                    return {**entry, "stale": True}
+                raise
+            generation = publish(name, array, meta)
+            # read() is None if the file is already gone (evicted by _enforce_budget, for example)
+            entry = read(name) if generation is not None else None
+            if entry is None:
+                return {"generation": generation or 0, "written_at": time.time(), "meta": meta or {}, "array": array}
+            return entry
+
+    if serve_stale and entry is not None and (valid is None or valid(entry)):
+        return entry
+
+    with refresh_lock(name, blocking=True):
+        entry = read(name)
+    if entry is not None and (valid is None or valid(entry)):
+        return entry
+    # The leader failed: build locally rather than erroring out
+    array, meta = build()
+    return {"generation": 0, "written_at": time.time(), "meta": meta or {}, "array": array}
@@ -0,0 +1,224 @@
+"""
+Codificación compacta de tormentas (tropycal Storm -> dict JSON).
+
+El formato legado guarda series completas como listas JSON (p.ej. `storm_type`
+con decenas de "DB"/"TS" repetidos). Aquí:
+    - las series categóricas se guardan con run-length encoding,
+    - las series numéricas como arreglos tipados (dtype + bytes en base64),
+    - los tiempos como epoch base + deltas en segundos,
+    - el resumen (último vmax/mslp, categoría, ACE) se calcula vectorizado con NumPy.
+"""
+import base64
+from datetime import datetime, timezone
+
+import numpy as np
+
+VERSION_COMPACTA = 1
+
+# Umbrales Saffir-Simpson en nudos: <34 DT, <64 TT, luego categorías 1-5
+UMBRALES_SAFFIR_SIMPSON = np.array([34, 64, 83, 96, 113, 137])
+TIPOS_TROPICALES = ("TS", "HU", "SS", "TD", "SD")
+TIPOS_ACE = ("TS", "HU", "SS")
+
+
+# ==============================
+# CODIFICADORES DE SERIES
+# ==============================
+def rle(valores):
+    """Run-length encoding: ["DB","DB","TS"] -> {"valores": ["DB","TS"], "longitudes": [2, 1]}."""
+    a = np.asarray(valores)
+    if a.size == 0:
+        return {"valores": [], "longitudes": []}
+    inicios = np.concatenate(([0], np.flatnonzero(a[1:] != a[:-1]) + 1))
+    longitudes = np.diff(np.concatenate((inicios, [a.size])))
+    return {"valores": a[inicios].tolist(), "longitudes": longitudes.tolist()}
+
+
+def rle_decode(codificado):
+    """Inverso de rle()."""
+    return np.repeat(np.asarray(codificado["valores"]), codificado["longitudes"])
+
+
+def arreglo_tipado(valores):
+    """
+    Serie numérica -> {"dtype", "b64"} en little-endian.
+    Usa int16 si todos los valores son enteros finitos (vmax, mslp), si no float32.
+    """
+    a = np.asarray(valores, dtype=np.float64)
+    if a.size and np.all(np.isfinite(a)) and np.all(a == np.round(a)) and np.abs(a).max() < 32768:
+        a = a.astype("<i2")
+    else:
+        a = a.astype("<f4")
+    return {"dtype": a.dtype.str, "b64": base64.b64encode(a.tobytes()).decode("ascii")}
+
+
+def arreglo_tipado_decode(codificado):
+    """Inverso de arreglo_tipado()."""
+    return np.frombuffer(base64.b64decode(codificado["b64"]), dtype=np.dtype(codificado["dtype"]))
+
+
+def tiempos_a_epoch(tiempos):
+    """Lista de datetime -> segundos epoch (int64). Fechas sin zona se asumen UTC como en tropycal."""
+    return np.array(
+        [
+            int((t if t.tzinfo else t.replace(tzinfo=timezone.utc)).timestamp())
+            for t in tiempos
+        ],
+        dtype=np.int64,
+    )
+
+
+def codificar_tiempos(tiempos):
+    """Tiempos -> {"inicio": epoch, "deltas": arreglo tipado int32 en segundos}."""
+    epoch = tiempos_a_epoch(tiempos)
+    if epoch.size == 0:
+        return {"inicio": None, "deltas": {"dtype": "<i4", "b64": ""}}
+    deltas = (epoch - epoch[0]).astype("<i4")
+    return {
+        "inicio": int(epoch[0]),
+        "deltas": {"dtype": deltas.dtype.str, "b64": base64.b64encode(deltas.tobytes()).decode("ascii")},
+    }
+
+
+def decodificar_tiempos(codificado):
+    """Inverso de codificar_tiempos(): segundos epoch (int64)."""
+    if codificado["inicio"] is None:
+        return np.array([], dtype=np.int64)
+    return codificado["inicio"] + arreglo_tipado_decode(codificado["deltas"]).astype(np.int64)
+
+
+# ==============================
+# RESUMEN VECTORIZADO
+# ==============================
+def serie(storm, clave):
+    """
+    Devuelve una serie por observación de la tormenta como arreglo NumPy.
+    tropycal guarda las series en storm.vars (y storm.dict); storm.attrs solo
+    tiene los escalares, por eso el formato legado sacaba max_wind/start_time en null.
+    """
+    valores = getattr(storm, "vars", {}).get(clave)
+    if valores is None:
+        valores = getattr(storm, "dict", {}).get(clave)
+    if valores is None:
+        return np.array([])
+    return np.asarray(valores)
+
+
+def categoria_saffir_simpson(vmax):
+    """Vectorizado: -1 depresión, 0 tormenta tropical, 1-5 categoría de huracán (-2 sin dato)."""
+    vmax = np.asarray(vmax, dtype=np.float64)
+    categorias = np.searchsorted(UMBRALES_SAFFIR_SIMPSON, vmax, side="right").astype(np.int64) - 1
+    categorias[categorias > 5] = 5
+    return np.where(np.isnan(vmax), -2, categorias)
+
+
+def calcular_ace(vmax, tipos, epoch):
+    """
+    ACE = 1e-4 * suma(vmax^2) en horas sinópticas (00/06/12/18 UTC) con vmax >= 34 kt
+    y tipo tropical/subtropical.
+    """
+    vmax = np.asarray(vmax, dtype=np.float64)
+    if vmax.size == 0:
+        return 0.0
+    segundos_del_dia = np.asarray(epoch) % 86400
+    sinoptica = segundos_del_dia % (6 * 3600) == 0
+    mascara = sinoptica & (vmax >= 34) & np.isin(np.asarray(tipos), TIPOS_ACE)
+    return round(float(np.sum(vmax[mascara] ** 2) * 1e-4), 4)
+
+
+def _ultimo_valido(a):
+    a = np.asarray(a, dtype=np.float64)
+    validos = a[np.isfinite(a)]
+    return float(validos[-1]) if validos.size else None
+
+
+def _maximo_valido(a):
+    a = np.asarray(a, dtype=np.float64)
+    return float(np.nanmax(a)) if np.isfinite(a).any() else None
+
+
+def _minimo_valido(a):
+    a = np.asarray(a, dtype=np.float64)
+    return float(np.nanmin(a)) if np.isfinite(a).any() else None
+
+
+def resumen_tormenta(storm):
+    """Estadísticas de la tormenta calculadas sobre las series completas."""
+    tiempos = serie(storm, "time")
+    vmax = serie(storm, "vmax").astype(np.float64)
+    mslp = serie(storm, "mslp").astype(np.float64)
+    tipos = serie(storm, "type")
+    epoch = tiempos_a_epoch(tiempos) if tiempos.size else np.array([], dtype=np.int64)
+
+    ultimo_vmax = _ultimo_valido(vmax)
+    categoria = None
+    if ultimo_vmax is not None:
+        categoria = int(categoria_saffir_simpson([ultimo_vmax])[0])
+        # Solo los sistemas tropicales tienen categoría Saffir-Simpson
+        if tipos.size and str(tipos[-1]) not in TIPOS_TROPICALES:
+            categoria = None
+
+    ace = getattr(storm, "ace", None)
+    if ace is None:
+        ace = calcular_ace(vmax, tipos, epoch)
+
+    return {
+        "max_wind": ultimo_vmax,
+        "min_pressure": _ultimo_valido(mslp),
+        "peak_wind": _maximo_valido(vmax),
+        "lowest_pressure": _minimo_valido(mslp),
+        "category": categoria,
+        "current_type": str(tipos[-1]) if tipos.size else None,
+        "ace": ace,
+        "start_time": datetime.fromtimestamp(epoch[0], timezone.utc).isoformat() if epoch.size else None,
+        "end_time": datetime.fromtimestamp(epoch[-1], timezone.utc).isoformat() if epoch.size else None,
+        "observations": int(epoch.size),
+    }
+
+
+# ==============================
+# REGISTRO COMPACTO
+# ==============================
+def codificar_tormenta(storm, extra=None):
+    """
+    Tormenta -> registro compacto (versión VERSION_COMPACTA).
+    `extra` permite agregar campos como date/zona_horaria igual que el formato legado.
+    """
+    series = {"time": codificar_tiempos(serie(storm, "time"))}
+    for clave in ("lat", "lon", "vmax", "mslp"):
+        valores = serie(storm, clave)
+        if valores.size:
+            series[clave] = arreglo_tipado(valores)
+    for clave in ("type", "special", "wmo_basin"):
+        valores = serie(storm, clave)
+        if valores.size:
+            series[clave] = rle(valores.astype(str))
+
+    registro = {
+        "v": VERSION_COMPACTA,
+        "id": storm.id,
+        "name": storm.name,
+        "year": storm.year,
+        "season": getattr(storm, "season", None),
+        "basin": getattr(storm, "basin", None),
+        "invest": getattr(storm, "invest", None),
+        "source": getattr(storm, "source_info", None),
+        "resumen": resumen_tormenta(storm),
+        "series": series,
+    }
+    if extra:
+        registro.update(extra)
+    return registro
+
+
+def decodificar_series(registro):
+    """Registro compacto -> dict de arreglos NumPy (time en epoch)."""
+    series = {}
+    for clave, codificado in registro["series"].items():
+        if clave == "time":
+            series[clave] = decodificar_tiempos(codificado)
+        elif "longitudes" in codificado:
+            series[clave] = rle_decode(codificado)
+        else:
+            series[clave] = arreglo_tipado_decode(codificado)
+    return series
@@ -0,0 +1,39 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+# Directorio base del proyecto y carpeta de datos compartida por rutas y scheduler
+BASE_DIR = Path(__file__).parent.parent.parent
+DATA_DIR = Path(os.environ.get("DATA_DIR", BASE_DIR / "Data" / "Data"))
+
+
+def env_bool(nombre, default=False):
+    """Lee una variable de entorno tipo bandera (1/true/yes/on)."""
+    valor = os.environ.get(nombre)
+    if valor is None:
+        return default
+    return valor.strip().lower() in ("1", "true", "yes", "on")
+
+
+# Publicación atómica de snapshots (ver schedule.py): cada corrida se escribe en
+# DATA_DIR/.staging_<timestamp> y se renombra al final; el marcador indica que
+# el snapshot está completo y contiene el manifiesto de archivos.
+MARCADOR_COMPLETO = "_COMPLETE"
+PREFIJO_STAGING = ".staging_"
+
+
+RADIO_TIERRA_KM = 6371
+
+
+def haversine(lat1, lon1, lats2, lons2):
+    """
+    Distancia en km, vectorizada con broadcasting de NumPy: con lat1 de forma
+    (P, 1) y lats2 de forma (1, C) devuelve la matriz (P, C) en una sola operación.
+    """
+    lat1, lon1, lats2, lons2 = map(np.radians, [lat1, lon1, lats2, lons2])
+    a = (
+        np.sin((lats2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lats2) * np.sin((lons2 - lon1) / 2) ** 2
+    )
+    return RADIO_TIERRA_KM * 2 * np.arcsin(np.sqrt(a))
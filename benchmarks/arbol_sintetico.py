@@ -0,0 +1,149 @@
+"""
+Genera un árbol Data/Data sintético con la misma estructura que schedule.py:
+
+    <destino>/YYYYMMDD_HHMMSS/
+        JSON/tormentas<ts>.json, JSON/tormenta_<id>.json
+        Compacto/tormenta_<id>.json
+        Mapas/mapa_<ts>.png, Mapas/<id>.png
+        Exposicion/tormenta_<id>.json, Exposicion/ciudades.json
+        GeoJSON/tormenta_<id>.json
+        _COMPLETE
+
+Uso:
+    python -m benchmarks.arbol_sintetico --destino /tmp/bench_data --snapshots 10000
+"""
+import argparse
+import io
+import json
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from PIL import Image
+
+from app.services.exposicion import CARPETA_EXPOSICION, EXPOSICION_RADIO_KM, calcular_exposicion
+from app.services.geojson_tormentas import CARPETA_GEOJSON, codificar_geojson
+from app.services.utils import MARCADOR_COMPLETO
+
+TIPOS = ["DB", "TD", "TS", "HU"]
+NOMBRES = ["MELISSA", "NESTOR", "OLGA", "PABLO", "REBEKAH", "SEBASTIEN"]
+
+
+def png_minimo(ancho=64, alto=48, semilla=0):
+    """PNG pequeño para que FileResponse tenga algo que servir sin inflar el disco."""
+    rng = np.random.default_rng(semilla)
+    pixeles = rng.integers(0, 255, (alto, ancho, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixeles).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def registro_tormenta(storm_id, nombre, fecha, observaciones, rng):
+    """Registro legado con series del tamaño de una tormenta real (p.ej. storm_type repetido)."""
+    cortes = np.sort(rng.integers(1, observaciones, 3))
+    tipos = np.repeat(TIPOS, np.diff(np.concatenate(([0], cortes, [observaciones]))))
+    return {
+        "id": storm_id,
+        "name": nombre,
+        "year": fecha.year,
+        "date": str(fecha),
+        "zona_horaria": "America/Mexico_City",
+        "season": fecha.year,
+        "basin": "north_atlantic" if storm_id.startswith("AL") else "east_pacific",
+        "max_wind": float(rng.integers(25, 150)),
+        "min_pressure": float(rng.integers(920, 1010)),
+        "ace": round(float(rng.uniform(0, 40)), 4),
+        "invest": False,
+        "start_time": str(fecha - timedelta(hours=6 * observaciones)),
+        "end_time": str(fecha),
+        "category": int(rng.integers(-1, 6)),
+        "storm_type": tipos.tolist(),
+        "source": "NHC Hurricane Database",
+    }
+
+
+def puntos_sinteticos(storm_id, nombre, observaciones, rng):
+    """Trayectoria recta hacia la costa de México + 5 puntos de pronóstico (formato de puntos_tormenta())."""
+    pacifico = storm_id.startswith("EP")
+    inicio = np.array([14.0, -108.0]) if pacifico else np.array([18.0, -80.0])
+    paso = np.array([0.15, 0.12]) if pacifico else np.array([0.05, -0.25])
+    total = observaciones + 5
+    ruta = inicio + np.outer(np.arange(total), paso) + rng.normal(0, 0.05, (total, 2))
+    return {
+        "id": storm_id,
+        "name": nombre,
+        "cuenca": "east_pacific" if pacifico else "north_atlantic",
+        "lat": ruta[:, 0],
+        "lon": ruta[:, 1],
+        "vmax": rng.uniform(30, 120, total),
+        "fhr": np.concatenate([np.full(observaciones, np.nan), [12, 24, 36, 48, 72]]),
+        "es_pronostico": np.arange(total) >= observaciones,
+    }
+
+
+def generar(destino, snapshots=1000, tormentas=3, observaciones=40, inicio=None, semilla=0):
+    """Crea `snapshots` directorios, uno por hora hacia atrás desde `inicio`. Devuelve los nombres."""
+    rng = np.random.default_rng(semilla)
+    inicio = inicio or datetime(2025, 11, 3, 12, 0, 0)
+    png_general, png_tormenta = png_minimo(semilla=1), png_minimo(semilla=2)
+    ids = [f"{'AL' if i % 2 == 0 else 'EP'}{13 + i:02d}2025" for i in range(tormentas)]
+    nombres = []
+
+    # La exposición y el GeoJSON no dependen del snapshot: se calculan una vez y se copian en todos
+    puntos = [puntos_sinteticos(storm_id, NOMBRES[i % len(NOMBRES)], observaciones, rng) for i, storm_id in enumerate(ids)]
+    por_tormenta, por_ciudad = calcular_exposicion(puntos)
+    geojson = {p["id"]: json.dumps(codificar_geojson(p), separators=(",", ":")) for p in puntos}
+
+    os.makedirs(destino, exist_ok=True)
+    for n in range(snapshots):
+        fecha = inicio - timedelta(hours=n)
+        sello = f"{fecha:%Y%m%d_%H%M%S}"
+        directorio = os.path.join(destino, sello)
+        for sub in ("JSON", "Mapas", "Compacto", CARPETA_EXPOSICION, CARPETA_GEOJSON):
+            os.makedirs(os.path.join(directorio, sub), exist_ok=True)
+
+        general = {}
+        for i, storm_id in enumerate(ids):
+            registro = registro_tormenta(storm_id, NOMBRES[i % len(NOMBRES)], fecha, observaciones, rng)
+            general[i] = registro
+            with open(os.path.join(directorio, "JSON", f"tormenta_{storm_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(registro, f, indent=4, ensure_ascii=False)
+            with open(os.path.join(directorio, "Mapas", f"{storm_id}.png"), "wb") as f:
+                f.write(png_tormenta)
+
+        with open(os.path.join(directorio, "JSON", f"tormentas{sello}.json"), "w", encoding="utf-8") as f:
+            json.dump(general, f, indent=4, ensure_ascii=False)
+        with open(os.path.join(directorio, "Mapas", f"mapa_{sello}.png"), "wb") as f:
+            f.write(png_general)
+        for storm_id in ids:
+            with open(os.path.join(directorio, CARPETA_EXPOSICION, f"tormenta_{storm_id}.json"), "w", encoding="utf-8") as f:
+                json.dump(
+                    {"storm_id": storm_id, "radius_km": EXPOSICION_RADIO_KM, "cities": por_tormenta.get(storm_id, [])},
+                    f, separators=(",", ":"), ensure_ascii=False,
+                )
+        with open(os.path.join(directorio, CARPETA_EXPOSICION, "ciudades.json"), "w", encoding="utf-8") as f:
+            json.dump(por_ciudad, f, separators=(",", ":"), ensure_ascii=False)
+        for storm_id, texto in geojson.items():
+            with open(os.path.join(directorio, CARPETA_GEOJSON, f"tormenta_{storm_id}.json"), "w", encoding="utf-8") as f:
+                f.write(texto)
+        with open(os.path.join(directorio, MARCADOR_COMPLETO), "w", encoding="utf-8") as f:
+            json.dump({"snapshot": sello, "tormentas": ids, "sintetico": True}, f)
+        nombres.append(sello)
+
+    return {"destino": destino, "snapshots": nombres, "tormentas": ids}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera un árbol Data/Data sintético")
+    parser.add_argument("--destino", required=True)
+    parser.add_argument("--snapshots", type=int, default=1000)
+    parser.add_argument("--tormentas", type=int, default=3)
+    parser.add_argument("--observaciones", type=int, default=40)
+    args = parser.parse_args()
+
+    info = generar(args.destino, args.snapshots, args.tormentas, args.observaciones)
+    print(f"✅ {len(info['snapshots'])} snapshots generados en {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
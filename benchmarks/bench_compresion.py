@@ -0,0 +1,108 @@
+"""
+Bytes y CPU por petición de las respuestas JSON, sin y con compresión.
+
+Para cada ruta pide el mismo recurso con `Accept-Encoding: identity` y con
+`gzip` (y `br`/`zstd` si se piden), y reporta:
+- bytes_por_peticion: tamaño del cuerpo tal como sale por la red (Content-Length)
+- cpu_ms_por_peticion: tiempo de CPU del proceso (servidor + TestClient) por
+  petición, ya con la primera petición (la que comprime) fuera de la medición
+- primera_ms: latencia de la primera petición de cada codificación
+
+Corre igual contra commits sin negociación de compresión, así que sirve para
+comparar antes/después.
+
+Uso:
+    python -m benchmarks.bench_compresion --peticiones 200 --salida compresion.json
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+RUTAS = [
+    "/api/storms",
+    "/api/storms/{storm_id}",
+    "/api/date/{date}/storms",
+    "/api/date/{date}/storms/{storm_id}",
+    "/api/storms/{storm_id}/exposure?radius_km=500",
+    "/rainmap/realtime?grid_size=5&density=50",
+]
+
+
+def medir(cliente, url, codificacion, peticiones):
+    headers = {"Accept-Encoding": codificacion}
+    t0 = time.perf_counter()
+    r = cliente.get(url, headers=headers)
+    primera = time.perf_counter() - t0
+    cpu0 = time.process_time()
+    for _ in range(peticiones):
+        r = cliente.get(url, headers=headers)
+    cpu = time.process_time() - cpu0
+    return {
+        "estado": r.status_code,
+        "content_encoding": r.headers.get("content-encoding", "identity"),
+        "bytes_por_peticion": int(r.headers.get("content-length", len(r.content))),
+        "cpu_ms_por_peticion": round(cpu / peticiones * 1000, 3),
+        "primera_ms": round(primera * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de compresión de respuestas")
+    parser.add_argument("--snapshots", type=int, default=50)
+    parser.add_argument("--tormentas", type=int, default=3)
+    parser.add_argument("--observaciones", type=int, default=120)
+    parser.add_argument("--peticiones", type=int, default=200)
+    parser.add_argument("--codificaciones", default="identity,gzip")
+    parser.add_argument("--salida", help="archivo JSON del reporte (por defecto, stdout)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    data_dir = os.path.join(tmp.name, "Data", "Data")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ.setdefault("SCHEDULER_STATE", os.path.join(tmp.name, "scheduler_state.json"))
+    os.environ.setdefault("SHARED_CACHE_DIR", os.path.join(tmp.name, "cache"))
+    os.environ.setdefault("RAINMAP_HISTORY_DIR", os.path.join(tmp.name, "history"))
+
+    from benchmarks import arbol_sintetico, stub_openmeteo
+
+    info = arbol_sintetico.generar(data_dir, args.snapshots, args.tormentas, args.observaciones)
+    servidor, url_stub, _ = stub_openmeteo.iniciar(latencia=0.001, jitter=0.0)
+    os.environ["OPEN_METEO_URL"] = url_stub
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    valores = {"storm_id": info["tormentas"][0], "date": max(info["snapshots"])[:8]}
+    resultados = []
+    with TestClient(app) as cliente:
+        cliente.get("/api/storms")  # índice de snapshots construido antes de medir
+        for ruta in RUTAS:
+            url = ruta.format(**valores)
+            for codificacion in args.codificaciones.split(","):
+                r = {"ruta": ruta, "pedida": codificacion, **medir(cliente, url, codificacion, args.peticiones)}
+                resultados.append(r)
+                print(
+                    f"{ruta:<48} {codificacion:<9} -> {r['content_encoding']:<9} "
+                    f"{r['bytes_por_peticion']:>8} B  {r['cpu_ms_por_peticion']:>7.3f} ms CPU  "
+                    f"primera {r['primera_ms']:>7.2f} ms",
+                    file=sys.stderr,
+                )
+    servidor.shutdown()
+    tmp.cleanup()
+
+    texto = json.dumps(
+        {"benchmark": "compresion", "peticiones": args.peticiones, "resultados": resultados},
+        indent=2, ensure_ascii=False,
+    )
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
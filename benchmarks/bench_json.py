@@ -0,0 +1,158 @@
+"""
+Benchmark de la codificación JSON (app/services/codec.py) en las rutas que
+leen snapshots.
+
+Las respuestas de un snapshot publicado se construyen una vez y quedan en el
+cache de compression.py. Por eso se mide la primera petición, la que lee los
+archivos, los decodifica y vuelve a codificar el cuerpo: antes de cada
+petición se vacía ese cache. /api/date/{date}/storms es la más cara porque
+junta todos los JSON/ del snapshot en un solo cuerpo. Las rutas de rainmap
+(contra el stub de Open-Meteo) miden cuerpos grandes construidos con NumPy.
+
+También mide, fuera de la app, decodificar y codificar el cuerpo de esa ruta
+con json de la biblioteca estándar y con codec (si existe en el commit).
+
+Corre igual contra commits sin codec.py, así que sirve para comparar antes/después.
+Con --compacto los JSON/ del árbol sintético se reescriben sin indentar, como
+los escribe ahora el scheduler.
+
+Uso:
+    python -m benchmarks.bench_json --peticiones 50 --compacto --salida json.json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RUTAS = [
+    "/api/date/{date}/storms",
+    "/api/date/{date}/storms/{storm_id}",
+    "/api/storms",
+    "/api/storms/{storm_id}",
+    # Cuerpos grandes: la rejilla interpolada queda en el cache compartido, solo se mide la codificación
+    "/rainmap/realtime?grid_size=5&density=100",
+    "/rainmap/forecast?grid_size=5&density=50&hours=24",
+]
+
+
+def compactar(data_dir):
+    """Reescribe JSON/*.json sin indentar (los hermanos .gz/.br/.zst no existen en el árbol sintético)."""
+    for ruta in Path(data_dir).glob("*/JSON/*.json"):
+        datos = json.loads(ruta.read_text(encoding="utf-8"))
+        ruta.write_text(json.dumps(datos, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+
+def medir_ruta(cliente, url, peticiones, compression):
+    """Milisegundos por petición sin cache de respuestas (cada una lee y codifica de nuevo)."""
+    tiempos = []
+    for _ in range(peticiones):
+        compression._CACHE.clear()
+        compression._CACHE_BYTES[0] = 0
+        t0 = time.perf_counter()
+        r = cliente.get(url, headers={"Accept-Encoding": "identity"})
+        tiempos.append((time.perf_counter() - t0) * 1000)
+    return {
+        "estado": r.status_code,
+        "bytes": len(r.content),
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "min_ms": round(min(tiempos), 3),
+    }
+
+
+def medir_codificacion(cuerpo, repeticiones):
+    """Decodificar + codificar el cuerpo de /api/date/{date}/storms: stdlib contra codec."""
+    def mediana(funcion):
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - t0) * 1000)
+        return round(statistics.median(tiempos), 3)
+
+    objeto = json.loads(cuerpo)
+    resultado = {
+        "bytes": len(cuerpo),
+        "stdlib_loads_ms": mediana(lambda: json.loads(cuerpo)),
+        "stdlib_dumps_ms": mediana(
+            lambda: json.dumps(objeto, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+        ),
+    }
+    try:
+        from app.services import codec
+    except ImportError:
+        return resultado  # commit anterior a codec.py
+    resultado["orjson"] = codec.orjson is not None
+    resultado["codec_loads_ms"] = mediana(lambda: codec.loads(cuerpo))
+    resultado["codec_dumps_ms"] = mediana(lambda: codec.dumps(objeto))
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de codificación JSON")
+    parser.add_argument("--snapshots", type=int, default=24)
+    parser.add_argument("--tormentas", type=int, default=3)
+    parser.add_argument("--observaciones", type=int, default=120)
+    parser.add_argument("--peticiones", type=int, default=50, help="peticiones por ruta")
+    parser.add_argument("--compacto", action="store_true", help="JSON/ sin indentar, como los escribe el scheduler")
+    parser.add_argument("--salida", help="archivo JSON del reporte (por defecto, stdout)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    data_dir = os.path.join(tmp.name, "Data", "Data")
+    os.environ["DATA_DIR"] = data_dir
+    os.environ.setdefault("SCHEDULER_STATE", os.path.join(tmp.name, "scheduler_state.json"))
+    os.environ.setdefault("SHARED_CACHE_DIR", os.path.join(tmp.name, "cache"))
+    os.environ.setdefault("RAINMAP_HISTORY_DIR", os.path.join(tmp.name, "history"))
+
+    from benchmarks import arbol_sintetico, stub_openmeteo
+
+    info = arbol_sintetico.generar(data_dir, args.snapshots, args.tormentas, args.observaciones)
+    if args.compacto:
+        compactar(data_dir)
+    servidor, url_stub, _ = stub_openmeteo.iniciar(latencia=0.001, jitter=0.0)
+    os.environ["OPEN_METEO_URL"] = url_stub
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import compression
+
+    valores = {"storm_id": info["tormentas"][0], "date": max(info["snapshots"])[:8]}
+    resultados = []
+    with TestClient(app) as cliente:
+        cliente.get("/api/storms")  # índice de snapshots construido antes de medir
+        for ruta in RUTAS:
+            cliente.get(ruta.format(**valores))  # rejillas de rainmap en el cache compartido
+        for ruta in RUTAS:
+            url = ruta.format(**valores)
+            r = {"ruta": ruta, **medir_ruta(cliente, url, args.peticiones, compression)}
+            resultados.append(r)
+            print(f"{ruta:<52} {r['bytes']:>9} B  p50 {r['p50_ms']:>8.3f} ms  min {r['min_ms']:>8.3f} ms", file=sys.stderr)
+        cuerpo = cliente.get(RUTAS[0].format(**valores), headers={"Accept-Encoding": "identity"}).content
+    codificacion = medir_codificacion(cuerpo, args.peticiones)
+    print(f"cuerpo de {RUTAS[0]}: {codificacion}", file=sys.stderr)
+    servidor.shutdown()
+    tmp.cleanup()
+
+    texto = json.dumps(
+        {
+            "benchmark": "json",
+            "compacto": args.compacto,
+            "peticiones": args.peticiones,
+            "rutas": resultados,
+            "codificacion": codificacion,
+        },
+        indent=2, ensure_ascii=False,
+    )
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
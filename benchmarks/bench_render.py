@@ -0,0 +1,92 @@
+"""
+Benchmark de perfiles de render (app/services/render.py).
+
+Dibuja una figura sintética parecida a un mapa de tropycal (relleno, costas,
+trayectoria, cono, textos y leyenda) y la guarda con cada perfil.
+Reporta segundos por mapa y bytes por mapa.
+
+Uso:
+    python -m benchmarks.bench_render --repeticiones 5 --salida render.json
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from app.services import render
+import matplotlib.pyplot as plt
+import numpy as np
+
+
+def figura_sintetica(semilla=0):
+    """Figura de tamaño y densidad similares a plot_forecast_realtime()."""
+    rng = np.random.default_rng(semilla)
+    fig, ax = plt.subplots(figsize=(9, 6))
+    lon = np.linspace(-110, -60, 400)
+    lat = np.linspace(5, 40, 300)
+    campo = np.sin(lon[None, :] / 7) * np.cos(lat[:, None] / 5) + rng.normal(0, 0.05, (300, 400))
+    ax.contourf(lon, lat, campo, levels=12, cmap="Blues", alpha=0.6)
+    for _ in range(40):  # "costas"
+        x = np.cumsum(rng.normal(0, 0.3, 200)) - 90
+        y = np.cumsum(rng.normal(0, 0.3, 200)) + 20
+        ax.plot(x, y, color="gray", linewidth=0.5)
+    pista_lon = np.linspace(-75, -95, 30)
+    pista_lat = 15 + np.sqrt(np.arange(30))
+    ax.plot(pista_lon, pista_lat, "k-", linewidth=2, label="Trayectoria")
+    ax.scatter(pista_lon, pista_lat, c=np.linspace(30, 140, 30), cmap="YlOrRd", s=40, zorder=3)
+    ax.fill_between(pista_lon, pista_lat - np.linspace(0.2, 3, 30), pista_lat + np.linspace(0.2, 3, 30),
+                    color="white", alpha=0.4, label="Cono")
+    for i in range(0, 30, 4):
+        ax.annotate(f"{i * 6}h", (pista_lon[i], pista_lat[i]), fontsize=7)
+    ax.set_title("Hurricane MELISSA\nForecast Track", loc="left")
+    ax.set_title("NHC Issued 2025-10-28 1500 UTC", loc="right", fontsize=8)
+    ax.legend(loc="upper left")
+    ax.set_xlim(-110, -60)
+    ax.set_ylim(5, 40)
+    return fig
+
+
+def medir_perfil(perfil, repeticiones, carpeta):
+    tiempos, tamanos = [], []
+    for i in range(repeticiones):
+        fig = figura_sintetica(i)
+        ruta = render.ruta_para_perfil(os.path.join(carpeta, f"mapa_{i}.png"), perfil)
+        inicio = time.perf_counter()
+        tamanos.append(render.guardar_figura(fig, ruta, perfil))
+        tiempos.append(time.perf_counter() - inicio)
+        plt.close(fig)
+    return {
+        "perfil": perfil,
+        "dpi": render.PERFILES[perfil]["dpi"],
+        "formato": render.PERFILES[perfil]["formato"],
+        "segundos_por_mapa": round(float(np.median(tiempos)), 4),
+        "bytes_por_mapa": int(np.median(tamanos)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de perfiles de render")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--perfiles", default=",".join(render.PERFILES))
+    parser.add_argument("--salida", help="archivo JSON con el reporte")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        figura_sintetica().canvas.draw()  # calentar caché de fuentes
+        plt.close("all")
+        resultados = [
+            medir_perfil(perfil, args.repeticiones, carpeta) for perfil in args.perfiles.split(",")
+        ]
+
+    print(f"{'perfil':<10} {'dpi':>4} {'formato':>7} {'s/mapa':>8} {'KB/mapa':>8}")
+    for r in resultados:
+        print(f"{r['perfil']:<10} {r['dpi']:>4} {r['formato']:>7} {r['segundos_por_mapa']:>8.3f} {r['bytes_por_mapa'] / 1024:>8.1f}")
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "render", "resultados": resultados}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+Benchmark de la corrida de schedule.py con tormentas grabadas, sin red.
+
+Reproduce ejecutar_monitoreo() con una fuente de datos que lee un fixture JSON
+(series de cada tormenta + su pronóstico) en lugar de tropycal/NHC, y reporta
+por etapa la mediana de segundos y el pico de memoria (tracemalloc):
+mapa_general (mapa resumen), mapa_tormenta (mapa de cada tormenta),
+limpieza_texto (limpieza y traducción), png (codificación de los mapas),
+json (escritura de JSON), además de exposicion, geojson, compresion y publicacion.
+
+Los mapas del fixture se dibujan con matplotlib simple (trayectoria, cono,
+títulos y leyendas en inglés como los de tropycal, sin el mapa base de cartopy):
+los tiempos de dibujo sirven para comparar commits entre sí, no con una corrida
+en vivo. Todo lo demás es el código de producción.
+
+Los tiempos salen de corridas sin tracemalloc; la memoria, de una corrida
+aparte con tracemalloc activo (que hace todo más lento).
+
+Uso:
+    python -m benchmarks.bench_schedule --repeticiones 3 --salida schedule.json
+    python -m benchmarks.bench_schedule --fixture tormentas.json --datos /tmp/snapshots
+    python -m benchmarks.bench_schedule --grabar tormentas.json   # requiere tropycal y red
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.services import codec, schedule
+from app.services.exposicion import radios_cono_km
+from app.services.geometry import buffer_outline
+
+import matplotlib.pyplot as plt
+
+ETAPAS_REPORTE = ["mapa_general", "mapa_tormenta", "limpieza_texto", "png", "json"]
+SERIES = ("time", "lat", "lon", "vmax", "mslp", "type", "special", "wmo_basin")
+NOMBRES = ["MELISSA", "ERICK", "NARDA", "OCTAVE", "PRISCILLA"]
+
+
+# ==============================
+# FIXTURES
+# ==============================
+def _fecha(valor):
+    return datetime.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def grabar(ruta):
+    """Graba las tormentas activas del NHC (tropycal, en vivo) como fixture."""
+    fuente = schedule.fuente_nhc()
+    tormentas = []
+    for storm_id in fuente.list_active_storms():
+        storm = fuente.get_storm(storm_id)
+        try:
+            pronostico = storm.get_forecast_realtime()
+        except Exception as e:
+            print(f"⚠️ {storm_id} sin pronóstico: {e}", file=sys.stderr)
+            pronostico = {}
+        tormentas.append({
+            "id": storm.id,
+            "name": storm.name,
+            "year": storm.year,
+            "season": storm.season,
+            "basin": storm.basin,
+            "invest": storm.invest,
+            "source_info": storm.source_info,
+            "type": getattr(storm, "type", None),
+            "vars": {clave: storm.vars[clave] for clave in SERIES if clave in storm.vars},
+            "pronostico": pronostico,
+        })
+    codec.dump({"version": 1, "grabado": datetime.now().isoformat(), "tormentas": tormentas}, ruta, indent=False)
+    print(f"📼 {len(tormentas)} tormentas grabadas en {ruta}", file=sys.stderr)
+
+
+def fixture_sintetico(tormentas=3, observaciones=60, semilla=0):
+    """Fixture con la forma de uno grabado: series cada 6 h y pronóstico a 5 días."""
+    rng = np.random.default_rng(semilla)
+    fin = datetime(2025, 10, 28, 12)
+    registros = []
+    for i in range(tormentas):
+        pacifico = i % 2 == 1
+        storm_id = f"{'EP' if pacifico else 'AL'}{13 + i:02d}2025"
+        inicio = np.array([12.0, -100.0 - 3 * i]) if pacifico else np.array([14.0, -60.0 - 4 * i])
+        paso = np.array([0.12, -0.2]) if pacifico else np.array([0.08, -0.3])
+        ruta = inicio + np.outer(np.arange(observaciones), paso) + rng.normal(0, 0.08, (observaciones, 2))
+        fhr = np.array([0, 12, 24, 36, 48, 72, 96, 120])
+        # El pronóstico sigue el rumbo de la trayectoria, un paso cada 6 h
+        pron = ruta[-1] + np.outer(fhr / 6, paso)
+        vmax = np.clip(np.cumsum(rng.normal(1.5, 6, observaciones + len(fhr) - 1)) + 30, 25, 160).round()
+        tipos = np.where(vmax >= 64, "HU", np.where(vmax >= 34, "TS", "TD"))
+        registros.append({
+            "id": storm_id,
+            "name": NOMBRES[i % len(NOMBRES)],
+            "year": 2025,
+            "season": 2025,
+            "basin": "east_pacific" if pacifico else "north_atlantic",
+            "invest": False,
+            "source_info": "NHC Hurricane Database",
+            "type": str(tipos[observaciones - 1]),
+            "vars": {
+                "time": [(fin - timedelta(hours=6 * (observaciones - 1 - k))).isoformat() for k in range(observaciones)],
+                "lat": ruta[:observaciones, 0].round(1).tolist(),
+                "lon": ruta[:observaciones, 1].round(1).tolist(),
+                "vmax": vmax[:observaciones].tolist(),
+                "mslp": (1010 - vmax[:observaciones] * 0.6).round().tolist(),
+                "type": tipos[:observaciones].tolist(),
+                "special": [""] * observaciones,
+                "wmo_basin": ["east_pacific" if pacifico else "north_atlantic"] * observaciones,
+            },
+            "pronostico": {
+                "init": fin.isoformat(),
+                "fhr": fhr.tolist(),
+                "lat": pron[:, 0].round(1).tolist(),
+                "lon": pron[:, 1].round(1).tolist(),
+                "vmax": vmax[observaciones - 1:].tolist(),
+                "type": tipos[observaciones - 1:].tolist(),
+            },
+        })
+    return {"version": 1, "grabado": None, "tormentas": registros}
+
+
+# ==============================
+# FUENTE CON FIXTURES
+# ==============================
+def _leyenda(ax):
+    """Leyenda de categorías como la de tropycal (limpiar_y_traducir la elimina en los mapas individuales)."""
+    for etiqueta, color in [("Tropical Depression", "#8fc2f2"), ("Tropical Storm", "#3185d3"),
+                            ("Category 1", "#ffff00"), ("Category 2", "#ffa500"),
+                            ("Category 3", "#ff0000"), ("Category 4", "#ff00ff"), ("Category 5", "#8b008b")]:
+        ax.plot([], [], "o", color=color, label=etiqueta)
+    ax.legend(loc="upper left", fontsize=7, title="Legend")
+
+
+class TormentaGrabada:
+    """Lo que schedule.py usa de una tropycal RealtimeStorm, a partir de un registro del fixture."""
+
+    def __init__(self, registro):
+        self.id = registro["id"]
+        self.name = registro["name"]
+        self.year = registro["year"]
+        self.season = registro["season"]
+        self.basin = registro["basin"]
+        self.invest = registro["invest"]
+        self.source_info = registro["source_info"]
+        self.type = registro.get("type")
+        self.ace = registro.get("ace")
+        self.vars = {
+            clave: [_fecha(t) for t in valores] if clave == "time" else np.asarray(valores)
+            for clave, valores in registro["vars"].items()
+        }
+        self.pronostico = registro.get("pronostico") or {}
+
+    def get_forecast_realtime(self):
+        return {**self.pronostico, "init": _fecha(self.pronostico.get("init"))}
+
+    def plot_forecast_realtime(self):
+        fig, ax = plt.subplots(figsize=(9, 6))
+        lon, lat, vmax = self.vars["lon"], self.vars["lat"], self.vars["vmax"]
+        ax.plot(lon, lat, "k-", linewidth=1.5)
+        ax.scatter(lon, lat, c=vmax, cmap="YlOrRd", s=25, zorder=3)
+        p = self.pronostico
+        if p.get("lat"):
+            radios = radios_cono_km(p["fhr"], self.basin)
+            cono = buffer_outline(p["lon"], p["lat"], radios)
+            ax.fill(cono[:, 0], cono[:, 1], color="white", alpha=0.5, edgecolor="k", linewidth=0.8)
+            ax.plot(p["lon"], p["lat"], "k--", linewidth=1)
+            for h, x, y in zip(p["fhr"], p["lon"], p["lat"]):
+                ax.annotate(f"{datetime(2025, 10, 28) + timedelta(hours=h):%a %H}Z", (x, y), fontsize=7)
+        ax.set_title(f"Hurricane {self.name}\nForecast Track", loc="left", fontweight="bold")
+        ax.set_title(f"NHC Issued {datetime.now():%B %d %Y %H%M} UTC\nCurrent Intensity: {vmax[-1]:.0f} knots",
+                     loc="right", fontsize=8)
+        _leyenda(ax)
+        fig.text(0.1, 0.02, "The cone of uncertainty in this graphic after 72 hours typically contains "
+                 "2/3 of the center location from the official NHC forecast", fontsize=6)
+        fig.text(0.99, 0.02, "Plot generated using tropycal", fontsize=6, ha="right")
+        ax.set_xlabel("Longitude")
+        ax.set_ylabel("Latitude")
+        ax.grid(alpha=0.3)
+
+
+class FuenteFixture:
+    """Fuente para ejecutar_monitoreo() con la interfaz de tropycal.realtime.Realtime."""
+
+    def __init__(self, fixture):
+        self.tormentas = {r["id"]: r for r in fixture["tormentas"]}
+
+    def list_active_storms(self):
+        return list(self.tormentas)
+
+    def get_storm(self, storm_id):
+        return TormentaGrabada(self.tormentas[storm_id])
+
+    def plot_summary(self):
+        fig, ax = plt.subplots(figsize=(12, 7))
+        for storm_id in self.tormentas:
+            storm = self.get_storm(storm_id)
+            ax.plot(storm.vars["lon"], storm.vars["lat"], "-", linewidth=1.5)
+            ax.annotate(f"{storm.name}\n{storm.vars['vmax'][-1]:.0f} kt",
+                        (storm.vars["lon"][-1], storm.vars["lat"][-1]), fontsize=8)
+        ax.set_title("Summary & NHC 7-Day Formation Outlook", loc="left", fontweight="bold")
+        ax.set_title(f"Valid: {datetime.now():%H%M} UTC {datetime.now():%A %B %d %Y}", loc="right", fontsize=8)
+        _leyenda(ax)
+        fig.text(0.99, 0.02, "Plot generated using tropycal", fontsize=6, ha="right")
+        ax.grid(alpha=0.3)
+
+
+# ==============================
+# MEDICIÓN
+# ==============================
+def corrida(fuente, data_dir, memoria=False, verboso=False):
+    salida = contextlib.nullcontext() if verboso else contextlib.redirect_stdout(io.StringIO())
+    if memoria:
+        tracemalloc.start()
+    try:
+        with salida:
+            return schedule.ejecutar_monitoreo(fuente=fuente, data_dir=data_dir)
+    finally:
+        if memoria:
+            tracemalloc.stop()
+        plt.close("all")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de schedule.py con tormentas grabadas")
+    parser.add_argument("--fixture", help="fixture JSON (por defecto uno sintético)")
+    parser.add_argument("--tormentas", type=int, default=3, help="tormentas del fixture sintético")
+    parser.add_argument("--observaciones", type=int, default=60, help="observaciones por tormenta del fixture sintético")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--datos", help="directorio donde se publican los snapshots (por defecto uno temporal)")
+    parser.add_argument("--sin-memoria", action="store_true", help="no hacer la corrida con tracemalloc")
+    parser.add_argument("--verboso", action="store_true", help="mostrar la salida de ejecutar_monitoreo()")
+    parser.add_argument("--grabar", metavar="RUTA", help="grabar las tormentas activas como fixture y salir")
+    parser.add_argument("--salida", help="archivo JSON del reporte")
+    args = parser.parse_args()
+
+    if args.grabar:
+        grabar(args.grabar)
+        return
+
+    if args.fixture:
+        with open(args.fixture, "r", encoding="utf-8") as f:
+            fixture = json.load(f)
+    else:
+        fixture = fixture_sintetico(args.tormentas, args.observaciones)
+    fuente = FuenteFixture(fixture)
+
+    temporal = None if args.datos else tempfile.mkdtemp(prefix="bench_schedule_")
+    data_dir = args.datos or temporal
+    os.makedirs(data_dir, exist_ok=True)
+    try:
+        corrida(fuente, data_dir)  # calentar fuentes y cachés de matplotlib
+        tiempos = [corrida(fuente, data_dir, verboso=args.verboso) for _ in range(args.repeticiones)]
+        memoria = {} if args.sin_memoria else corrida(fuente, data_dir, memoria=True)["memoria"]
+        ultimo = tiempos[-1]["directorio"]
+        archivos = sum(len(nombres) for _, _, nombres in os.walk(ultimo))
+    finally:
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    etapas = ETAPAS_REPORTE + sorted({e for t in tiempos for e in t["etapas"]} - set(ETAPAS_REPORTE))
+    resultados = [
+        {
+            "etapa": etapa,
+            "segundos": round(float(np.median([t["etapas"].get(etapa, 0.0) for t in tiempos])), 4),
+            "pico_mb": round(memoria[etapa] / 2**20, 2) if etapa in memoria else None,
+        }
+        for etapa in etapas
+    ]
+    print(f"{'etapa':<18} {'s (mediana)':>11} {'pico MB':>8}", file=sys.stderr)
+    for r in resultados:
+        pico = f"{r['pico_mb']:>8.2f}" if r["pico_mb"] is not None else f"{'-':>8}"
+        print(f"{r['etapa']:<18} {r['segundos']:>11.3f} {pico}", file=sys.stderr)
+    print(f"{len(fuente.tormentas)} tormentas, {archivos} archivos por snapshot en {data_dir}", file=sys.stderr)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "schedule",
+                "fixture": args.fixture or f"sintetico({args.tormentas}x{args.observaciones})",
+                "tormentas": len(fuente.tormentas),
+                "repeticiones": args.repeticiones,
+                "resultados": resultados,
+            }, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
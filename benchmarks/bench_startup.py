@@ -0,0 +1,112 @@
+"""
+Benchmark de arranque en frío de la API contra un árbol Data/Data grande.
+
+Cada medición corre en un proceso nuevo (imports en frío, cache compartido
+vacío) y reporta:
+- importacion_s: import de app.main
+- arranque_s: eventos de startup (lo que tarda uvicorn en aceptar conexiones)
+- healthz_s: primera respuesta de /healthz desde el inicio del proceso
+- listo_s: hasta que /readyz responde 200 (índice de snapshots construido)
+- primera_storms_s: hasta la primera respuesta de /api/storms
+
+Uso:
+    python -m benchmarks.bench_startup --snapshots 10000 --salida startup.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Se ejecuta en el proceso hijo: los tiempos cuentan desde el arranque del intérprete
+HIJO = r"""
+import json, time
+t0 = time.perf_counter()
+from fastapi.testclient import TestClient
+from app.main import app
+importacion = time.perf_counter() - t0
+
+resultado = {"importacion_s": importacion}
+with TestClient(app) as cliente:
+    resultado["arranque_s"] = time.perf_counter() - t0
+    r = cliente.get("/healthz")
+    resultado["healthz_s"] = time.perf_counter() - t0 if r.status_code == 200 else None
+    listo = None
+    for _ in range(6000):
+        r = cliente.get("/readyz")
+        if r.status_code != 503:
+            listo = time.perf_counter() - t0 if r.status_code == 200 else None
+            break
+        time.sleep(0.005)
+    resultado["listo_s"] = listo
+    r = cliente.get("/api/storms")
+    resultado["primera_storms_s"] = time.perf_counter() - t0
+    resultado["estado_storms"] = r.status_code
+print("RESULTADO " + json.dumps(resultado))
+"""
+
+
+def medir(data_dir, cache_dir):
+    env = dict(os.environ, DATA_DIR=data_dir, SHARED_CACHE_DIR=cache_dir)
+    salida = subprocess.run(
+        [sys.executable, "-c", HIJO], env=env, capture_output=True, text=True, check=True
+    ).stdout
+    linea = next(l for l in salida.splitlines() if l.startswith("RESULTADO "))
+    return json.loads(linea[len("RESULTADO "):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de la API")
+    parser.add_argument("--data-dir", help="usar un árbol existente en vez de generarlo")
+    parser.add_argument("--snapshots", type=int, default=10000)
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--salida", help="archivo JSON del reporte (por defecto, stdout)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    data_dir = args.data_dir
+    generacion = None
+    if not data_dir:
+        from benchmarks import arbol_sintetico
+
+        data_dir = os.path.join(tmp.name, "Data", "Data")
+        t0 = time.perf_counter()
+        arbol_sintetico.generar(data_dir, args.snapshots, tormentas=1)
+        generacion = round(time.perf_counter() - t0, 2)
+        print(f"Árbol generado en {generacion} s", file=sys.stderr)
+
+    corridas = []
+    for i in range(args.repeticiones):
+        corridas.append(medir(data_dir, os.path.join(tmp.name, f"cache_{i}")))
+        print(json.dumps(corridas[-1]), file=sys.stderr)
+
+    def mediana(clave):
+        valores = [c[clave] for c in corridas if c.get(clave) is not None]
+        return round(float(np.median(valores)), 4) if valores else None
+
+    reporte = {
+        "benchmark": "startup",
+        "snapshots": len([d for d in os.listdir(data_dir) if not d.startswith(".")]),
+        "generacion_arbol_s": generacion,
+        "mediana": {
+            k: mediana(k)
+            for k in ("importacion_s", "arranque_s", "healthz_s", "listo_s", "primera_storms_s")
+        },
+        "corridas": corridas,
+    }
+    tmp.cleanup()
+
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Suite de carga/benchmark reproducible, sin red.
+
+1. Genera un árbol Data/Data sintético (benchmarks/arbol_sintetico.py).
+2. Arranca un stub local de Open-Meteo con latencia/errores configurables
+   (benchmarks/stub_openmeteo.py).
+3. Importa la app FastAPI apuntando a ambos y la ejercita en proceso con
+   TestClient: p50/p99 y throughput de cada ruta GET de /api y /rainmap.
+4. Mide interpolate() a varias densidades.
+5. Escribe un reporte JSON comparable entre commits.
+
+Uso:
+    python -m benchmarks.run --snapshots 10000 --peticiones 50 --salida bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+from benchmarks import stub_openmeteo
+
+# Parámetros de query por ruta: las rutas de rainmap se corren con rejillas chicas
+# para que el benchmark mida la app y no solo el número de peticiones al stub.
+QUERY_POR_RUTA = {
+    "/rainmap/realtime": {"grid_size": 5, "density": 25},
+    "/rainmap/forecast": {"grid_size": 5, "density": 25, "hours": 12},
+    "/rainmap/overlay": {"grid_size": 5, "density": 25},
+    "/rainmap/contours": {"grid_size": 5, "density": 25},
+    "/rainmap/at": {"lat": 20.0, "lon": -100.0, "grid_size": 5, "density": 25},
+    # Solo la rejilla por defecto se registra en el historial (RAINMAP_HISTORY_GRIDS)
+    "/rainmap/history": {"lat": 20.0, "lon": -100.0},
+    "/rainmap/cities": {"names": "Monterrey;Guadalajara;Mérida;Tijuana;Oaxaca;Guadalupe, Nuevo León"},
+    "/rainmap/cities/search": {"q": "san"},
+    "/rainmap/tiles/{z}/{x}/{y}.{format}": {"grid_size": 5, "density": 25},
+    "/api/storms/{storm_id}/geojson": {"zoom": 5},
+}
+RUTAS_EXCLUIDAS = {"/openapi.json", "/docs", "/redoc", "/docs/oauth2-redirect"}
+DENSIDADES = (25, 50, 100)
+
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else None
+
+
+def commit_actual():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def rutas_get(app):
+    """Rutas GET documentadas en OpenAPI (funciona igual con routers anidados o aplanados)."""
+    rutas = []
+    for ruta, metodos in app.openapi()["paths"].items():
+        if "get" in metodos and ruta not in RUTAS_EXCLUIDAS:
+            rutas.append(ruta)
+    return sorted(rutas)
+
+
+def concretar(ruta, valores):
+    """/api/storms/{storm_id} -> /api/storms/AL132025. None si falta algún parámetro."""
+    faltantes = [p for p in re.findall(r"{(\w+)}", ruta) if p not in valores]
+    if faltantes:
+        return None
+    return re.sub(r"{(\w+)}", lambda m: str(valores[m.group(1)]), ruta)
+
+
+def medir_ruta(cliente, url, query, peticiones):
+    inicio = time.perf_counter()
+    primera = cliente.get(url, params=query)
+    fria = time.perf_counter() - inicio
+
+    latencias, estados = [], {}
+    inicio_total = time.perf_counter()
+    for _ in range(peticiones):
+        t0 = time.perf_counter()
+        r = cliente.get(url, params=query)
+        latencias.append(time.perf_counter() - t0)
+        estados[r.status_code] = estados.get(r.status_code, 0) + 1
+    total = time.perf_counter() - inicio_total
+
+    return {
+        "estado_primera": primera.status_code,
+        "fria_ms": round(fria * 1000, 3),
+        "p50_ms": round(percentil(latencias, 50) * 1000, 3),
+        "p99_ms": round(percentil(latencias, 99) * 1000, 3),
+        "media_ms": round(float(np.mean(latencias)) * 1000, 3),
+        "throughput_rps": round(peticiones / total, 2) if total > 0 else None,
+        "bytes": len(primera.content),
+        "estados": {str(k): v for k, v in estados.items()},
+    }
+
+
+def medir_interpolacion(rainmap_routes, repeticiones):
+    """interpolate() sobre estaciones sintéticas del tamaño de la rejilla por defecto (15x15)."""
+    lats = np.linspace(14.5, 32.75, 15)
+    lons = np.linspace(-118, -86.5, 15)
+    estaciones = [
+        {"lat": float(a), "lon": float(b), "precipitation": stub_openmeteo.precipitacion(a, b)}
+        for a in lats
+        for b in lons
+    ]
+    resultados = []
+    for densidad in DENSIDADES:
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            rainmap_routes.interpolate(estaciones, densidad)
+            tiempos.append(time.perf_counter() - t0)
+        resultados.append({
+            "densidad": densidad,
+            "celdas": densidad * densidad,
+            "estaciones": len(estaciones),
+            "p50_ms": round(percentil(tiempos, 50) * 1000, 3),
+            "max_ms": round(max(tiempos) * 1000, 3),
+        })
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline de la API")
+    parser.add_argument("--data-dir", help="usar un árbol existente en vez de generarlo")
+    parser.add_argument("--snapshots", type=int, default=1000)
+    parser.add_argument("--tormentas", type=int, default=3)
+    parser.add_argument("--peticiones", type=int, default=50, help="peticiones por ruta")
+    parser.add_argument("--latencia", type=float, default=0.01, help="latencia del stub (s)")
+    parser.add_argument("--errores", type=float, default=0.0, help="fracción de 500 en el stub")
+    parser.add_argument("--errores-429", type=float, default=0.0, help="fracción de 429 en el stub")
+    parser.add_argument("--repeticiones-interpolacion", type=int, default=3)
+    parser.add_argument("--salida", help="archivo JSON del reporte (por defecto, stdout)")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    data_dir = args.data_dir or os.path.join(tmp.name, "Data", "Data")
+
+    # La configuración se lee al importar los módulos de app (incluido el generador,
+    # que usa app.services.utils): fijarla antes de cualquier import de app
+    os.environ["DATA_DIR"] = data_dir
+    os.environ.setdefault("SCHEDULER_STATE", os.path.join(tmp.name, "scheduler_state.json"))
+    os.environ.setdefault("SHARED_CACHE_DIR", os.path.join(tmp.name, "cache"))
+    os.environ.setdefault("RAINMAP_HISTORY_DIR", os.path.join(tmp.name, "history"))
+
+    t0 = time.perf_counter()
+    if args.data_dir:
+        snapshots = sorted(d for d in os.listdir(data_dir) if re.match(r"^\d{8}_\d{6}$", d))
+        json_dir = os.path.join(data_dir, snapshots[-1], "JSON")
+        ids = sorted(
+            f[len("tormenta_"):-len(".json")] for f in os.listdir(json_dir) if f.startswith("tormenta_")
+        )
+    else:
+        from benchmarks import arbol_sintetico
+
+        info = arbol_sintetico.generar(data_dir, args.snapshots, args.tormentas)
+        ids, snapshots = info["tormentas"], sorted(info["snapshots"])
+    generacion = time.perf_counter() - t0
+
+    servidor, url_stub, contador = stub_openmeteo.iniciar(
+        latencia=args.latencia, tasa_error=args.errores, tasa_429=args.errores_429
+    )
+
+    os.environ["OPEN_METEO_URL"] = url_stub
+
+    t0 = time.perf_counter()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routes import rainmap_routes
+    importacion = time.perf_counter() - t0
+
+    valores = {
+        "storm_id": ids[0] if ids else "XX",
+        "date": snapshots[-1][:8],
+        "index": 0,
+        "name": "Acapulco",
+        # Tesela XYZ sobre el centro de México
+        "z": 5, "x": 7, "y": 14, "format": "png",
+    }
+    rutas = []
+    with TestClient(app) as cliente:
+        for ruta in rutas_get(app):
+            if not (ruta.startswith("/api") or ruta.startswith("/rainmap")):
+                continue
+            url = concretar(ruta, valores)
+            if url is None:
+                rutas.append({"ruta": ruta, "omitida": "parámetros desconocidos"})
+                continue
+            query = QUERY_POR_RUTA.get(ruta, {})
+            resultado = medir_ruta(cliente, url, query, args.peticiones)
+            rutas.append({"ruta": ruta, "url": url, "query": query, **resultado})
+            print(f"{ruta:<48} p50 {resultado['p50_ms']:>9.2f} ms  p99 {resultado['p99_ms']:>9.2f} ms  "
+                  f"{resultado['throughput_rps']:>8} rps  [{resultado['estado_primera']}]", file=sys.stderr)
+
+    interpolacion = medir_interpolacion(rainmap_routes, args.repeticiones_interpolacion)
+    for r in interpolacion:
+        print(f"interpolate(density={r['densidad']:<3}) p50 {r['p50_ms']:>9.2f} ms", file=sys.stderr)
+
+    servidor.shutdown()
+    reporte = {
+        "benchmark": "api",
+        "commit": commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "parametros": {
+            "snapshots": len(snapshots),
+            "tormentas": len(ids),
+            "peticiones_por_ruta": args.peticiones,
+            "latencia_stub": args.latencia,
+            "errores_stub": args.errores,
+            "errores_429_stub": args.errores_429,
+        },
+        "preparacion": {
+            "generacion_arbol_s": round(generacion, 3),
+            "importacion_app_s": round(importacion, 3),
+        },
+        "rutas": rutas,
+        "interpolacion": interpolacion,
+        "upstream": dict(contador),
+    }
+    tmp.cleanup()
+
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    main()
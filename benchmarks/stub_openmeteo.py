@@ -0,0 +1,110 @@
+"""
+Servidor local que imita /v1/forecast de Open-Meteo, con latencia y tasa de
+errores configurables. Sirve `current=precipitation` y `hourly=precipitation`,
+y varias coordenadas separadas por coma (devuelve una lista, como la API real).
+
+Uso:
+    python -m benchmarks.stub_openmeteo --puerto 8765 --latencia 0.05 --errores 0.02
+    OPEN_METEO_URL=http://127.0.0.1:8765/v1/forecast uvicorn app.main:app
+"""
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def precipitacion(lat, lon, hora=0):
+    """Campo determinista con bandas de lluvia, para que la interpolación tenga estructura."""
+    valor = 4.0 * max(0.0, math.sin(lat / 2.5 + hora / 6) * math.cos(lon / 3.0))
+    return round(valor if valor > 0.3 else 0.0, 2)
+
+
+def respuesta_punto(lat, lon, params):
+    ahora = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+    cuerpo = {"latitude": lat, "longitude": lon, "timezone": "GMT"}
+    if "current" in params:
+        cuerpo["current"] = {"time": ahora.strftime("%Y-%m-%dT%H:%M"), "precipitation": precipitacion(lat, lon)}
+    if "hourly" in params:
+        horas = int(params.get("forecast_hours", ["24"])[0])
+        cuerpo["hourly"] = {
+            "time": [(ahora + timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(horas)],
+            "precipitation": [precipitacion(lat, lon, h) for h in range(horas)],
+        }
+    return cuerpo
+
+
+def crear_handler(latencia, jitter, tasa_error, tasa_429, contador):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/v1/forecast":
+                self.send_error(404)
+                return
+            params = parse_qs(url.query)
+            lats = [float(x) for x in params.get("latitude", ["0"])[0].split(",")]
+            lons = [float(x) for x in params.get("longitude", ["0"])[0].split(",")]
+            contador["peticiones"] += 1
+            contador["ubicaciones"] += len(lats)
+
+            time.sleep(max(0.0, random.gauss(latencia, jitter)))
+            sorteo = random.random()
+            if sorteo < tasa_429:
+                self._json(429, {"error": True, "reason": "Too many concurrent requests"})
+                return
+            if sorteo < tasa_429 + tasa_error:
+                self._json(500, {"error": True, "reason": "stub error"})
+                return
+
+            puntos = [respuesta_punto(lat, lon, params) for lat, lon in zip(lats, lons)]
+            self._json(200, puntos[0] if len(puntos) == 1 else puntos)
+
+        def _json(self, status, cuerpo):
+            datos = json.dumps(cuerpo).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+    return Handler
+
+
+def iniciar(puerto=0, latencia=0.02, jitter=0.005, tasa_error=0.0, tasa_429=0.0):
+    """Arranca el stub en un hilo. Devuelve (servidor, url, contador de peticiones)."""
+    contador = {"peticiones": 0, "ubicaciones": 0}
+    servidor = ThreadingHTTPServer(
+        ("127.0.0.1", puerto), crear_handler(latencia, jitter, tasa_error, tasa_429, contador)
+    )
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{servidor.server_address[1]}/v1/forecast"
+    return servidor, url, contador
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local de Open-Meteo")
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.02, help="segundos promedio por petición")
+    parser.add_argument("--jitter", type=float, default=0.005)
+    parser.add_argument("--errores", type=float, default=0.0, help="fracción de respuestas 500")
+    parser.add_argument("--errores-429", type=float, default=0.0, help="fracción de respuestas 429")
+    args = parser.parse_args()
+
+    servidor, url, _ = iniciar(args.puerto, args.latencia, args.jitter, args.errores, args.errores_429)
+    print(f"🌧️  Stub de Open-Meteo en {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,8 @@
-# monitor.sh — runs schedule.py periodically
+# monitor.sh — runs the resident storm scheduler (app/services/scheduler.py)
+# Heavy modules (tropycal, matplotlib, numpy, PIL) are imported once and kept warm.
 
-INTERVAL=3600  # 1 hour = 3600 seconds. Adjust as needed.
+export SCHEDULER_INTERVAL=${SCHEDULER_INTERVAL:-3600}  # 1 hour = 3600 seconds. Adjust as needed.
+export SCHEDULER_JITTER=${SCHEDULER_JITTER:-0}
 
-echo "🌤️  Starting storm monitoring loop..."
-while true
-do
-    echo "🔁 Running schedule.py at $(date)"
-    python -m app.services.schedule
-    echo "⏳ Sleeping for $INTERVAL seconds..."
-    sleep $INTERVAL
-done
+echo "🌤️  Starting storm monitoring scheduler (every $SCHEDULER_INTERVAL s)..."
+exec python -m app.services.scheduler --now
@@ -0,0 +1,12 @@
+"""
+Run with `python -m pytest -q` from the repository root (so `app` is importable).
+
+The shared cache and the history store default to /dev/shm and the user's
+state directory: point both at a throwaway directory before anything imports them.
+"""
+import os
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="weatherstorm-tests-")
+os.environ.setdefault("SHARED_CACHE_DIR", os.path.join(_TMP, "cache"))
+os.environ.setdefault("RAINMAP_HISTORY_DIR", os.path.join(_TMP, "history"))
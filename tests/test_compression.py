@@ -0,0 +1,42 @@
+import pytest
+
+from app.services import compression
+
+
+@pytest.fixture
+def all_encodings(monkeypatch):
+    """Negotiate as if brotli and zstandard were installed."""
+    monkeypatch.setattr(compression, "PREFERENCE", ["br", "zstd", "gzip"])
+
+
+def test_no_header_or_identity_means_uncompressed():
+    assert compression.negotiate(None) is None
+    assert compression.negotiate("") is None
+    assert compression.negotiate("identity") is None
+
+
+def test_server_preference_breaks_ties(all_encodings):
+    assert compression.negotiate("gzip, deflate, br, zstd") == "br"
+    assert compression.negotiate("gzip, zstd") == "zstd"
+
+
+def test_higher_q_value_wins(all_encodings):
+    assert compression.negotiate("br;q=0.5, gzip") == "gzip"
+    assert compression.negotiate("gzip;q=0.2, zstd;q=0.8") == "zstd"
+
+
+def test_q_zero_and_malformed_q_refuse(all_encodings):
+    assert compression.negotiate("br;q=0, gzip;q=0") is None
+    assert compression.negotiate("gzip;q=abc") is None
+
+
+def test_wildcard_and_case(all_encodings):
+    assert compression.negotiate("*") == "br"
+    assert compression.negotiate("*;q=0.1, BR;q=0") == "zstd"
+    assert compression.negotiate("GZIP") == "gzip"
+
+
+def test_only_available_encodings_are_chosen(monkeypatch):
+    monkeypatch.setattr(compression, "PREFERENCE", ["gzip"])
+    assert compression.negotiate("br, zstd") is None
+    assert compression.negotiate("br, gzip;q=0.1") == "gzip"
@@ -0,0 +1,62 @@
+import numpy as np
+
+from app.services import contours
+
+
+def bump(shape, center, radius):
+    y, x = np.mgrid[0:shape[0], 0:shape[1]]
+    return np.clip(1 - np.hypot(x - center[0], y - center[1]) / radius, 0, None)
+
+
+def annulus(shape, center, inner, outer):
+    y, x = np.mgrid[0:shape[0], 0:shape[1]]
+    r = np.hypot(x - center[0], y - center[1])
+    return ((r >= inner) & (r <= outer)).astype(float)
+
+
+def test_single_peak_gives_one_counterclockwise_ring():
+    rings = contours.isolines(bump((21, 21), (10, 10), 8), 0.5)
+    assert len(rings) == 1
+    ring = rings[0]
+    assert ring[0].tolist() == ring[-1].tolist()
+    assert contours.signed_area(ring) > 0
+    assert contours.contains(ring, (10, 10))
+
+
+def test_hole_is_clockwise_and_inside_its_exterior():
+    rings = contours.isolines(annulus((31, 31), (15, 15), 4, 10), 0.5)
+    areas = sorted(contours.signed_area(r) for r in rings)
+    assert len(rings) == 2
+    assert areas[0] < 0 < areas[1]
+    shapes = contours.polygons(rings)
+    assert len(shapes) == 1
+    exterior, hole = shapes[0]
+    assert contours.signed_area(exterior) > 0 > contours.signed_area(hole)
+
+
+def test_holes_go_to_the_smallest_containing_exterior():
+    field = annulus((41, 41), (20, 20), 14, 18) + annulus((41, 41), (20, 20), 3, 8)
+    shapes = contours.polygons(contours.isolines(field, 0.5))
+    # Outer band and inner band, each with its own hole
+    assert sorted(len(shape) for shape in shapes) == [2, 2]
+    for exterior, hole in shapes:
+        assert contours.contains(exterior, hole[0])
+        assert abs(contours.signed_area(hole)) < contours.signed_area(exterior)
+
+
+def test_separate_peaks_give_separate_polygons():
+    field = bump((21, 41), (10, 10), 6) + bump((21, 41), (30, 10), 6)
+    shapes = contours.polygons(contours.isolines(field, 0.5))
+    assert len(shapes) == 2
+    assert all(len(shape) == 1 for shape in shapes)
+
+
+def test_isohyets_are_nested_and_counterclockwise():
+    grid = bump((15, 15), (7, 7), 7) * 10
+    lats, lons = np.linspace(15, 29, 15), np.linspace(-110, -96, 15)
+    collection = contours.isohyets(grid, lats, lons, [1, 5], tolerance=0)
+    low, high = (f["geometry"]["coordinates"] for f in collection["features"])
+    assert len(low) == len(high) == 1
+    low_ring, high_ring = np.array(low[0][0]), np.array(high[0][0])
+    assert contours.signed_area(low_ring) > contours.signed_area(high_ring) > 0
+    assert all(contours.contains(low_ring, p) for p in high_ring[:-1])
@@ -0,0 +1,49 @@
+import numpy as np
+
+from app.services.geometry import dequantize, douglas_peucker, quantize, segment_distances, simplify_ring
+
+
+def test_douglas_peucker_drops_collinear_points():
+    line = np.array([[0, 0], [1, 0], [2, 0], [3, 0]], dtype=float)
+    assert douglas_peucker(line, 0.01).tolist() == [[0, 0], [3, 0]]
+
+
+def test_douglas_peucker_keeps_points_beyond_tolerance():
+    line = np.array([[0, 0], [1, 0.05], [2, 0], [2, 1], [3, 1.02], [4, 1]])
+    simplified = douglas_peucker(line, 0.1)
+    assert simplified.tolist() == [[0, 0], [2, 0], [2, 1], [4, 1]]
+    # Every dropped point stays within tolerance of the simplified line
+    for point in line:
+        distances = [segment_distances(point[None], a, b)[0] for a, b in zip(simplified[:-1], simplified[1:])]
+        assert min(distances) <= 0.1
+
+
+def test_douglas_peucker_zero_tolerance_and_short_lines_unchanged():
+    line = np.array([[0, 0], [1, 0], [2, 0]], dtype=float)
+    assert douglas_peucker(line, 0).tolist() == line.tolist()
+    assert douglas_peucker(line[:2], 1.0).tolist() == line[:2].tolist()
+
+
+def test_simplify_ring_stays_closed():
+    angles = np.linspace(0, 2 * np.pi, 64, endpoint=False)
+    ring = np.column_stack([np.cos(angles), np.sin(angles)])
+    ring = np.vstack([ring, ring[:1]])
+    simplified = simplify_ring(ring, 0.05)
+    assert 4 <= len(simplified) < len(ring)
+    assert simplified[0].tolist() == simplified[-1].tolist()
+
+
+def test_quantize_is_delta_encoded():
+    coords = [[-99.1234, 19.4321], [-99.1, 19.5]]
+    assert quantize(coords, 1000) == [-99123, 19432, 23, 68]
+
+
+def test_quantize_round_trip_within_half_a_unit():
+    coords = np.random.default_rng(0).uniform(-120, -80, (50, 2))
+    restored = dequantize(quantize(coords, 1e4), 1e4)
+    assert restored.shape == coords.shape
+    assert np.abs(restored - coords).max() <= 0.5e-4 + 1e-12
+
+
+def test_quantize_empty():
+    assert quantize(np.empty((0, 2)), 100) == []
@@ -0,0 +1,58 @@
+import time
+
+import numpy as np
+import pytest
+
+from app.services import history
+
+LATS = np.array([19.0, 19.0, 20.0, 20.0])
+LONS = np.array([-100.0, -99.0, -100.0, -99.0])
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(history, "HISTORY_DIR", tmp_path)
+    return tmp_path
+
+
+def test_append_query_round_trip():
+    now = time.time()
+    for k in range(3):
+        history.append("grid", LATS, LONS, [k, 10 + k, 20 + k, 30 + k], ts=now - 60 * (2 - k))
+
+    lat, lon, times, values = history.query("grid", 19.9, -99.1, now - 3600, now)
+    assert (lat, lon) == (20.0, -99.0)
+    assert times.tolist() == [now - 120, now - 60, now]
+    assert values.tolist() == [30, 31, 32]
+
+
+def test_query_filters_by_time_range():
+    now = time.time()
+    for k in range(4):
+        history.append("grid", LATS, LONS, np.full(4, k), ts=now - 60 * (3 - k))
+    _, _, times, values = history.query("grid", 19.0, -100.0, now - 150, now - 30)
+    assert times.tolist() == [now - 120, now - 60]
+    assert values.tolist() == [1, 2]
+
+
+def test_query_spans_days():
+    day_start = (time.time() // 86400) * 86400
+    history.append("grid", LATS, LONS, np.full(4, 1.5), ts=day_start - 10)
+    history.append("grid", LATS, LONS, np.full(4, 2.5), ts=day_start + 10)
+    _, _, times, values = history.query("grid", 19.0, -100.0, day_start - 3600, day_start + 3600)
+    assert times.tolist() == [day_start - 10, day_start + 10]
+    assert values.tolist() == [1.5, 2.5]
+
+
+def test_query_without_records_returns_none():
+    now = time.time()
+    assert history.query("grid", 19.0, -100.0, now - 3600, now) is None
+    history.append("grid", LATS, LONS, np.zeros(4), ts=now)
+    assert history.query("grid", 19.0, -100.0, now - 7200, now - 3600) is None
+
+
+def test_append_rejects_a_different_point_count_within_a_day():
+    now = time.time()
+    history.append("grid", LATS, LONS, np.zeros(4), ts=now)
+    with pytest.raises(ValueError):
+        history.append("grid", LATS[:2], LONS[:2], np.zeros(2), ts=now)
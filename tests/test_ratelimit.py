@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ratelimit
+
+DAY = 86400
+
+
+@pytest.fixture
+def bucket(monkeypatch):
+    """In-memory budget of 60 calls/minute (one token per second) and 100 calls/day, on a fake clock."""
+    clock = {"now": 10 * DAY + 100.0, "slept": []}
+
+    def sleep(seconds):
+        clock["slept"].append(seconds)
+        clock["now"] += seconds
+
+    monkeypatch.setattr(ratelimit, "MINUTE_BUDGET", 60.0)
+    monkeypatch.setattr(ratelimit, "DAILY_BUDGET", 100)
+    monkeypatch.setattr(ratelimit, "MAX_WAIT", 5.0)
+    monkeypatch.setattr(ratelimit, "_state_file", {"fd": None})
+    monkeypatch.setattr(ratelimit, "_memory", bytearray())
+    monkeypatch.setattr(ratelimit, "time", SimpleNamespace(time=lambda: clock["now"], sleep=sleep))
+    return clock
+
+
+def state(tokens, updated_at, day, used):
+    return ratelimit.STATE.pack(tokens, updated_at, day, used)
+
+
+def test_refill_starts_full(bucket):
+    assert ratelimit._refill(b"", 5 * DAY + 10) == (60.0, 5 * DAY + 10, 5, 0.0)
+
+
+def test_refill_adds_tokens_by_elapsed_time_up_to_the_budget(bucket):
+    now = 5 * DAY + 100
+    assert ratelimit._refill(state(10.0, now - 15, 5, 3.0), now) == (25.0, now, 5, 3.0)
+    assert ratelimit._refill(state(10.0, now - 600, 5, 3.0), now)[0] == 60.0
+
+
+def test_refill_resets_daily_count_at_utc_midnight(bucket):
+    assert ratelimit._refill(state(0.0, 6 * DAY - 1, 5, 99.0), 6 * DAY)[2:] == (6, 0.0)
+
+
+def test_acquire_takes_tokens_without_waiting(bucket):
+    assert ratelimit.acquire(40) == 0.0
+    assert ratelimit.acquire(20) == 0.0
+    assert bucket["slept"] == []
+    assert ratelimit.remaining() == {"minute": 0.0, "day": 40}
+
+
+def test_acquire_waits_for_the_bucket_to_refill(bucket):
+    ratelimit.acquire(58)
+    assert ratelimit.acquire(5) == pytest.approx(3.0)
+    assert bucket["slept"] == [pytest.approx(3.0)]
+
+
+def test_acquire_refuses_waits_longer_than_max_wait(bucket):
+    ratelimit.acquire(60)
+    with pytest.raises(ratelimit.BudgetExhaustedError):
+        ratelimit.acquire(10)
+    assert bucket["slept"] == []
+
+
+def test_acquire_refuses_past_the_daily_budget(bucket):
+    ratelimit.acquire(60)
+    bucket["now"] += 60
+    ratelimit.acquire(40)
+    bucket["now"] += 60
+    with pytest.raises(ratelimit.BudgetExhaustedError, match="Daily"):
+        ratelimit.acquire(1)
@@ -0,0 +1,40 @@
+import pytest
+
+from app.routes.rainmap_routes import DOMAIN, TILE_DEG, parse_bbox, tile_range
+
+
+def test_parse_bbox_inside_the_domain():
+    assert parse_bbox("-101,19,-98,21") == (-101.0, 19.0, -98.0, 21.0)
+
+
+def test_parse_bbox_clips_to_the_domain():
+    assert parse_bbox("-130,10,-98,40") == (DOMAIN[0], DOMAIN[2], -98.0, DOMAIN[3])
+
+
+@pytest.mark.parametrize("bbox, message", [
+    ("-101,19,-98", "min_lon,min_lat,max_lon,max_lat"),
+    ("a,b,c,d", "min_lon,min_lat,max_lon,max_lat"),
+    ("-98,19,-101,21", "minimums"),
+    ("-101,21,-98,21", "minimums"),
+    ("-60,19,-50,21", "does not intersect"),
+])
+def test_parse_bbox_rejects(bbox, message):
+    with pytest.raises(ValueError, match=message):
+        parse_bbox(bbox)
+
+
+def test_tile_range_covers_the_interval():
+    origin = DOMAIN[0]
+    lo, hi = origin + 0.5 * TILE_DEG, origin + 2.5 * TILE_DEG
+    assert list(tile_range(lo, hi, origin)) == [0, 1, 2]
+
+
+def test_tile_range_on_tile_edges():
+    origin = DOMAIN[2]
+    assert list(tile_range(origin, origin + TILE_DEG, origin)) == [0]
+    assert list(tile_range(origin + TILE_DEG, origin + 2 * TILE_DEG, origin)) == [1]
+
+
+def test_tile_range_within_one_tile():
+    origin = DOMAIN[0]
+    assert list(tile_range(origin + 3.2 * TILE_DEG, origin + 3.3 * TILE_DEG, origin)) == [3]